@@ -0,0 +1,52 @@
+# backend/app/api/etag.py
+"""
+Conditional GET for library reads.
+
+Responses of ``/papers``, ``/papers/{id}``, ``/papers/batch``, ``/tags`` and
+``/folders`` only change when a write bumps ``library_generation``, so the
+generation is their validator: ``ETag: "<epoch>-<generation>"`` (the URL
+tells the representations apart).  The generation is the shared one every
+worker process reads (services/generation.py), so a write on any worker
+changes the tag everywhere; the epoch changes only if the stamp file is
+recreated, so a tag from an older counter never matches.  A request whose
+``If-None-Match`` still matches gets an empty 304 before the handler queries
+or serialises anything.
+
+``Cache-Control: no-cache`` makes browsers store the body and revalidate on
+every use, so the frontend's polling turns into 304s without client changes.
+"""
+from __future__ import annotations
+from typing import Optional
+
+from fastapi import Request, Response
+
+from ..services.generation import library_generation
+
+ETAG_HEADER = "ETag"
+
+
+def library_etag() -> str:
+    return f'"{library_generation.epoch}-{library_generation.value}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match 用弱比较：忽略 W/ 前缀；"*" 匹配任何当前表示
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(request: Request, response: Response) -> Optional[Response]:
+    """
+    Tag ``response`` with the current library ETag; return a 304 to send
+    instead when the client already has this version, else None.
+    """
+    etag = library_etag()   # 先取代数再查库：查询期间有写入只会让下次多一个 200
+    headers = {ETAG_HEADER: etag, "Cache-Control": "no-cache"}
+    inm = request.headers.get("if-none-match")
+    if inm and _matches(inm, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,46 @@
+# backend/app/api/pagination.py
+"""
+Opaque keyset cursors.
+
+A cursor is the sort key of the last row on the previous page, JSON-encoded
+and base64url'd, so the next page is a ``WHERE (key) < (last key)`` seek instead
+of an OFFSET scan.  List endpoints keep returning a plain JSON array; the next
+cursor and the optional total travel in the ``X-Next-Cursor`` /
+``X-Total-Count`` response headers.
+"""
+from __future__ import annotations
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+PAGE_HEADERS = [NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER]
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values],
+                     separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, arity: int) -> List[Any]:
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + pad).decode("utf-8"))
+        if not isinstance(values, list) or len(values) != arity:
+            raise ValueError("arity")
+        return values
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def set_page_headers(response: Response, next_cursor: Optional[str],
+                     total: Optional[int] = None) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if total is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
@@ -0,0 +1,113 @@
+# backend/app/api/responses.py
+"""
+Fast path for large list responses.
+
+A route that returns plain data goes through ``response_model`` validation
+(every row rebuilt as a Pydantic model, nested authors included) and then
+``jsonable_encoder`` + ``json.dumps``.  For rows we assembled ourselves that
+is pure overhead, so list endpoints return ``fast_json(rows, Model, response)``
+instead: each row is cut down to ``Model``'s fields (same keys, no
+validation) and encoded straight to bytes with orjson when installed
+(stdlib ``json`` otherwise).  The route keeps its ``response_model`` for the
+OpenAPI schema; FastAPI sends a returned ``Response`` as is.
+
+Sparse fieldsets: ``parse_fields("id,title")`` validates a ``fields=`` query
+parameter against the model; ``load_columns`` turns it into the entity
+columns to load (``load_only``), so unrequested columns are never read.
+
+Compression: ``ApiGZipMiddleware`` (``GZIP_*`` settings) gzips API responses
+for clients that accept it; ``/files`` (PDFs, range requests) is left alone.
+"""
+from __future__ import annotations
+import json
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:   # 可选依赖：没有就用标准库
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+                      default=str).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _fields(model: Type[BaseModel]) -> Tuple[str, ...]:
+    return tuple(model.model_fields)
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel],
+                 available: Optional[Iterable[str]] = None) -> Optional[Tuple[str, ...]]:
+    """
+    ``fields=a,b`` -> those keys in ``model`` order, ``id`` always included; None = all fields.
+    ``available`` limits the keys an endpoint can fill; other ``model`` fields get a 422.
+    """
+    if not fields or not fields.strip():
+        return None
+    wanted = {f.strip() for f in fields.split(",") if f.strip()} | {"id"}
+    unknown = wanted - set(_fields(model))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown fields: {', '.join(sorted(unknown))}")
+    if available is not None:
+        # 模型里有、但这个端点不填的字段（如搜索命中的 tag_ids / authors）：报错而不是静默返回 null
+        missing = wanted - set(available)
+        if missing:
+            raise HTTPException(status_code=422,
+                                detail=f"fields not available here: {', '.join(sorted(missing))}")
+    return tuple(k for k in _fields(model) if k in wanted)
+
+
+def load_columns(entity: Any, keys: Iterable[str]) -> List[Any]:
+    """Mapped columns of ``entity`` among ``keys`` (link-table / computed keys are skipped)."""
+    table = entity.__table__.c
+    return [getattr(entity, k) for k in keys if k in table]
+
+
+def project(rows: Iterable[Dict[str, Any]], model: Type[BaseModel],
+            keys: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+    """Rows -> exactly ``keys`` (default: ``model``'s fields; missing ones None).
+
+    Like response_model, minus the validation.
+    """
+    keys = keys or _fields(model)
+    return [{k: row.get(k) for k in keys} for row in rows]
+
+
+def fast_json(rows: Iterable[Dict[str, Any]], model: Type[BaseModel], response: Response,
+              keys: Optional[Tuple[str, ...]] = None) -> FastJSONResponse:
+    # 返回 Response 时 FastAPI 不再合并注入的 response 上的头（分页 / ETag），这里带过去
+    headers = {k: v for k, v in response.headers.items()
+               if k not in ("content-length", "content-type")}
+    return FastJSONResponse(project(rows, model, keys), headers=headers)
+
+
+class ApiGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that skips ``exclude`` paths (already-compressed / ranged static files)."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, compresslevel: int = 5,
+                 exclude: Tuple[str, ...] = ()) -> None:
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.exclude = exclude
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self.exclude):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
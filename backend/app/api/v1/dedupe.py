@@ -6,6 +6,7 @@ from sqlmodel import select, SQLModel
 from rapidfuzz import fuzz
 from ..deps import SessionDep
 from ...models import Paper, PaperAuthorLink, Author
+from ...services import embedding_generations, knn_graph, passages
 
 router = APIRouter()
 
@@ -50,6 +51,7 @@ def merge(session: SessionDep, group: List[int], keep: int):
     survivor = session.get(Paper, keep)
     if not survivor:
         raise HTTPException(status_code=404, detail="keep paper not found")
+    dropped_passages: List[int] = []
     for pid in group:
         if pid == keep: 
             continue
@@ -65,6 +67,10 @@ def merge(session: SessionDep, group: List[int], keep: int):
         if not survivor.abstract and victim.abstract: survivor.abstract = victim.abstract
         if not survivor.venue and victim.venue: survivor.venue = victim.venue
         if not survivor.year and victim.year: survivor.year = victim.year
+        dropped_passages += passages.delete_for_paper(session, pid)
+        embedding_generations.delete_slots(session, pid)
+        knn_graph.delete_edges(session, pid)
         session.delete(victim)
     session.commit()
+    passages.forget(dropped_passages)
     return {"ok": True, "keep": keep}
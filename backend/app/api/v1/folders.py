@@ -1,11 +1,12 @@
 from __future__ import annotations
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from sqlmodel import select
 from sqlalchemy import delete
 
 from ..deps import SessionDep
+from ..etag import not_modified
 from ...models import Folder, Paper, PaperFolderLink
 
 router = APIRouter()
@@ -33,7 +34,10 @@ def _get_folder(session: SessionDep, folder_id: int) -> Folder:
 
 # ---------- Routes ----------
 @router.get("/", response_model=list[Folder])
-def list_folders(session: SessionDep):
+def list_folders(session: SessionDep, request: Request, response: Response):
+    cached = not_modified(request, response)
+    if cached is not None:
+        return cached
     # 统一按照 name 升序；树形在前端 buildTree
     return list(session.exec(select(Folder).order_by(Folder.name.asc())))
 
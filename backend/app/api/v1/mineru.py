@@ -11,11 +11,13 @@ from typing import Optional, List, Tuple
 from urllib.parse import urlparse, urlunparse, urlsplit, urlunsplit, quote
 
 import httpx
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from loguru import logger
 
+from ...services import passages
+
 router = APIRouter()
 
 # ===================== Models =====================
@@ -295,8 +297,15 @@ def _build_assets_base(cache_key: str) -> str:
     return f"{backend_base}/api/v1/mineru/assets/{cache_key}"
 
 
+def _schedule_passages(background: BackgroundTasks, paper_id: Optional[int], md: Optional[str],
+                       cache_key: str) -> None:
+    # 带 paper_id 的解析：响应返回后在后台切分段落并编码（同一 cache_key 不重复处理）
+    if paper_id is not None and md:
+        background.add_task(passages.index_paper, paper_id, md, cache_key)
+
+
 @router.post("/parse", response_model=ParseResp)
-async def parse_with_mineru(req: ParseReq) -> ParseResp:
+async def parse_with_mineru(req: ParseReq, background: BackgroundTasks) -> ParseResp:
     logger.info(f"[mineru] req pdf_path={req.pdf_path} pdf_url={req.pdf_url} paper_id={req.paper_id}")
 
     # 根目录：临时与缓存
@@ -364,6 +373,7 @@ async def parse_with_mineru(req: ParseReq) -> ParseResp:
                 pass
 
         logger.info(f"[mineru] cache hit: {out_dir} html={html_p} md={md_p}")
+        _schedule_passages(background, req.paper_id, md, cache_key)
         return ParseResp(
             used_mode="cache",
             out_dir=str(out_dir),
@@ -404,6 +414,7 @@ async def parse_with_mineru(req: ParseReq) -> ParseResp:
     md = md_p.read_text("utf-8", errors="ignore") if md_p and md_p.exists() else None
 
     logger.info(f"[mineru] ok html={bool(html)} md={bool(md)} out={out_dir}")
+    _schedule_passages(background, req.paper_id, md, cache_key)
 
     md_rel = ""
     md_base = ""
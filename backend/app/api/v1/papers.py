@@ -1,62 +1,40 @@
 # backend/app/api/v1/papers.py
 from __future__ import annotations
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request, Response
 from pydantic import BaseModel, Field
 from loguru import logger
 
-from sqlalchemy import delete, or_, and_
+from sqlalchemy import delete, func, literal, null, or_, and_, union_all
+from sqlalchemy.orm import load_only
 from sqlmodel import select
 
 from ..deps import SessionDep
+from ..etag import not_modified
+from ..responses import fast_json, load_columns, parse_fields
+from ..pagination import decode_cursor, encode_cursor, set_page_headers
 from ...models import (
     Paper, Tag, Author,
     PaperTagLink, PaperAuthorLink, Note,
     PaperFolderLink,   # 需要有该模型（用于目录过滤/分配）
 )
-from ...schemas import PaperRead, PaperUpdate
+from ...schemas import PaperHit, PaperRead, PaperUpdate, RecommendationHit
 from ...core.config import settings
 from ...services.pdf_parser import parse_pdf_metadata
 from ...services.doi_resolver import fetch_by_doi, DoiResolveError
+from ...services import embedding_generations, fulltext, knn_graph, paper_keys, passages
+from ...services.generation import GenerationCache
+from ...services.recommender import recommend_blended, recommend_related, recommend_similar
+from ...services.tag_index import (
+    tag_index, TagExprError, bitmap_condition, filter_bitmap,
+)
 
 router = APIRouter()
 
-def _norm_title(s: Optional[str]) -> str:
-    if not s:
-        return ""
-    import re
-    s = s.lower()
-    s = re.sub(r"[^a-z0-9]+", "", s)
-    return s
-
-# venue 缩写映射（与前端一致）
 import re as _re
-_VENUE_ABBR_PATTERNS: list[tuple[_re.Pattern[str], str]] = [
-    (_re.compile(r"(international symposium on microarchitecture|(^|\W)micro(\W|$))", _re.I), "MICRO"),
-    (_re.compile(r"programming language design and implementation|(^|\W)pldi(\W|$)", _re.I), "PLDI"),
-    (_re.compile(r"international symposium on computer architecture|(^|\W)isca(\W|$)", _re.I), "ISCA"),
-    (_re.compile(r"architectural support for programming languages|(^|\W)asplos?(\W|$)", _re.I), "ASPLOS"),
-    (_re.compile(r"transactions on architecture and code optimization|(^|\W)taco(\W|$)", _re.I), "TACO"),
-    (_re.compile(r"transactions on design automation of electronic systems|(^|\W)todaes(\W|$)", _re.I), "TODAES"),
-    (_re.compile(r"design automation conference|(^|\W)dac(\W|$)", _re.I), "DAC"),
-    (_re.compile(r"neurips|nips", _re.I), "NeurIPS"),
-    (_re.compile(r"international conference on machine learning|(^|\W)icml(\W|$)", _re.I), "ICML"),
-    (_re.compile(r"computer vision and pattern recognition|(^|\W)cvpr(\W|$)", _re.I), "CVPR"),
-    (_re.compile(r"international conference on computer vision|(^|\W)iccv(\W|$)", _re.I), "ICCV"),
-    (_re.compile(r"european conference on computer vision|(^|\W)eccv(\W|$)", _re.I), "ECCV"),
-    (_re.compile(r"very large data bases|(^|\W)vldb(\W|$)", _re.I), "VLDB"),
-    (_re.compile(r"sigmod", _re.I), "SIGMOD"),
-    (_re.compile(r"the web conference|(^|\W)www(\W|$)", _re.I), "WWW"),
-    (_re.compile(r"supercomputing|(^|\W)sc(\W|$)", _re.I), "SC"),
-    (_re.compile(r"siggraph", _re.I), "SIGGRAPH"),
-]
-def _venue_abbr(name: str | None) -> str | None:
-    if not name: return None
-    for pat, abbr in _VENUE_ABBR_PATTERNS:
-        if pat.search(name): return abbr
-    return None    
 
 # 识别 arXiv ID（仅用于弱提示/兜底，不发起网络请求）
 def _guess_arxiv_id_from_filename(name: str) -> str | None:
@@ -66,63 +44,103 @@ def _guess_arxiv_id_from_filename(name: str) -> str | None:
     if m: return m.group(1)
     return None
 
+_IN_CHUNK = 500   # 每条 IN (...) 的 id 数（SQLite 绑定参数有上限）
+
+def _chunks(ids: List[int]):
+    for i in range(0, len(ids), _IN_CHUNK):
+        yield ids[i:i + _IN_CHUNK]
+
+_PAYLOAD_COLUMNS = ("title", "abstract", "year", "doi", "venue", "pdf_url")
+_PAYLOAD_KEYS = ("id",) + _PAYLOAD_COLUMNS + ("tag_ids", "author_ids", "authors", "folder_ids")
+
+def _paper_payloads(session: SessionDep, papers: List[Any],
+                    fields: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+    """
+    整页论文 -> PaperRead 结构：标签 / 作者 / 目录各一次 IN 查询（每 500 篇一块），在内存里拼装。
+    fields：只拼这些键，也只查它们需要的 link 表；papers 可以是只加载了部分列的 Paper
+    """
+    keys = set(fields or _PAYLOAD_KEYS)
+    ids = [p.id for p in papers]
+    tag_ids = {pid: [] for pid in ids} if "tag_ids" in keys else None
+    author_ids = {pid: [] for pid in ids} if keys & {"author_ids", "authors"} else None
+    folder_ids = {pid: [] for pid in ids} if "folder_ids" in keys else None
+    for chunk in _chunks(ids):
+        if tag_ids is not None:
+            for pid, tid in session.exec(
+                select(PaperTagLink.paper_id, PaperTagLink.tag_id)
+                .where(PaperTagLink.paper_id.in_(chunk))
+            ):
+                tag_ids[pid].append(tid)
+        if author_ids is not None:
+            for pid, aid in session.exec(
+                select(PaperAuthorLink.paper_id, PaperAuthorLink.author_id)
+                .where(PaperAuthorLink.paper_id.in_(chunk))
+            ):
+                author_ids[pid].append(aid)
+        if folder_ids is not None:
+            for pid, fid in session.exec(
+                select(PaperFolderLink.paper_id, PaperFolderLink.folder_id)
+                .where(PaperFolderLink.paper_id.in_(chunk))
+            ):
+                folder_ids[pid].append(fid)
+
+    authors: Dict[int, Dict[str, Any]] = {}
+    if "authors" in keys:
+        wanted = sorted({aid for aids in author_ids.values() for aid in aids})
+        for chunk in _chunks(wanted):
+            for a in session.exec(select(Author).where(Author.id.in_(chunk))):
+                authors[a.id] = {"id": a.id, "name": a.name, "orcid": a.orcid,
+                                 "affiliation": a.affiliation}
+
+    columns = [k for k in _PAYLOAD_COLUMNS if k in keys]
+    out = []
+    for p in papers:
+        d: Dict[str, Any] = {"id": p.id}
+        for k in columns:
+            d[k] = getattr(p, k)
+        if tag_ids is not None:
+            d["tag_ids"] = tag_ids[p.id]
+        if "author_ids" in keys:
+            d["author_ids"] = author_ids[p.id]
+        if "authors" in keys:
+            d["authors"] = [authors[aid] for aid in author_ids[p.id] if aid in authors]
+        if folder_ids is not None:
+            d["folder_ids"] = folder_ids[p.id]
+        out.append(d)
+    return out
+
+def _load_papers(stmt, fields: Optional[Tuple[str, ...]], *extra):
+    """select(Paper) 只加载 payload 要的列（+ extra）；embedding 等大列从不读"""
+    return stmt.options(load_only(*load_columns(Paper, fields or _PAYLOAD_KEYS), *extra))
+
 def _paper_payload(session: SessionDep, paper_id: int) -> Dict[str, Any]:
     paper = session.get(Paper, paper_id)
     if not paper:
         raise HTTPException(status_code=404, detail="Not Found")
+    return _paper_payloads(session, [paper])[0]
 
-    # tag ids
-    tag_ids = [ln.tag_id for ln in session.exec(select(PaperTagLink).where(PaperTagLink.paper_id == paper_id))]
-    # authors（展开）
-    author_ids = [ln.author_id for ln in session.exec(select(PaperAuthorLink).where(PaperAuthorLink.paper_id == paper_id))]
-    authors_payload: List[Dict[str, Any]] = []
-    if author_ids:
-        authors = list(session.exec(select(Author).where(Author.id.in_(author_ids))))
-        for a in authors:
-            authors_payload.append({
-                "id": getattr(a, "id", None),
-                "name": getattr(a, "name", None),
-                "orcid": getattr(a, "orcid", None) if hasattr(a, "orcid") else None,
-                "affiliation": getattr(a, "affiliation", None) if hasattr(a, "affiliation") else None,
-            })
-
-    # 仅用于日志友好
-    tag_names = [t.name for t in session.exec(
-        select(Tag).join(PaperTagLink, PaperTagLink.tag_id == Tag.id).where(PaperTagLink.paper_id == paper_id)
-    )]
-    logger.info(f"[payload] paper#{paper_id} -> tag_ids={tag_ids}, tag_names={tag_names}")
-
-    return {
-        "id": paper.id,
-        "title": paper.title,
-        "abstract": paper.abstract,
-        "year": paper.year,
-        "doi": paper.doi,
-        "venue": paper.venue,
-        "pdf_url": paper.pdf_url,
-        "tag_ids": tag_ids,
-        "author_ids": author_ids,
-        "authors": authors_payload,
-    }
-
-@router.get("/", response_model=list[PaperRead])
-def list_papers(
-    session: SessionDep,
+def _list_filters(
+    stmt,
     q: Optional[str] = None,
     tag_id: Optional[int] = None,
     folder_id: Optional[int] = None,
-    year_min: Optional[int] = None,   # ✅ 新增
-    year_max: Optional[int] = None,   # ✅ 新增
-    venue: Optional[str] = None,      # ✅ 新增
-    venue_abbr: Optional[str] = None,   # 👈 新增
-    dedup: bool = True,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    venue: Optional[str] = None,
+    tags: Optional[str] = None,
+    tag_expr: Optional[str] = None,
+    venue_abbr: Optional[str] = None,
 ):
-    stmt = select(Paper)
+    """list_papers 的过滤条件（dedup 见 _list_select）"""
     if q:
-        qlike = f"%{q}%"
-        stmt = stmt.where(or_(Paper.title.ilike(qlike), Paper.venue.ilike(qlike), Paper.doi.ilike(qlike)))
-    if tag_id is not None:
-        stmt = stmt.join(PaperTagLink, PaperTagLink.paper_id == Paper.id).where(PaperTagLink.tag_id == tag_id)
+        stmt = stmt.where(fulltext.keyword_condition(q))
+    # 标签：位图索引求值（tag_id / 逗号 AND / 表达式），结果作为 id 集合下推
+    try:
+        bm = filter_bitmap(tags=tags, tag_expr=tag_expr, tag_id=tag_id)
+    except TagExprError as e:
+        raise HTTPException(status_code=400, detail=f"bad tag expression: {e}")
+    if bm is not None:
+        stmt = stmt.where(bitmap_condition(bm))
     if folder_id is not None:
         stmt = stmt.join(PaperFolderLink, PaperFolderLink.paper_id == Paper.id).where(PaperFolderLink.folder_id == folder_id)
 
@@ -131,6 +149,11 @@ def list_papers(
 
     if venue:
         conds.append(Paper.venue.ilike(f"%{venue}%"))
+    if venue_abbr:
+        # 逗号分隔、大小写不敏感；不认识的缩写匹配不到任何论文
+        wanted = {paper_keys.ABBR_BY_UPPER.get(x.strip().upper())
+                  for x in venue_abbr.split(",") if x.strip()}
+        conds.append(Paper.venue_abbr.in_(sorted(w for w in wanted if w)))
 
     # 只有当至少一个边界被提供时才筛年份
     if (year_min is not None) or (year_max is not None):
@@ -147,25 +170,259 @@ def list_papers(
     # 统一落到 stmt
     for c in conds:
         stmt = stmt.where(c)
+    return stmt
+
+def _seek_after(stmt, created_at: datetime, paper_id: int):
+    # keyset: ORDER BY created_at DESC, id DESC 之后的行
+    return stmt.where(or_(
+        Paper.created_at < created_at,
+        and_(Paper.created_at == created_at, Paper.id < paper_id),
+    ))
+
+_list_cache = GenerationCache(maxsize=settings.SEARCH_RESULT_CACHE_SIZE)
+
+def _norm_csv(value: Optional[str], upper: bool = False) -> Optional[Tuple[str, ...]]:
+    if not value:
+        return None
+    parts = {x.strip().upper() if upper else x.strip() for x in value.split(",") if x.strip()}
+    return tuple(sorted(parts)) or None
+
+def _norm_filters(filters: Dict[str, Any]) -> Tuple:
+    """缓存键：去掉空值与首尾空白，逗号列表排序（顺序不影响结果）"""
+    out = []
+    for k, v in sorted(filters.items()):
+        if isinstance(v, str):
+            v = _norm_csv(v) if k == "tags" else (v.strip() or None)
+        if v is not None:
+            out.append((k, v))
+    return tuple(out)
+
+_PAGE_SIZE = 200
+
+def _list_select(filters: Dict[str, Any], venue_abbr: Optional[str], dedup: bool, *cols):
+    """过滤后的 select(*cols)；dedup：同一去重键（DOI，否则规范化标题）只保留最新的一篇"""
+    if not dedup:
+        return _list_filters(select(*cols), venue_abbr=venue_abbr, **filters)
+    rn = func.row_number().over(
+        partition_by=paper_keys.dedup_key(), order_by=(Paper.created_at.desc(), Paper.id.desc())
+    ).label("rn")
+    ranked = _list_filters(select(Paper.id, rn), venue_abbr=venue_abbr, **filters).subquery()
+    return select(*cols).where(Paper.id.in_(select(ranked.c.id).where(ranked.c.rn == 1)))
+
+def _list_papers_page(session: SessionDep, filters: Dict[str, Any], venue_abbr: Optional[str],
+                      dedup: bool, limit: int, cursor: Optional[str], with_total: bool,
+                      fields: Optional[Tuple[str, ...]] = None):
+    """-> (items, next_cursor, total)"""
+    stmt = _list_select(filters, venue_abbr, dedup, Paper)
+
+    total = None
+    if with_total:
+        total = session.exec(select(func.count()).select_from(stmt.subquery())).one()
+    stmt = _load_papers(stmt, fields, Paper.created_at)   # created_at：游标
+
+    if cursor:
+        c_at, c_id = decode_cursor(cursor, 2)
+        try:
+            stmt = _seek_after(stmt, datetime.fromisoformat(c_at), int(c_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="invalid cursor")
+    stmt = stmt.order_by(Paper.created_at.desc(), Paper.id.desc())
 
-    stmt = stmt.order_by(Paper.created_at.desc())
+    # 分页：keyset，多取一行判断是否还有下一页
+    rows = list(session.exec(stmt.limit(limit + 1)))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return _paper_payloads(session, rows, fields), next_cursor, total
 
-    rows = list(session.exec(stmt))
-    if venue_abbr:
-        wanted = {x.strip().upper() for x in venue_abbr.split(",") if x.strip()}
-        rows = [p for p in rows if (_venue_abbr(getattr(p, "venue", None)) or "").upper() in wanted]
-    result = []
-    seen = set()
-    for p in rows:
-        key = p.doi or _norm_title(p.title)
-        if dedup and key in seen:
-            continue
-        seen.add(key)
-        result.append(_paper_payload(session, p.id))
-    return result
+
+@router.get("/", response_model=list[PaperRead])
+def list_papers(
+    session: SessionDep,
+    request: Request,
+    response: Response,
+    q: Optional[str] = None,
+    tag_id: Optional[int] = None,
+    folder_id: Optional[int] = None,
+    year_min: Optional[int] = None,   # ✅ 新增
+    year_max: Optional[int] = None,   # ✅ 新增
+    venue: Optional[str] = None,      # ✅ 新增
+    venue_abbr: Optional[str] = None,   # 👈 新增
+    tags: Optional[str] = None,         # 逗号分隔的标签名，全部命中
+    tag_expr: Optional[str] = None,     # 标签表达式：a AND (b OR NOT c)
+    dedup: bool = True,
+    limit: int = Query(_PAGE_SIZE, ge=1, le=1000),       # 每页条数；更多的沿 X-Next-Cursor 取
+    cursor: Optional[str] = None,                        # 上一页响应头 X-Next-Cursor
+    with_total: bool = False,                            # 响应头 X-Total-Count
+    fields: Optional[str] = None,                        # 只返回这些字段：id,title,tag_ids
+):
+    keys = parse_fields(fields, PaperRead)
+    cached = not_modified(request, response)
+    if cached is not None:
+        return cached
+    filters = dict(q=q, tag_id=tag_id, folder_id=folder_id, year_min=year_min, year_max=year_max,
+                   venue=venue, tags=tags, tag_expr=tag_expr)
+    # 同一组过滤条件反复出现：按规范化参数 + 库代数缓存整页结果（含分页头）
+    key = ("list", _norm_filters(filters), _norm_csv(venue_abbr, upper=True), dedup, limit, cursor,
+           with_total, keys)
+    items, next_cursor, total = _list_cache.get_or_compute(
+        key, lambda: _list_papers_page(session, filters, venue_abbr, dedup, limit, cursor,
+                                       with_total, keys)
+    )
+    set_page_headers(response, next_cursor, total)
+    return fast_json(items, PaperRead, response, keys)
+
+_facet_cache = GenerationCache(maxsize=128)
+
+def _compute_facets(session: SessionDep, filters: Dict[str, Any],
+                    venue_abbr: Optional[str], dedup: bool) -> Dict[str, Any]:
+    # 计数全在库里：过滤 / 去重与 list_papers 同一个子查询（CTE，只算一次），
+    # venue×年份、目录、标签三路 GROUP BY 合成一条语句，只回传分组结果
+    hits = _list_select(filters, venue_abbr, dedup,
+                        Paper.id, Paper.venue_abbr, Paper.year).cte("hits")
+    stmt = union_all(
+        select(literal("v"), hits.c.venue_abbr, hits.c.year, null(), func.count())
+        .group_by(hits.c.venue_abbr, hits.c.year),
+        select(literal("f"), null(), null(), PaperFolderLink.folder_id, func.count())
+        .join(hits, hits.c.id == PaperFolderLink.paper_id).group_by(PaperFolderLink.folder_id),
+        select(literal("t"), null(), null(), PaperTagLink.tag_id, func.count())
+        .join(hits, hits.c.id == PaperTagLink.paper_id).group_by(PaperTagLink.tag_id),
+    )
+    venues: Dict[Optional[str], int] = {}
+    years: Dict[Optional[int], int] = {}
+    folders: Dict[int, int] = {}
+    tag_counts: Dict[int, int] = {}
+    total = 0
+    for kind, abbr, year, ref, n in session.exec(stmt):
+        if kind == "v":
+            total += n
+            venues[abbr] = venues.get(abbr, 0) + n
+            years[year] = years.get(year, 0) + n
+        elif kind == "f":
+            folders[ref] = n
+        else:
+            tag_counts[ref] = n
+    tag_names = tag_index.names_by_id()
+
+    def ranked(d: Dict[Any, int], key: str) -> List[Dict[str, Any]]:
+        ranked = sorted(d.items(), key=lambda kv: (-kv[1], str(kv[0])))
+        return [{key: k, "count": n} for k, n in ranked]
+
+    return {
+        "total": total,
+        "venue_abbr": ranked(venues, "value"),
+        "year": [{"value": y, "count": n} for y, n in
+                 sorted(years.items(), key=lambda kv: (kv[0] is None, -(kv[0] or 0)))],
+        "tag": [{"id": tid, "name": tag_names.get(tid), "count": n} for tid, n in
+                sorted(tag_counts.items(), key=lambda kv: (-kv[1], kv[0]))],
+        "folder": ranked(folders, "id"),
+    }
+
+@router.get("/facets")
+def paper_facets(
+    session: SessionDep,
+    q: Optional[str] = None,
+    tag_id: Optional[int] = None,
+    folder_id: Optional[int] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    venue: Optional[str] = None,
+    venue_abbr: Optional[str] = None,
+    tags: Optional[str] = None,
+    tag_expr: Optional[str] = None,
+    dedup: bool = True,
+):
+    """侧边栏计数：与 list_papers 相同的过滤条件下，按 venue 缩写 / 年份 / 标签 / 目录聚合"""
+    filters = dict(q=q, tag_id=tag_id, folder_id=folder_id, year_min=year_min, year_max=year_max,
+                   venue=venue, tags=tags, tag_expr=tag_expr)
+    key = (_norm_filters(filters), _norm_csv(venue_abbr, upper=True), dedup)
+    return _facet_cache.get_or_compute(
+        key, lambda: _compute_facets(session, filters, venue_abbr, dedup))
+
+def _scored_papers(session: SessionDep, hits: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+    """(id, score) 列表 -> 按原顺序的论文 + score（一次 IN 查询）"""
+    if not hits:
+        return []
+    ids = [pid for pid, _ in hits]
+    by_id = {p.id: p for p in session.exec(select(Paper).where(Paper.id.in_(ids)))}
+    out = []
+    for pid, score in hits:
+        p = by_id.get(pid)
+        if p is not None:
+            d = p.model_dump(exclude={"embedding"})
+            d["score"] = score
+            out.append(d)
+    return out
+
+# 注意：必须注册在 /{paper_id} 之前
+_BATCH_MAX = 1000
+
+@router.get("/batch", response_model=List[PaperRead])
+def get_papers_batch(session: SessionDep, request: Request, response: Response, ids: str,
+                     fields: Optional[str] = None):
+    """多篇论文一次取回（逗号分隔的 id，按给定顺序；不存在的 id 跳过），可配 fields="""
+    keys = parse_fields(fields, PaperRead)
+    try:
+        wanted = list(dict.fromkeys(int(x) for x in ids.split(",") if x.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if len(wanted) > _BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"at most {_BATCH_MAX} ids per request")
+    cached = not_modified(request, response)
+    if cached is not None:
+        return cached
+    by_id = {}
+    for chunk in _chunks(wanted):
+        for p in session.exec(_load_papers(select(Paper).where(Paper.id.in_(chunk)), keys)):
+            by_id[p.id] = p
+    papers = [by_id[pid] for pid in wanted if pid in by_id]
+    return fast_json(_paper_payloads(session, papers, keys), PaperRead, response, keys)
+
+@router.get("/similar", response_model=List[PaperHit])
+def related_papers(session: SessionDep, folder_id: Optional[int] = None,
+                   tag_id: Optional[int] = None, ids: Optional[str] = None, limit: int = 20):
+    """与一组论文（目录 / 标签 / 逗号分隔的 id）最相关的论文：合并它们的 kNN 邻居列表"""
+    if folder_id is not None:
+        seeds: Any = select(PaperFolderLink.paper_id).where(PaperFolderLink.folder_id == folder_id)
+    elif tag_id is not None:
+        seeds = select(PaperTagLink.paper_id).where(PaperTagLink.tag_id == tag_id)
+    elif ids:
+        try:
+            seeds = [int(x) for x in ids.split(",") if x.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    else:
+        raise HTTPException(status_code=400, detail="one of folder_id, tag_id or ids is required")
+    limit = max(1, min(limit, 200))
+    return _scored_papers(session, recommend_related(session, seeds, limit))
+
+@router.get("/{paper_id}/similar", response_model=List[PaperHit])
+def similar_papers(paper_id: int, session: SessionDep,
+                   limit: int = Query(10, ge=1, le=settings.KNN_GRAPH_K)):
+    """kNN 图里预先算好的相似论文（主键范围读，O(k)）；limit 上限是图里每篇存的 K 个"""
+    if session.exec(select(Paper.id).where(Paper.id == paper_id)).first() is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    k = min(limit, settings.KNN_GRAPH_K)      # K 配得比默认 10 还小时
+    return _scored_papers(session, recommend_similar(session, paper_id, k))
+
+@router.get("/{paper_id}/recommendations", response_model=List[RecommendationHit])
+def recommended_papers(paper_id: int, session: SessionDep, limit: int = 10):
+    """相似度 + 共同作者 + 共同标签的加权推荐（权重见 IP_RECOMMEND_WEIGHT_*）"""
+    if session.exec(select(Paper.id).where(Paper.id == paper_id)).first() is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    recs = recommend_blended(session, paper_id, max(1, min(limit, 50)))
+    items = _scored_papers(session, [(r["id"], r["score"]) for r in recs])
+    signals = {r["id"]: r["signals"] for r in recs}
+    for item in items:
+        item["signals"] = signals[item["id"]]
+    return items
 
 @router.get("/{paper_id}", response_model=PaperRead)
-def get_paper(paper_id: int, session: SessionDep):
+def get_paper(paper_id: int, session: SessionDep, request: Request, response: Response):
+    cached = not_modified(request, response)
+    if cached is not None:
+        return cached
     return _paper_payload(session, paper_id)
 
 @router.patch("/{paper_id}", response_model=PaperRead)
@@ -177,6 +434,7 @@ def update_paper(paper_id: int, data: PaperUpdate, session: SessionDep):
         if field in {"tag_ids", "author_ids"}:
             continue
         setattr(paper, field, value)
+    paper.updated_at = datetime.utcnow()
     session.add(paper)
     session.commit()
     session.refresh(paper)
@@ -417,6 +675,9 @@ def delete_paper(paper_id: int, session: SessionDep):
     session.exec(delete(Note).where(Note.paper_id == paper_id))
     # 解除目录关系
     session.exec(delete(PaperFolderLink).where(PaperFolderLink.paper_id == paper_id))
+    passage_ids = passages.delete_for_paper(session, paper_id)
+    embedding_generations.delete_slots(session, paper_id)
+    knn_graph.delete_edges(session, paper_id)
     try:
         if paper.pdf_url and paper.pdf_url.startswith("/files/"):
             rel = paper.pdf_url.replace("/files/", "")
@@ -426,6 +687,7 @@ def delete_paper(paper_id: int, session: SessionDep):
     except Exception:
         pass
     session.delete(paper); session.commit()
+    passages.forget(passage_ids)
     logger.info(f"[delete] paper#{paper_id} removed")
     return {"ok": True}
 
@@ -470,8 +732,8 @@ async def _upload_one(
             resolved = await fetch_by_doi(norm_doi)
             rt = (resolved.get("title") or "")
             mt = (data.get("title") or "")
-            nt_r = _norm_title(rt)
-            nt_m = _norm_title(mt)
+            nt_r = paper_keys.norm_title(rt)
+            nt_m = paper_keys.norm_title(mt)
             match_ok = bool(nt_r and nt_m and (nt_r in nt_m or nt_m in nt_r))
             if not match_ok:
                 logger.warning(f"[upload] dropping DOI from PDF ({norm_doi}) – title mismatch: parsed='{mt}' vs resolved='{rt}'")
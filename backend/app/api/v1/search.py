@@ -1,56 +1,310 @@
 
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import select, and_
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, or_
+from sqlalchemy.orm import load_only
+from sqlmodel import Session, select, and_
 from ..deps import SessionDep
+from ..pagination import decode_cursor, encode_cursor, set_page_headers
+from ..responses import fast_json, load_columns, parse_fields
+from ...core.config import settings
+from ...db.database import engine
 from ...models import Paper, Tag, PaperTagLink
-from ...schemas import PaperRead
-from ...services.embedding import embed_texts
+from ...schemas import PaperRead, PaperHit, HybridSearchResult, PassageHit
+from ...services import fulltext, passages, pgvector_search
+from ...services.embedding import embed_query, query_cache
+from ...services.embedding_cache import embedding_cache
+from ...services.embedding_worker import get_executor
+from ...services.embedding_generations import active_generation
+from ...services.embedding_pipeline import embedding_pipeline
+from ...services.generation import GenerationCache
+from ...services.knn_graph import knn_graph
+from ...services.recommender import cooccurrence
+from ...services.vector_index import vector_index
+from ...services.tag_index import TagExprError, bitmap_condition, filter_bitmap
 
 router = APIRouter()
 
-@router.get("/", response_model=List[PaperRead])
-def search(session: SessionDep, q: str = "", tags: Optional[str] = None, venue: Optional[str] = None,
-           year_from: Optional[int] = None, year_to: Optional[int] = None,
-           limit: int = 20, offset: int = 0):
-    stmt = select(Paper)
-    if q:
-        stmt = stmt.where(Paper.title.ilike(f"%{q}%") | Paper.abstract.ilike(f"%{q}%"))
+def _papers_in_order(session: SessionDep, ids: List[int]) -> List[Paper]:
+    """按 ids 顺序取回 Paper（一次 IN 查询）"""
+    if not ids:
+        return []
+    rows = session.exec(select(Paper).where(Paper.id.in_(ids))).all()
+    by_id = {p.id: p for p in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+def _apply_filters(stmt, tags: Optional[str] = None, venue: Optional[str] = None,
+                   year_from: Optional[int] = None, year_to: Optional[int] = None,
+                   tag_expr: Optional[str] = None):
     if venue:
         stmt = stmt.where(Paper.venue.ilike(f"%{venue}%"))
     if year_from:
         stmt = stmt.where(Paper.year >= year_from)
     if year_to:
         stmt = stmt.where(Paper.year <= year_to)
-    if tags:
-        tag_list = [t.strip() for t in tags.split(",") if t.strip()]
-        for t in tag_list:
-            stmt = stmt.where(Paper.id.in_(select(PaperTagLink.paper_id).join(Tag, Tag.id==PaperTagLink.tag_id).where(Tag.name==t)))
-    stmt = stmt.offset(offset).limit(limit)
-    return session.exec(stmt).all()
+    # 标签过滤先在位图索引里算好，再以 id 集合下推到 SQL
+    try:
+        bm = filter_bitmap(tags=tags, tag_expr=tag_expr)
+    except TagExprError as e:
+        raise HTTPException(status_code=400, detail=f"bad tag expression: {e}")
+    if bm is not None:
+        stmt = stmt.where(bitmap_condition(bm))
+    return stmt
+
+def _score_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    if not cursor:
+        return None
+    score, pid = decode_cursor(cursor, 2)
+    try:
+        return float(score), int(pid)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+def _count(session: SessionDep, stmt) -> int:
+    return session.exec(select(func.count()).select_from(stmt.order_by(None).subquery())).one()
+
+_HIT_COLUMNS = tuple(c.key for c in load_columns(Paper, PaperHit.model_fields))
+
+def _hit(p: Paper, score: Optional[float] = None, snippet: Optional[str] = None,
+         fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+    # 只读要返回的列：p 可能是 load_only 加载的部分 Paper
+    d = {k: getattr(p, k) for k in _HIT_COLUMNS if fields is None or k in fields}
+    d["score"] = score
+    d["snippet"] = snippet
+    return d
+
+def _load_hits(stmt, fields: Optional[Tuple[str, ...]]):
+    """只加载命中要返回的列（+ created_at 供游标），abstract / embedding 不请求就不读"""
+    return stmt.options(load_only(*load_columns(Paper, fields or _HIT_COLUMNS), Paper.created_at))
+
+_search_cache = GenerationCache(maxsize=settings.SEARCH_RESULT_CACHE_SIZE)
+
+def _tags_key(tags: Optional[str]) -> Optional[Tuple[str, ...]]:
+    names = {t.strip() for t in (tags or "").split(",") if t.strip()}
+    return tuple(sorted(names)) or None
+
+def _search_page(session: SessionDep, q: str, tags: Optional[str], venue: Optional[str],
+                 year_from: Optional[int], year_to: Optional[int], limit: int, offset: int,
+                 cursor: Optional[str], with_total: bool, tag_expr: Optional[str],
+                 fields: Optional[Tuple[str, ...]] = None):
+    """-> (items, next_cursor, total)"""
+    if q:
+        # 走全文索引：BM25 排序 + 高亮片段；cursor = (score, id)
+        after = _score_cursor(cursor)
+        base = _apply_filters(fulltext.ranked_select(q), tags, venue, year_from, year_to, tag_expr)
+        total = _count(session, base) if with_total else None
+        stmt = _apply_filters(fulltext.ranked_select(q, after=after),
+                              tags, venue, year_from, year_to, tag_expr)
+        if after is None:
+            stmt = stmt.offset(offset)
+        rows = session.exec(_load_hits(stmt, fields).limit(limit)).all()
+        items = [_hit(p, float(score) if score is not None else None, snippet, fields)
+                 for p, score, snippet in rows]
+        nxt = encode_cursor(items[-1]["score"], items[-1]["id"]) if len(items) == limit else None
+        return items, nxt, total
+
+    # 无关键词：按 (created_at, id) 倒序 keyset
+    base = _apply_filters(select(Paper), tags, venue, year_from, year_to, tag_expr)
+    total = _count(session, base) if with_total else None
+    stmt = base
+    if cursor:
+        c_at, c_id = decode_cursor(cursor, 2)
+        try:
+            c_at, c_id = datetime.fromisoformat(c_at), int(c_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        stmt = stmt.where(or_(Paper.created_at < c_at,
+                              and_(Paper.created_at == c_at, Paper.id < c_id)))
+    else:
+        stmt = stmt.offset(offset)
+    stmt = _load_hits(stmt, fields).order_by(Paper.created_at.desc(), Paper.id.desc())
+    rows = session.exec(stmt.limit(limit)).all()
+    nxt = encode_cursor(rows[-1].created_at, rows[-1].id) if len(rows) == limit else None
+    return [_hit(p, fields=fields) for p in rows], nxt, total
+
+@router.get("/", response_model=List[PaperHit])
+def search(session: SessionDep, response: Response, q: str = "", tags: Optional[str] = None,
+           venue: Optional[str] = None, year_from: Optional[int] = None,
+           year_to: Optional[int] = None, limit: int = 20, offset: int = 0,
+           cursor: Optional[str] = None, with_total: bool = False,
+           tag_expr: Optional[str] = None, fields: Optional[str] = None):
+    q = q.strip()
+    keys = parse_fields(fields, PaperHit, available=_HIT_COLUMNS + ("score", "snippet"))
+    # 结果页按规范化参数 + 库代数缓存；任何写库提交都会让旧条目失效
+    key = ("search", q, _tags_key(tags), (venue or "").strip().lower() or None, year_from, year_to,
+           (tag_expr or "").strip() or None, limit, offset if not cursor else 0, cursor, with_total,
+           keys)
+    items, nxt, total = _search_cache.get_or_compute(
+        key, lambda: _search_page(session, q, tags, venue, year_from, year_to, limit, offset,
+                                  cursor, with_total, tag_expr, keys)
+    )
+    set_page_headers(response, nxt, total)
+    return fast_json(items, PaperHit, response, keys)
+
+def _has_filters(tags, venue, year_from, year_to, tag_expr) -> bool:
+    return bool(tags or venue or year_from or year_to or tag_expr)
+
+def _vector_hits(session: SessionDep, query_vec: List[float], k: int, filters: Tuple,
+                 offset: int = 0, after: Optional[Tuple[float, int]] = None,
+                 nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+    """向量 top-k：Postgres 在库内走 pgvector 索引（过滤条件同一条 SQL），否则用进程内索引"""
+    if pgvector_search.enabled():
+        where = (lambda stmt: _apply_filters(stmt, *filters)) if _has_filters(*filters) else None
+        return pgvector_search.search(session, query_vec, k=k, offset=offset, after=after,
+                                      where=where, nprobe=nprobe)
+    allowed = None
+    if _has_filters(*filters):
+        allowed = set(session.exec(_apply_filters(select(Paper.id), *filters)).all())
+    return vector_index.search(query_vec, k=k, offset=0 if after else offset, after=after,
+                               allowed=allowed, nprobe=nprobe)
 
 @router.get("/semantic", response_model=List[PaperRead])
-def semantic(session: SessionDep, q: str, limit: int = 20, offset: int = 0):
+def semantic(session: SessionDep, response: Response, q: str, limit: int = 20, offset: int = 0,
+             cursor: Optional[str] = None, nprobe: Optional[int] = None,
+             tags: Optional[str] = None, venue: Optional[str] = None,
+             year_from: Optional[int] = None, year_to: Optional[int] = None,
+             tag_expr: Optional[str] = None):
     # simple semantic search using embeddings if available, otherwise fallback to keyword
-    query_vec = embed_texts([q])[0]
+    after = _score_cursor(cursor)
+    filters = (tags, venue, year_from, year_to, tag_expr)
+    query_vec = embed_query(q)
+    if sum(abs(x) for x in query_vec) < 1e-6:
+        # fallback: 关键词（全文索引）
+        stmt = _apply_filters(fulltext.ranked_select(q, after=after), *filters)
+        if after is None:
+            stmt = stmt.offset(offset)
+        rows = session.exec(stmt.limit(limit)).all()
+        if len(rows) == limit:
+            set_page_headers(response, encode_cursor(float(rows[-1][1]), rows[-1][0].id))
+        return [p for p, _, _ in rows]
+    hits = _vector_hits(session, query_vec, limit, filters, offset=offset, after=after,
+                        nprobe=nprobe)
+    if len(hits) == limit:
+        pid, score = hits[-1]
+        set_page_headers(response, encode_cursor(score, pid))
+    return _papers_in_order(session, [pid for pid, _ in hits])
+
+@router.get("/passages", response_model=List[PassageHit])
+def passage_search(session: SessionDep, q: str, limit: int = 20, paper_id: Optional[int] = None,
+                   per_paper: int = 3, nprobe: Optional[int] = None):
+    """段落级语义检索（MinerU 全文）：返回命中段落及所属论文、章节"""
+    query_vec = embed_query(q)
     if sum(abs(x) for x in query_vec) < 1e-6:
-        # fallback
-        stmt = select(Paper).where(Paper.title.ilike(f"%{q}%") | Paper.abstract.ilike(f"%{q}%")).offset(offset).limit(limit)
-        return session.exec(stmt).all()
-    # naive linear search in Python for SQLite (no pgvector)
-    papers = session.exec(select(Paper)).all()
-    scored = []
-    for p in papers:
-        vec = getattr(p, "embedding", None) or getattr(p, "embedding_json", None)
-        if not vec:
-            continue
-        # cosine similarity
-        import math
-        dot = sum(a*b for a,b in zip(vec, query_vec))
-        na = math.sqrt(sum(a*a for a in vec))
-        nb = math.sqrt(sum(b*b for b in query_vec))
-        if na*nb == 0: 
-            continue
-        scored.append((dot/(na*nb), p))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [p for _, p in scored[offset:offset+limit]]
+        raise HTTPException(status_code=503, detail="embedding model unavailable")
+    hits = passages.search(query_vec, k=limit, paper_id=paper_id, per_paper=per_paper,
+                           nprobe=nprobe)
+    papers = {p.id: p for p in _papers_in_order(session, list({row.paper_id for row, _ in hits}))}
+    return [
+        {
+            "passage_id": row.id,
+            "paper": papers[row.paper_id],
+            "section": row.section,
+            "ordinal": row.ordinal,
+            "snippet": row.text,
+            "score": score,
+        }
+        for row, score in hits if row.paper_id in papers
+    ]
+
+# ---------- hybrid: lexical + vector, reciprocal rank fusion ----------
+def _lexical_candidates(q: str, depth: int,
+                        filters: Tuple) -> Tuple[List[Tuple[int, Optional[str]]], float]:
+    t0 = time.perf_counter()
+    with Session(engine) as session:
+        stmt = _apply_filters(fulltext.ranked_select(q), *filters).limit(depth)
+        rows = session.exec(stmt).all()
+    return [(p.id, snippet) for p, _, snippet in rows], (time.perf_counter() - t0) * 1000
+
+def _vector_candidates(q: str, depth: int, filters: Tuple,
+                       nprobe: Optional[int]) -> Tuple[Optional[List[int]], Dict[str, float]]:
+    timings: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    query_vec = embed_query(q)
+    t1 = time.perf_counter()
+    timings["embed"] = (t1 - t0) * 1000
+    if sum(abs(x) for x in query_vec) < 1e-6:
+        timings["vector"] = 0.0
+        return None, timings     # 模型不可用：显式标记，不偷偷降级
+    with Session(engine) as session:
+        hits = _vector_hits(session, query_vec, depth, filters, nprobe=nprobe)
+    timings["vector"] = (time.perf_counter() - t1) * 1000
+    return [pid for pid, _ in hits], timings
+
+def _rrf(rankings: List[List[int]], k: int) -> List[Tuple[int, float]]:
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, pid in enumerate(ranking, start=1):
+            scores[pid] = scores.get(pid, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+
+def _hydrate(ids: List[int]) -> List[Paper]:
+    with Session(engine) as session:
+        return _papers_in_order(session, ids)
+
+@router.get("/hybrid", response_model=HybridSearchResult)
+async def hybrid(q: str, tags: Optional[str] = None, venue: Optional[str] = None,
+                 year_from: Optional[int] = None, year_to: Optional[int] = None,
+                 limit: int = Query(20, ge=1, le=200),
+                 offset: int = Query(0, ge=0, le=settings.HYBRID_MAX_DEPTH),
+                 tag_expr: Optional[str] = None,
+                 depth: int = Query(100, ge=1, le=settings.HYBRID_MAX_DEPTH),
+                 rrf_k: int = Query(60, ge=1), nprobe: Optional[int] = None):
+    """Run keyword (BM25) and vector retrieval concurrently and fuse them with RRF."""
+    t0 = time.perf_counter()
+    filters = (tags, venue, year_from, year_to, tag_expr)
+    # 每路候选数封顶：offset + limit 超出上限的部分不会有结果
+    depth = min(max(depth, offset + limit), settings.HYBRID_MAX_DEPTH)
+    (lex, lex_ms), (vec, vec_timings) = await asyncio.gather(
+        run_in_threadpool(_lexical_candidates, q, depth, filters),
+        run_in_threadpool(_vector_candidates, q, depth, filters, nprobe),
+    )
+
+    t1 = time.perf_counter()
+    lex_ids = [pid for pid, _ in lex]
+    fused = _rrf([lex_ids, vec or []], rrf_k)[offset:offset + limit]
+    snippets = {pid: snip for pid, snip in lex}
+    t2 = time.perf_counter()
+
+    papers = await run_in_threadpool(_hydrate, [pid for pid, _ in fused])
+    score_of = dict(fused)
+    items = [_hit(p, score_of[p.id], snippets.get(p.id)) for p in papers]
+    t3 = time.perf_counter()
+
+    timings = {
+        "lexical": lex_ms,
+        **vec_timings,
+        "fuse": (t2 - t1) * 1000,
+        "hydrate": (t3 - t2) * 1000,
+        "total": (t3 - t0) * 1000,
+    }
+    return {
+        "items": items,
+        "timings": {k: round(v, 3) for k, v in timings.items()},
+        "lexical_hits": len(lex_ids),
+        "vector_hits": len(vec or []),
+        "vector_available": vec is not None,
+    }
+
+
+@router.get("/stats")
+def stats():
+    """Monitoring counters for the search caches and the vector index."""
+    gen = active_generation()
+    executor = get_executor()
+    return {
+        "query_embedding_cache": query_cache.stats(),
+        "embedding_disk_cache": embedding_cache.stats(),
+        "embedding_workers": executor.stats() if executor is not None else {"workers": 0},
+        "search_result_cache": _search_cache.stats(),
+        "vector_index": ({"kind": f"pgvector-{settings.PGVECTOR_INDEX}"}
+                         if pgvector_search.enabled() else vector_index.stats()),
+        "passage_index": passages.passage_index.stats(),
+        "embedding_pipeline": embedding_pipeline.stats(),
+        "knn_graph": knn_graph.stats(),
+        "cooccurrence": cooccurrence.stats(),
+        "embedding_generation": {"id": gen.id, "model": gen.model, "dim": gen.dim},
+    }
@@ -1,22 +1,32 @@
 from __future__ import annotations
 from typing import List
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from sqlmodel import select
 from sqlalchemy import delete
 from loguru import logger
 
 from ..deps import SessionDep
+from ..etag import not_modified
 from ...models import Tag, PaperTagLink
 from ...schemas import TagRead, TagCreate
+from ...services.tag_index import tag_index
 
 router = APIRouter()
 
 @router.get("/", response_model=list[TagRead])
-def list_tags(session: SessionDep):
+def list_tags(session: SessionDep, request: Request, response: Response):
+    cached = not_modified(request, response)
+    if cached is not None:
+        return cached
     rows = list(session.exec(select(Tag)))
     logger.info(f"[tags.list] total={len(rows)} -> {[t.name for t in rows]}")
     return rows
 
+@router.get("/counts")
+def tag_counts():
+    """每个标签下的论文数（来自内存位图索引）"""
+    return {str(tid): n for tid, n in tag_index.counts().items()}
+
 @router.post("/", response_model=TagRead)
 def create_tag(payload: TagCreate, session: SessionDep):
     name = (payload.name or "").strip()
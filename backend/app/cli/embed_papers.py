@@ -0,0 +1,51 @@
+"""Backfill paper embeddings (title + abstract) for papers that have none.
+
+    python -m app.cli.embed_papers [--all] [--batch 1024] [--limit N]
+"""
+import argparse
+import sys
+
+from sqlmodel import Session
+
+from ..core.config import settings
+from ..db.database import engine, init_db
+from ..services import pgvector_search
+from ..services.embedding_pipeline import backfill, missing_count
+from ..services.vector_index import vector_index
+
+
+def _progress(done: int, total: int, elapsed: float) -> None:
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else 0.0
+    print(f"\r[embed] {done}/{total} papers  {rate:.0f}/s  eta {eta:.0f}s", end="",
+          file=sys.stderr, flush=True)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--all", action="store_true",
+                    help="re-embed every paper, not only missing ones")
+    ap.add_argument("--batch", type=int, default=settings.EMBEDDING_WRITE_BATCH,
+                    help="papers per embed + UPDATE round (model batch: IP_EMBEDDING_BATCH_SIZE)")
+    ap.add_argument("--limit", type=int, default=None, help="stop after N papers")
+    args = ap.parse_args()
+
+    init_db()
+    with Session(engine) as s:
+        todo = missing_count(s, everything=args.all)
+    print(f"[embed] {todo} papers to embed")
+    if not todo:
+        return
+    if not pgvector_search.enabled():
+        # 先载入进程内索引，回填的向量直接并入，最后落快照供 API 启动加载
+        vector_index.ensure_built()
+    done = backfill(everything=args.all, batch_size=args.batch, limit=args.limit,
+                    progress=_progress)
+    print(file=sys.stderr)
+    vector_index.save()
+    print(f"Embedded {done} papers; "
+          f"run `python -m app.cli.knn_graph` to refresh similar-paper lists")
+
+
+if __name__ == "__main__":
+    main()
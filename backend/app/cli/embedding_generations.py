@@ -0,0 +1,89 @@
+"""Manage embedding generations: re-embed the library with another model, then switch atomically.
+
+    python -m app.cli.embedding_generations status
+    python -m app.cli.embedding_generations models
+    python -m app.cli.embedding_generations start bge-base-en-v1.5     # open a building generation
+    python -m app.cli.embedding_generations fill [GEN] [--batch 1024]  # backfill it (resumable)
+    python -m app.cli.embedding_generations activate GEN [--force]     # cut over
+    python -m app.cli.embedding_generations drop GEN                   # delete retired / building
+"""
+import argparse
+import sys
+
+from ..db.database import init_db
+from ..services import embedding_generations as gens
+from ..services.embedding_models import list_models
+from ..services.embedding_pipeline import fill_generation
+
+
+def _progress(done: int, total: int, elapsed: float) -> None:
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else 0.0
+    print(f"\r[fill] {done}/{total} papers  {rate:.0f}/s  eta {eta:.0f}s", end="",
+          file=sys.stderr, flush=True)
+
+
+def _print_status() -> None:
+    for g in gens.status():
+        extra = f"  missing={g['missing']}" if "missing" in g else ""
+        print(f"#{g['id']:<3} {g['status']:<9} {g['model']:<22} dim={g['dim']:<5} "
+              f"vectors={g['vectors']}{extra}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status")
+    sub.add_parser("models")
+    p = sub.add_parser("start")
+    p.add_argument("model")
+    p = sub.add_parser("fill")
+    p.add_argument("gen", type=int, nargs="?", help="default: the (single) building generation")
+    p.add_argument("--batch", type=int, default=None)
+    p.add_argument("--limit", type=int, default=None)
+    p = sub.add_parser("activate")
+    p.add_argument("gen", type=int)
+    p.add_argument("--force", action="store_true",
+                   help="switch even if some papers lack a new vector")
+    p = sub.add_parser("drop")
+    p.add_argument("gen", type=int)
+    args = ap.parse_args()
+
+    init_db()
+    try:
+        if args.cmd == "status":
+            _print_status()
+        elif args.cmd == "models":
+            for m in list_models():
+                print(f"{m.key:<22} dim={m.dim:<5} {m.hf_name}")
+        elif args.cmd == "start":
+            gen = gens.start_generation(args.model)
+            print(f"generation #{gen.id} building ({gen.model}); next: fill {gen.id}")
+        elif args.cmd == "fill":
+            gen_id = args.gen
+            if gen_id is None:
+                building = [g for g in gens.status() if g["status"] == "building"]
+                if len(building) != 1:
+                    ids = [g["id"] for g in building]
+                    raise ValueError(f"pass a generation id (building: {ids})")
+                gen_id = building[0]["id"]
+            n = fill_generation(gen_id, batch_size=args.batch, limit=args.limit, progress=_progress)
+            print(file=sys.stderr)
+            print(f"Embedded {n} papers into generation #{gen_id}")
+            _print_status()
+        elif args.cmd == "activate":
+            gen = gens.activate(args.gen, force=args.force)
+            print(f"generation #{gen.id} ({gen.model}) is now active")
+            _print_status()
+            print("similar-paper lists are recomputed on demand; "
+                  "run `python -m app.cli.knn_graph` to rebuild them all")
+        elif args.cmd == "drop":
+            n = gens.drop_generation(args.gen)
+            print(f"dropped generation #{args.gen} ({n} vectors)")
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,14 @@ from sqlmodel import select
 from ..db.database import get_session
 from ..models import Paper, Author, Tag, Note
 
+def _json_default(o):
+    # datetime / packed embeddings (numpy) -> JSON
+    if hasattr(o, "tolist"):
+        return o.tolist()
+    if hasattr(o, "isoformat"):
+        return o.isoformat()
+    raise TypeError(f"not JSON serializable: {type(o).__name__}")
+
 def export_json(path: str = "export.json"):
     with next(get_session()) as s:
         data = {
@@ -13,7 +21,8 @@ def export_json(path: str = "export.json"):
             "tags": [t.dict() for t in s.exec(select(Tag)).all()],
             "notes": [n.dict() for n in s.exec(select(Note)).all()],
         }
-    Path(path).write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    Path(path).write_text(json.dumps(data, ensure_ascii=False, indent=2, default=_json_default),
+                          encoding="utf-8")
     print(f"Wrote {path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,33 @@
+"""Export an embedding model to ONNX (+ dynamic int8) for IP_EMBEDDING_BACKEND=onnx.
+
+    python -m app.cli.export_onnx [--model KEY] [--no-quantize] [--force]
+
+Needs torch + sentence-transformers once; the exported files under
+<STORAGE_DIR>/models/onnx/<key>/ are all the onnx backend loads afterwards.
+"""
+import argparse
+import json
+
+from ..db.database import init_db
+from ..services.embedding import model_spec
+from ..services.embedding_onnx import export_model, model_dir
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--model", default=None,
+                    help="registry key (default: the active generation's model)")
+    ap.add_argument("--no-quantize", action="store_true", help="only the fp32 ONNX model")
+    ap.add_argument("--force", action="store_true", help="re-export even if the files exist")
+    args = ap.parse_args()
+
+    if args.model is None:
+        init_db()
+    spec = model_spec(args.model)
+    meta = export_model(spec, quantize=not args.no_quantize, force=args.force)
+    print(json.dumps(meta, indent=2))
+    print(f"Exported {spec.key} to {model_dir(spec)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Backfill passage vectors for every paper whose PDF has already been parsed by MinerU.
+
+    python -m app.cli.index_passages [--paper-id N] [--force]
+"""
+import argparse
+
+from sqlmodel import Session, select
+
+from ..db.database import engine, init_db
+from ..models import Paper
+from ..services.passages import index_paper
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--paper-id", type=int, default=None, help="only this paper")
+    ap.add_argument("--force", action="store_true",
+                    help="re-chunk even if the MinerU output is unchanged")
+    args = ap.parse_args()
+
+    init_db()
+    with Session(engine) as s:
+        stmt = select(Paper.id).where(Paper.pdf_url.is_not(None))
+        if args.paper_id is not None:
+            stmt = stmt.where(Paper.id == args.paper_id)
+        ids = list(s.exec(stmt.order_by(Paper.id)))
+
+    papers = passages = 0
+    for pid in ids:
+        n = index_paper(pid, force=args.force)
+        if n:
+            papers += 1
+            passages += n
+            print(f"paper#{pid}: {n} passages")
+    print(f"Indexed {passages} passages from {papers}/{len(ids)} papers")
+
+
+if __name__ == "__main__":
+    main()
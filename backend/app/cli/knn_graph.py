@@ -0,0 +1,34 @@
+"""Rebuild the similar-papers kNN graph (paper_neighbor) from the current embeddings.
+
+    python -m app.cli.knn_graph [--batch 2048]
+
+Run after a bulk backfill or an embedding generation switch; afterwards the
+API keeps the graph current incrementally.
+"""
+import argparse
+import sys
+
+from ..db.database import init_db
+from ..services.knn_graph import knn_graph
+
+
+def _progress(done: int, total: int, elapsed: float) -> None:
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else 0.0
+    print(f"\r[knn] {done}/{total} papers  {rate:.0f}/s  eta {eta:.0f}s", end="",
+          file=sys.stderr, flush=True)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--batch", type=int, default=2048, help="papers per block / transaction")
+    args = ap.parse_args()
+
+    init_db()
+    n = knn_graph.rebuild(batch_size=max(1, args.batch), progress=_progress)
+    print(file=sys.stderr)
+    print(f"Stored {knn_graph.k} neighbours for {n} papers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Recompute the derived paper columns venue_abbr / title_norm.
+
+    python -m app.cli.paper_keys [--all] [--batch 2000]
+
+Startup (init_db) already fills rows where they are missing; use --all after
+changing the venue abbreviation table in services/paper_keys.py.
+"""
+import argparse
+import sys
+
+from sqlmodel import Session
+
+from ..db.database import engine, init_db
+from ..services import paper_keys
+
+
+def _progress(done: int, total: int, elapsed: float) -> None:
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"\r[paper_keys] {done}/{total} papers  {rate:.0f}/s", end="", file=sys.stderr,
+          flush=True)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--all", action="store_true",
+                    help="recompute every paper, not only missing ones")
+    ap.add_argument("--batch", type=int, default=2000, help="papers per UPDATE / transaction")
+    args = ap.parse_args()
+
+    init_db()
+    with Session(engine) as s:
+        n = paper_keys.backfill(s, everything=args.all, batch_size=max(1, args.batch),
+                                progress=_progress)
+    print(file=sys.stderr)
+    print(f"Updated {n} papers")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,53 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./infinipaper.db"
     REDIS_URL: str = "redis://localhost:6379/0"
     GROBID_URL: str = "http://localhost:8070"
+    # model of the first embedding generation (app.cli.embedding_generations switches)
     EMBEDDING_MODEL_NAME: str = "specter2"
+    EMBEDDING_QUERY_CACHE_SIZE: int = 1024   # LRU entries for /search query vectors
+    EMBEDDING_STORAGE: str = "json"          # non-Postgres column format: json | float16 | int8
+    EMBEDDING_AUTO: bool = True              # embed new / edited papers in a background thread
+    EMBEDDING_WRITE_BATCH: int = 512         # papers per embed + bulk UPDATE round
+    SEARCH_RESULT_CACHE_SIZE: int = 512      # cached /papers and /search pages, per generation
+    HYBRID_MAX_DEPTH: int = 1000             # /search/hybrid: cap on depth and offset+limit
+    KNN_GRAPH_K: int = 20                    # neighbours stored per paper for /papers/{id}/similar
+    KNN_GRAPH_AUTO: bool = True              # keep the kNN graph current as papers change
+    RECOMMEND_WEIGHT_EMBEDDING: float = 1.0  # /papers/{id}/recommendations: embedding cosine weight
+    RECOMMEND_WEIGHT_AUTHORS: float = 0.6    # ... of shared-author overlap (idf-weighted, 0..1)
+    RECOMMEND_WEIGHT_TAGS: float = 0.3       # ... of shared-tag overlap (idf-weighted, 0..1)
+    GZIP_MIN_SIZE: int = 1024                # gzip bodies at least this large if accepted; 0 = off
+    GZIP_LEVEL: int = 5                      # 1..9; 9 costs far more CPU for a few % smaller bodies
 
     # File storage (served at /files)
     STORAGE_DIR: str = "./storage"
 
+    # Semantic search index: "flat" (exact scan) or "ivf" (approximate, IVF-flat)
+    VECTOR_INDEX_BACKEND: str = "flat"
+    VECTOR_INDEX_NLIST: int = 0       # IVF clusters; 0 = auto (~4*sqrt(n))
+    VECTOR_INDEX_NPROBE: int = 8      # IVF clusters scanned per query (recall vs latency)
+    VECTOR_INDEX_SHARED: bool = False # multi-worker: all processes mmap one published matrix
+    VECTOR_INDEX_COMPACT_RATIO: float = 0.05  # shared: delta segments until they reach this share
+
+    # Postgres only: ANN inside the database via pgvector
+    # ("hnsw" | "ivfflat" | "none" = use the index above)
+    PGVECTOR_INDEX: str = "hnsw"
+    PGVECTOR_HNSW_M: int = 16
+    PGVECTOR_HNSW_EF_CONSTRUCTION: int = 64
+    PGVECTOR_EF_SEARCH: int = 40          # hnsw.ef_search (raised to limit+offset when smaller)
+    PGVECTOR_IVFFLAT_LISTS: int = 100
+    PGVECTOR_ITERATIVE_SCAN: str = "relaxed_order"   # filtered / cursor pages (pgvector >= 0.8)
+
+    # Passage-level search over MinerU Markdown
+    PASSAGE_INDEX_BACKEND: str = "ivf"    # flat | ivf (passages grow to millions of rows)
+    PASSAGE_MAX_CHARS: int = 1200         # soft cap per passage
+    PASSAGE_OVERLAP_CHARS: int = 150      # tail of the previous passage repeated in the next one
+    EMBEDDING_BATCH_SIZE: int = 64        # texts per model.encode call
+    EMBEDDING_WORKERS: int = 0            # encoder processes (micro-batched, opt-in); 0 = inline
+    EMBEDDING_MAX_WAIT_MS: float = 5.0    # how long a request waits for others to share its batch
+    EMBEDDING_CACHE_MAX_MB: int = 512     # on-disk (model, text hash) -> vector cache; 0 = off
+    EMBEDDING_BACKEND: str = "torch"      # torch (sentence-transformers) | onnx (onnxruntime, CPU)
+    EMBEDDING_ONNX_QUANTIZE: bool = True  # onnx: dynamic int8 weights
+    EMBEDDING_ONNX_MIN_COSINE: float = 0.99  # onnx: int8 must match torch this well, else fp32
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
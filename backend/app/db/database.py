@@ -1,5 +1,5 @@
 from typing import Generator
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel import SQLModel, create_engine, Session, select
 from loguru import logger
 from ..core.config import settings
 
@@ -17,7 +17,174 @@ def init_db() -> None:
             except Exception as e:
                 logger.warning(f"Could not ensure pgvector extension: {e}")
     SQLModel.metadata.create_all(bind=engine)
+    _ensure_paper_keys()
+    _ensure_fulltext()
+    ensure_vector_index()
+
+# ---------- paper 派生列（venue_abbr / title_norm）----------
+# create_all 不会给已有表加列：老库在这里补列、补索引，并回填还是 NULL 的行
+_PAPER_KEY_COLUMNS = ("venue_abbr", "title_norm")
+
+def _ensure_paper_keys() -> None:
+    from sqlalchemy import inspect as sa_inspect
+    from ..models import Paper
+    from ..services import paper_keys
+
+    have = {c["name"] for c in sa_inspect(engine).get_columns("paper")}
+    missing = [c for c in _PAPER_KEY_COLUMNS if c not in have]
+    if missing:
+        with engine.begin() as conn:
+            for col in missing:
+                conn.exec_driver_sql(f"ALTER TABLE paper ADD COLUMN {col} VARCHAR")
+            for col in _PAPER_KEY_COLUMNS:
+                conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS ix_paper_{col} ON paper ({col})")
+        logger.info(f"[paper_keys] added columns {missing} to paper")
+    with Session(engine) as session:
+        pending = select(Paper.id).where(Paper.title_norm.is_(None)).limit(1)
+        if session.exec(pending).first() is not None:
+            paper_keys.backfill(session)
+
+# ---------- 全文索引（关键词搜索）----------
+# SQLite: FTS5 external-content 表 paper_fts，由触发器与 paper 同步
+# Postgres: 生成列 paper.search_tsv + GIN 索引
+_SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS paper_fts USING fts5(
+        title, abstract, venue, doi,
+        content='paper', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS paper_fts_ai AFTER INSERT ON paper BEGIN
+        INSERT INTO paper_fts(rowid, title, abstract, venue, doi)
+        VALUES (new.id, new.title, new.abstract, new.venue, new.doi);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS paper_fts_ad AFTER DELETE ON paper BEGIN
+        INSERT INTO paper_fts(paper_fts, rowid, title, abstract, venue, doi)
+        VALUES ('delete', old.id, old.title, old.abstract, old.venue, old.doi);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS paper_fts_au
+        AFTER UPDATE OF title, abstract, venue, doi ON paper BEGIN
+        INSERT INTO paper_fts(paper_fts, rowid, title, abstract, venue, doi)
+        VALUES ('delete', old.id, old.title, old.abstract, old.venue, old.doi);
+        INSERT INTO paper_fts(rowid, title, abstract, venue, doi)
+        VALUES (new.id, new.title, new.abstract, new.venue, new.doi);
+    END""",
+]
+
+_PG_FTS_DDL = [
+    """ALTER TABLE paper ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(abstract, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(venue, '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(doi, '')), 'D')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_paper_search_tsv ON paper USING GIN (search_tsv)",
+]
+
+fulltext_enabled = False
+
+def _ensure_fulltext() -> None:
+    global fulltext_enabled
+    try:
+        with engine.begin() as conn:
+            if settings.is_postgres:
+                for ddl in _PG_FTS_DDL:
+                    conn.exec_driver_sql(ddl)
+            elif engine.dialect.name == "sqlite":
+                existed = conn.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='paper_fts'"
+                ).first()
+                for ddl in _SQLITE_FTS_DDL:
+                    conn.exec_driver_sql(ddl)
+                if not existed:
+                    # 已有数据：一次性灌入索引
+                    conn.exec_driver_sql("INSERT INTO paper_fts(paper_fts) VALUES ('rebuild')")
+                    logger.info("[fts] paper_fts created and rebuilt from paper")
+            else:
+                return
+        fulltext_enabled = True
+    except Exception as e:
+        logger.warning(f"Full-text index unavailable, keyword search falls back to LIKE: {e}")
+        fulltext_enabled = False
+
+# ---------- 向量索引（Postgres / pgvector）----------
+# SQLite 继续用进程内索引（services/vector_index.py）；Postgres 在库内建 ANN 索引，
+# 由 services/pgvector_search.py 用 <=> 查询
+pgvector_enabled = False
+pgvector_version: tuple = ()     # 扩展版本，如 (0, 8, 0)；iterative_scan 需要 >= 0.8
+
+def _pg_vector_index_ddl() -> str | None:
+    kind = (settings.PGVECTOR_INDEX or "none").strip().lower()
+    if kind == "hnsw":
+        return (
+            "CREATE INDEX IF NOT EXISTS ix_paper_embedding_hnsw ON paper "
+            "USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {int(settings.PGVECTOR_HNSW_M)}, "
+            f"ef_construction = {int(settings.PGVECTOR_HNSW_EF_CONSTRUCTION)})"
+        )
+    if kind == "ivfflat":
+        return (
+            "CREATE INDEX IF NOT EXISTS ix_paper_embedding_ivfflat ON paper "
+            "USING ivfflat (embedding vector_cosine_ops) "
+            f"WITH (lists = {int(settings.PGVECTOR_IVFFLAT_LISTS)})"
+        )
+    return None
+
+def _ensure_embedding_dim(conn) -> None:
+    """paper.embedding 的维度跟当前 embedding 代一致：新库的无维度列定下维度，维度不符时改列"""
+    typmod = conn.exec_driver_sql(
+        "SELECT atttypmod FROM pg_attribute "
+        "WHERE attrelid = 'paper'::regclass AND attname = 'embedding'"
+    ).scalar()
+    if typmod is None:
+        return
+    dim = conn.exec_driver_sql(
+        "SELECT dim FROM embedding_generation WHERE status = 'active' ORDER BY id LIMIT 1"
+    ).scalar()
+    if dim is None:
+        if typmod > 0:
+            return      # 还没有 embedding 代：建代时按列里已有的向量认领模型，列先不动
+        from ..services.embedding_models import get_model
+        dim = get_model(settings.EMBEDDING_MODEL_NAME).dim
+    if typmod == dim:
+        return
+    # 维度变化时 ANN 索引建在旧类型上：先拆掉，ensure_vector_index 随后重建
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_paper_embedding_hnsw")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_paper_embedding_ivfflat")
+    if typmod > 0:
+        # vector(typmod) 里的向量不可能来自当前代的模型：清空，由管线 / backfill 重新编码
+        n = conn.exec_driver_sql("SELECT count(*) FROM paper WHERE embedding IS NOT NULL").scalar()
+        logger.warning(f"[pgvector] paper.embedding is vector({typmod}) but the active generation "
+                       f"has dim={dim}; altering the column and clearing {n} stale vectors")
+        conn.exec_driver_sql(
+            f"ALTER TABLE paper ALTER COLUMN embedding TYPE vector({int(dim)}) USING NULL")
+    else:
+        conn.exec_driver_sql(f"ALTER TABLE paper ALTER COLUMN embedding TYPE vector({int(dim)})")
+
+def ensure_vector_index() -> None:
+    """(Re)create the pgvector ANN index; also called after an embedding generation switch."""
+    global pgvector_enabled, pgvector_version
+    if not settings.is_postgres:
+        return
+    ddl = _pg_vector_index_ddl()
+    if ddl is None:
+        return
+    try:
+        with engine.begin() as conn:
+            _ensure_embedding_dim(conn)
+            conn.exec_driver_sql(ddl)
+            ver = conn.exec_driver_sql(
+                "SELECT extversion FROM pg_extension WHERE extname = 'vector'").scalar()
+        pgvector_version = tuple(int(x) for x in str(ver or "").split(".") if x.isdigit())
+        pgvector_enabled = True
+        logger.info(f"[pgvector] ANN index ready ({settings.PGVECTOR_INDEX})")
+    except Exception as e:
+        logger.warning(f"pgvector ANN index unavailable, "
+                       f"semantic search uses the in-process index: {e}")
+        pgvector_enabled = False
 
 def get_session() -> Generator[Session, None, None]:
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+# 会话 / mapper 事件要在所有写库的进程里注册（API、CLI、脚本）：随 engine 一起导入
+from ..services import generation as _generation  # noqa: E402,F401
+from ..services import paper_keys as _paper_keys  # noqa: E402,F401
@@ -0,0 +1,87 @@
+# backend/app/db/types.py
+"""
+Compact embedding column for SQLite.
+
+``PackedVector`` stores a vector as a BLOB: one format byte, then either raw
+little-endian float16, or a float32 scale followed by int8 codes
+(``x ≈ code * scale``).  Reads return NumPy arrays built with ``frombuffer``
+(float16 is a zero-copy view of the row bytes).  Legacy JSON text in the same
+column is still decoded, so ``scripts/migrate_embeddings.py`` can convert a
+library in place, in batches, while the app keeps running.
+"""
+from __future__ import annotations
+import json
+import struct
+from typing import Any, Optional
+
+import numpy as np
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+FMT_FLOAT16 = 1
+FMT_INT8 = 2
+_FORMATS = {"float16": FMT_FLOAT16, "int8": FMT_INT8}
+_SCALE = struct.Struct("<f")
+
+
+def pack_vector(vec: Any, fmt: str = "float16") -> Optional[bytes]:
+    if vec is None:
+        return None
+    arr = np.asarray(vec, dtype=np.float32).reshape(-1)
+    code = _FORMATS[fmt]
+    if code == FMT_FLOAT16:
+        return bytes([FMT_FLOAT16]) + arr.astype("<f2").tobytes()
+    # int8：每个向量一个比例因子，最大绝对值映射到 127
+    peak = float(np.max(np.abs(arr))) if arr.size else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    codes = np.clip(np.rint(arr / scale), -127, 127).astype(np.int8)
+    return bytes([FMT_INT8]) + _SCALE.pack(scale) + codes.tobytes()
+
+
+def unpack_vector(value: Any) -> Optional[np.ndarray]:
+    """BLOB (or legacy JSON text / list) -> 1-D NumPy array; None stays None."""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        buf = memoryview(value)
+        if len(buf) == 0:
+            return None
+        code = buf[0]
+        if code == FMT_FLOAT16:
+            return np.frombuffer(buf, dtype="<f2", offset=1)
+        if code == FMT_INT8:
+            (scale,) = _SCALE.unpack_from(buf, 1)
+            q = np.frombuffer(buf, dtype=np.int8, offset=1 + _SCALE.size)
+            return q.astype(np.float32) * scale
+        # 未知格式：按 JSON 文本尝试
+        value = bytes(buf).decode("utf-8")
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32) if value is not None else None
+
+
+class PackedVector(TypeDecorator):
+    """Embedding column stored as a float16 / int8 BLOB (see module docstring)."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, fmt: str = "float16", **kw: Any) -> None:
+        if fmt not in _FORMATS:
+            raise ValueError(f"unknown packed vector format: {fmt!r}")
+        self.fmt = fmt
+        super().__init__(**kw)
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Optional[bytes]:
+        return pack_vector(value, self.fmt)
+
+    def process_result_value(self, value: Any, dialect: Any) -> Optional[np.ndarray]:
+        return unpack_vector(value)
+
+    def result_processor(self, dialect: Any, coltype: Any):
+        # 跳过 LargeBinary 自带的 bytes() 转换：旧行里可能还是 JSON 文本
+        return lambda value: unpack_vector(value)
+
+    def compare_values(self, x: Any, y: Any) -> bool:
+        if x is None or y is None:
+            return x is y
+        return np.array_equal(np.asarray(x), np.asarray(y))
@@ -5,7 +5,16 @@ from loguru import logger
 from pathlib import Path
 from .core.config import settings
 from .db.database import init_db
+from .services.vector_index import vector_index
+from .services import pgvector_search
+from .services.passages import passage_index
+from .services.embedding_pipeline import embedding_pipeline
+from .services.embedding_worker import get_executor
+from .services.knn_graph import knn_graph
 from .api.router import api_router
+from .api.etag import ETAG_HEADER
+from .api.pagination import PAGE_HEADERS
+from .api.responses import ApiGZipMiddleware
 
 app = FastAPI(title="InfiniPaper API", version="0.1.0")
 
@@ -20,12 +29,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],   # 包含 DELETE
     allow_headers=["*"],
+    expose_headers=PAGE_HEADERS + [ETAG_HEADER],   # 分页游标 / 总数 / 条件请求
 )
+if settings.GZIP_MIN_SIZE > 0:
+    app.add_middleware(ApiGZipMiddleware, minimum_size=settings.GZIP_MIN_SIZE,
+                       compresslevel=settings.GZIP_LEVEL, exclude=("/files",))
 
 @app.on_event("startup")
 def on_startup():
     logger.info("Starting InfiniPaper API")
     init_db()
+    if pgvector_search.enabled():
+        return  # Postgres: ANN 在库内完成，无需加载进程内索引
+    try:
+        vector_index.ensure_built()
+    except Exception as e:
+        logger.warning(f"Vector index warm-up failed (will retry lazily): {e}")
+
+@app.on_event("shutdown")
+def on_shutdown():
+    embedding_pipeline.stop()
+    knn_graph.stop()
+    executor = get_executor()
+    if executor is not None:
+        executor.shutdown()
+    for index in (vector_index, passage_index):
+        try:
+            index.save()
+        except Exception as e:
+            logger.warning(f"Vector index snapshot on shutdown failed: {e}")
 
 @app.get("/healthz")
 def healthz():
@@ -6,6 +6,14 @@ from sqlalchemy import Column
 from sqlalchemy import JSON as SAJSON
 from pgvector.sqlalchemy import Vector
 from .core.config import settings
+from .db.types import PackedVector
+
+def _embedding_column() -> Column:
+    storage = (settings.EMBEDDING_STORAGE or "json").strip().lower()
+    if storage in ("float16", "int8"):
+        return Column(PackedVector(storage), nullable=True)
+    # none_as_null：未编码的行存 SQL NULL 而不是 JSON 'null'，"缺向量" 才能走 IS NULL
+    return Column(SAJSON(none_as_null=True), nullable=True)
 
 class PaperTagLink(SQLModel, table=True):
     paper_id: int | None = Field(default=None, foreign_key="paper.id", primary_key=True)
@@ -26,12 +34,17 @@ class Paper(SQLModel, table=True):
     pdf_url: str | None = None
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
     updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    # 写入时由 services/paper_keys.py 计算：venue 缩写、规范化标题（去重键）
+    venue_abbr: str | None = Field(default=None, index=True)
+    title_norm: str | None = Field(default=None, index=True)
 
-    # Embedding storage: Postgres uses pgvector; SQLite (and others) fallback to JSON
+    # Embedding storage: Postgres uses pgvector; SQLite (and others) fallback to JSON,
+    # or a packed float16 / int8 BLOB when IP_EMBEDDING_STORAGE is set
     if settings.is_postgres:
-        embedding: list[float] | None = Field(sa_column=Column(Vector(768), nullable=True))
+        # 维度由当前 embedding 代决定（init_db / 切换时 ALTER 成 vector(dim)）
+        embedding: list[float] | None = Field(sa_column=Column(Vector(), nullable=True))
     else:
-        embedding: list[float] | None = Field(default=None, sa_column=Column(SAJSON, nullable=True))
+        embedding: list[float] | None = Field(default=None, sa_column=_embedding_column())
 
 class Author(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
@@ -72,4 +85,56 @@ class MdNote(SQLModel, table=True):
     paper_id: int = Field(foreign_key="paper.id", index=True)
     content: str = ""  # Markdown 文本
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
-    updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
\ No newline at end of file
+    updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+class Passage(SQLModel, table=True):
+    """
+    全文段落（来自 MinerU 解析出的 Markdown），用于段落级语义检索。
+    source_key = MinerU 缓存键（PDF 内容 sha1），用于判断是否需要重新切分。
+    """
+    __tablename__ = "passage"
+    id: int | None = Field(default=None, primary_key=True)
+    paper_id: int = Field(foreign_key="paper.id", index=True)
+    ordinal: int = 0                  # 在论文内的顺序
+    section: str | None = None        # 标题路径，如 "3 Method > 3.2 Training"
+    text: str
+    source_key: str | None = Field(default=None, index=True)
+    embedding: list[float] | None = Field(default=None, sa_column=_embedding_column())
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+class EmbeddingGeneration(SQLModel, table=True):
+    """
+    一代向量 = 一个模型对全库的一次编码。status: building -> active -> retired。
+    active 代的向量就在 paper.embedding；其余代存在 paper_embedding 里。
+    """
+    __tablename__ = "embedding_generation"
+    id: int | None = Field(default=None, primary_key=True)
+    model: str = Field(index=True)    # services/embedding_models.py 里的 key
+    dim: int
+    status: str = Field(default="building", index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    activated_at: datetime | None = None
+
+class PaperEmbedding(SQLModel, table=True):
+    """非当前代的论文向量（正在回填的新代 / 可回滚的旧代）"""
+    __tablename__ = "paper_embedding"
+    generation_id: int = Field(foreign_key="embedding_generation.id", primary_key=True)
+    paper_id: int = Field(foreign_key="paper.id", primary_key=True, index=True)
+    if settings.is_postgres:
+        embedding: list[float] | None = Field(sa_column=Column(Vector(), nullable=True))
+    else:
+        embedding: list[float] | None = Field(default=None, sa_column=_embedding_column())
+    updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+class PaperNeighbor(SQLModel, table=True):
+    """
+    kNN 图：每篇论文按相似度排好的前 K 个邻居（services/knn_graph.py 维护）。
+    主键 (paper_id, rank)：取一篇论文的相似论文就是一次主键范围读。
+    """
+    __tablename__ = "paper_neighbor"
+    paper_id: int = Field(foreign_key="paper.id", primary_key=True)
+    rank: int = Field(primary_key=True)
+    neighbor_id: int = Field(foreign_key="paper.id", index=True)
+    score: float
+    generation_id: int                # 计算时的 embedding 代；不是当前代就视为过期
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pydantic import BaseModel
 
 # ----- Author -----
@@ -57,6 +57,32 @@ class PaperRead(PaperBase):
     tags: Optional[List[TagRead]] = None
     folder_ids: Optional[List[int]] = None
 
+class PaperHit(PaperRead):
+    # 搜索命中：分数越大越相关；snippet 为带 <mark> 高亮的片段
+    score: Optional[float] = None
+    snippet: Optional[str] = None
+
+class RecommendationHit(PaperHit):
+    # 推荐结果：score 为加权和，signals 为各路原始分（embedding / authors / tags）
+    signals: Optional[Dict[str, float]] = None
+
+class PassageHit(BaseModel):
+    # 段落级检索命中：所属论文 + 章节 + 段落正文
+    passage_id: int
+    paper: PaperRead
+    section: Optional[str] = None
+    ordinal: int = 0
+    snippet: str
+    score: float
+
+class HybridSearchResult(BaseModel):
+    items: List[PaperHit]
+    # 各阶段耗时（毫秒）：embed / vector / lexical / fuse / hydrate / total
+    timings: Dict[str, float]
+    lexical_hits: int = 0
+    vector_hits: int = 0
+    vector_available: bool = True
+
 # ----- Note -----
 class NoteBase(BaseModel):
     paper_id: int
@@ -1,27 +1,148 @@
-
-from typing import List
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple
 from loguru import logger
+from ..core.config import settings
+from .embedding_cache import embedding_cache
+from .embedding_generations import active_generation
+from .embedding_models import EmbeddingModel, get_model
+from .embedding_worker import get_executor, load_encoder
+
+_models: Dict[str, object] = {}
+
+def _load_model(spec: EmbeddingModel):
+    m = _models.get(spec.key)
+    if m is None:
+        m = load_encoder(spec)
+        if m is not None:
+            _models[spec.key] = m
+    return m
+
+def model_spec(model: Optional[str] = None) -> EmbeddingModel:
+    """Registry entry for ``model``; default = the active embedding generation's model."""
+    return get_model(model or active_generation().model)
 
-_model = None
-
-def _load_model():
-    global _model
-    if _model is not None:
-        return _model
-    try:
-        from sentence_transformers import SentenceTransformer
-        # lightweight, runs on Mac M-series; downloads on first run
-        _model = SentenceTransformer("all-MiniLM-L6-v2")
-        logger.info("Loaded sentence-transformers model all-MiniLM-L6-v2")
-    except Exception as e:
-        logger.warning(f"Falling back to stub embeddings: {e}")
-        _model = None
-    return _model
-
-def embed_texts(texts: List[str]) -> List[List[float]]:
-    m = _load_model()
+def _encode(spec: EmbeddingModel, texts: List[str]):
+    """-> float32 rows, or None when no model is available (stub)."""
+    executor = get_executor()
+    if executor is not None:
+        # 模型在独立进程里；并发请求在那边合成微批
+        return executor.encode(spec, texts)
+    m = _load_model(spec)
     if m is None:
+        return None
+    return m.encode(texts, batch_size=settings.EMBEDDING_BATCH_SIZE,
+                    normalize_embeddings=spec.normalize, show_progress_bar=False,
+                    convert_to_numpy=True)
+
+def embed_texts(texts: List[str], model: Optional[str] = None,
+                query: bool = False) -> List[List[float]]:
+    spec = model_spec(model)
+    prefix = spec.query_prefix if query else spec.doc_prefix
+    if prefix:
+        texts = [prefix + t for t in texts]
+    # 先查磁盘缓存：全部命中时连模型都不用加载
+    vecs = embedding_cache.get_many(spec.key, texts)
+    todo = list(dict.fromkeys(t for t, v in zip(texts, vecs) if v is None))
+    if not todo:
+        return vecs
+    fresh = _encode(spec, todo)
+    if fresh is None:
         logger.warning("Embedding service is using stub; returning zero vectors.")
-        return [[0.0]*384 for _ in texts]
-    vecs = m.encode(texts, show_progress_bar=False, convert_to_numpy=True).tolist()
-    return vecs
+        return [v if v is not None else [0.0] * spec.dim for v in vecs]
+    embedding_cache.put_many(spec.key, todo, fresh)
+    by_text = dict(zip(todo, fresh.tolist()))
+    return [v if v is not None else by_text[t] for t, v in zip(texts, vecs)]
+
+def embed_batched(texts: Sequence[str], model: Optional[str] = None) -> List[Optional[List[float]]]:
+    """embed_texts for a bulk job; stub zero vectors come back as None."""
+    # 整批一次交给 embed_texts：缓存一次查完，worker 池按 EMBEDDING_BATCH_SIZE 切块并行
+    return [vec if any(abs(x) > 1e-12 for x in vec) else None
+            for vec in embed_texts(list(texts), model=model)]
+
+
+# ---------- query embedding cache (LRU + single-flight) ----------
+class _QueryEmbeddingCache:
+    """
+    Bounded LRU of query vectors keyed by (model, normalised text).  Concurrent
+    misses for the same key share one in-flight computation.  The key only
+    decides what counts as "the same query"; the model always encodes the
+    query as the user typed it (case matters to cased models).
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, ...]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join((text or "").split()).lower()
+
+    def get(self, text: str) -> List[float]:
+        key = (model_spec().key, self.normalize(text))
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return list(vec)
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._inflight[key] = fut
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return list(fut.result())
+
+        try:
+            # 缓存键是归一化文本，编码用原始查询（只去首尾空白）
+            vec = tuple(embed_texts([(text or "").strip()], model=key[0], query=True)[0])
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fut.set_exception(e)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            # stub 的零向量不缓存：模型稍后可能可用
+            if any(vec) and self.maxsize > 0:
+                self._data[key] = vec
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        fut.set_result(vec)
+        return list(vec)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": model_spec().key,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "inflight": len(self._inflight),
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+query_cache = _QueryEmbeddingCache(settings.EMBEDDING_QUERY_CACHE_SIZE)
+
+def embed_query(text: str) -> List[float]:
+    """Embed a single search query through the LRU / single-flight cache."""
+    return query_cache.get(text)
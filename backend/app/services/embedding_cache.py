@@ -0,0 +1,201 @@
+# backend/app/services/embedding_cache.py
+"""
+On-disk embedding cache keyed by ``sha256(model, normalised text)``.
+
+``embed_texts`` looks texts up here before running the model, so re-imports,
+re-enrichment, dedupe merges and restarts only encode text that has never
+been seen with that model.  The store is one SQLite file
+(``<STORAGE_DIR>/cache/embeddings.sqlite``, WAL, shared by all workers) with
+float32 vectors and a coarse access time; once the payload exceeds
+``EMBEDDING_CACHE_MAX_MB`` the least recently used entries are evicted down
+to 90% of the budget.  Any SQLite error disables the cache for the process
+instead of failing the embedding call.
+"""
+from __future__ import annotations
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from ..core.config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding (
+    key   BLOB PRIMARY KEY,
+    model TEXT NOT NULL,
+    vec   BLOB NOT NULL,
+    atime INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_embedding_atime ON embedding (atime);
+"""
+_IN_CHUNK = 500
+_TOUCH_AFTER_S = 3600       # 命中时最多每小时刷新一次 atime，避免读变写
+_ROW_OVERHEAD = 48          # key + atime + 页内开销的粗略估计
+
+
+def _norm(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+class EmbeddingDiskCache:
+    def __init__(self, path: Optional[Path], max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disabled = path is None or max_bytes <= 0
+        self._bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\0{_norm(text)}".encode("utf-8")).digest()
+
+    # ---------- connection ----------
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and not self._disabled:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                db = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False,
+                                     isolation_level=None)
+                db.execute("PRAGMA auto_vacuum=INCREMENTAL")   # 仅对新文件生效：淘汰后能归还页
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+                db.executescript(_SCHEMA)
+                self._db = db
+            except (sqlite3.Error, OSError) as e:
+                self._fail(e)
+        return self._db
+
+    def _fail(self, e: Exception) -> None:
+        logger.warning(f"[embedding_cache] disabled: {e}")
+        self._disabled = True
+        if self._db is not None:
+            try:
+                self._db.close()
+            except sqlite3.Error:
+                pass
+            self._db = None
+
+    # ---------- lookups ----------
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        out: List[Optional[List[float]]] = [None] * len(texts)
+        if not texts:
+            return out
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return out
+            keys = [self.key(model, t) for t in texts]
+            found: Dict[bytes, bytes] = {}
+            stale: List[bytes] = []
+            now = int(time.time())
+            try:
+                uniq = list(dict.fromkeys(keys))
+                for s in range(0, len(uniq), _IN_CHUNK):
+                    part = uniq[s:s + _IN_CHUNK]
+                    marks = ",".join("?" * len(part))
+                    q = f"SELECT key, vec, atime FROM embedding WHERE key IN ({marks})"
+                    for k, vec, atime in db.execute(q, part):
+                        found[k] = vec
+                        if now - atime > _TOUCH_AFTER_S:
+                            stale.append(k)
+                if stale:
+                    db.executemany("UPDATE embedding SET atime = ? WHERE key = ?",
+                                   [(now, k) for k in stale])
+            except sqlite3.Error as e:
+                self._fail(e)
+                return out
+        for i, k in enumerate(keys):
+            vec = found.get(k)
+            if vec is not None:
+                out[i] = np.frombuffer(vec, dtype="<f4").tolist()
+        n = sum(v is not None for v in out)
+        self.hits += n
+        self.misses += len(out) - n
+        return out
+
+    def put_many(self, model: str, texts: Sequence[str], vecs: Sequence[Any]) -> None:
+        if not texts:
+            return
+        now = int(time.time())
+        rows = [(self.key(model, t), model, np.asarray(v, dtype="<f4").tobytes(), now)
+                for t, v in zip(texts, vecs)]
+        with self._lock:
+            db = self._conn()
+            if db is None:
+                return
+            try:
+                db.execute("BEGIN")
+                db.executemany("INSERT OR REPLACE INTO embedding (key, model, vec, atime) "
+                               "VALUES (?, ?, ?, ?)", rows)
+                db.execute("COMMIT")
+                self.writes += len(rows)
+                if self._bytes is None:
+                    self._bytes = self._measure(db)
+                else:
+                    self._bytes += sum(len(r[2]) + _ROW_OVERHEAD for r in rows)
+                if self._bytes > self.max_bytes:
+                    self._evict(db)
+            except sqlite3.Error as e:
+                self._fail(e)
+
+    # ---------- eviction ----------
+    @staticmethod
+    def _measure(db: sqlite3.Connection) -> int:
+        n, payload = db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vec)), 0) FROM embedding").fetchone()
+        return int(payload) + int(n) * _ROW_OVERHEAD
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        # 估算值可能偏大（其他进程也在写 / 替换），先精确量一次
+        self._bytes = self._measure(db)
+        target = int(self.max_bytes * 0.9)
+        while self._bytes > target:
+            n = db.execute("SELECT COUNT(*) FROM embedding").fetchone()[0]
+            if not n:
+                break
+            per_row = self._bytes / n
+            drop = max(1, int((self._bytes - target) / per_row) + 1)
+            db.execute("DELETE FROM embedding WHERE key IN "
+                       "(SELECT key FROM embedding ORDER BY atime LIMIT ?)", (drop,))
+            self.evicted += drop
+            self._bytes = self._measure(db)
+        # execute() 只跑一步（一页），executescript 跑完
+        db.executescript("PRAGMA incremental_vacuum;")
+        logger.info(f"[embedding_cache] evicted down to {self._bytes / 2**20:.1f} MB")
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._conn()
+            if db is not None:
+                db.execute("DELETE FROM embedding")
+                self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "enabled": not self._disabled,
+            "path": str(self.path) if self.path else None,
+            "max_mb": self.max_bytes / 2**20,
+            "approx_mb": round(self._bytes / 2**20, 1) if self._bytes is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evicted": self.evicted,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+embedding_cache = EmbeddingDiskCache(
+    Path(settings.STORAGE_DIR) / "cache" / "embeddings.sqlite",
+    int(settings.EMBEDDING_CACHE_MAX_MB * 2**20),
+)
@@ -0,0 +1,259 @@
+# backend/app/services/embedding_generations.py
+"""
+Embedding generations: which model's vectors the library is searching with,
+and side slots for re-embedding with another one.
+
+The active generation's vectors live in ``paper.embedding`` (so the vector
+index, pgvector and the pipeline read one column).  ``start_generation``
+opens a *building* generation whose vectors go to ``paper_embedding`` rows;
+the pipeline keeps it current for new / edited papers while
+``embedding_pipeline.fill_generation`` backfills the rest.  ``activate`` then
+swaps it in within one transaction: the old vectors are parked in their own
+slot (so the switch can be undone by activating the old generation), the new
+ones are copied into ``paper.embedding`` and, on Postgres, the column is
+retyped when the dimension changes.  Each process notices the switch within
+``_ACTIVE_TTL_S`` and rebuilds its vector index.
+"""
+from __future__ import annotations
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import String, cast, delete, func, insert, literal, or_, text
+from sqlmodel import Session, select
+
+from ..core.config import settings
+from ..db.database import engine, ensure_vector_index
+from ..models import EmbeddingGeneration, Paper, PaperEmbedding
+from .embedding_models import get_model, list_models
+
+_ACTIVE_TTL_S = 10.0
+# registry 之前写入的向量都来自这个模型
+_LEGACY_MODEL = "all-MiniLM-L6-v2"
+
+_lock = threading.Lock()
+_active: Optional[EmbeddingGeneration] = None
+_checked_at = 0.0
+_listeners: List[Callable[[EmbeddingGeneration, EmbeddingGeneration], None]] = []
+
+
+def missing_embedding(column: Any = Paper.embedding):
+    """SQL condition: row has no vector."""
+    cond = column.is_(None)
+    if not settings.is_postgres:
+        # 旧版 JSON 列把 None 存成文本 'null'
+        cond = or_(cond, cast(column, String) == "null")
+    return cond
+
+
+# ---------- active generation ----------
+def on_switch(fn: Callable[[EmbeddingGeneration, EmbeddingGeneration], None]):
+    """Register ``fn(old, new)``, called in each process when it notices a cut-over."""
+    _listeners.append(fn)
+    return fn
+
+
+def _initial_model(session: Session) -> str:
+    configured = settings.EMBEDDING_MODEL_NAME
+    try:
+        get_model(configured)
+    except ValueError as e:
+        logger.warning(f"[embedding] {e}; using {_LEGACY_MODEL}")
+        configured = _LEGACY_MODEL
+    # 库里已有向量：按维度认领产生它们的模型
+    for emb in session.exec(select(Paper.embedding).where(~missing_embedding()).limit(20)):
+        if emb is None or len(emb) == 0:
+            continue
+        dim = len(emb)
+        if get_model(configured).dim == dim:
+            return configured
+        if get_model(_LEGACY_MODEL).dim == dim:
+            return _LEGACY_MODEL
+        for m in list_models():
+            if m.dim == dim:
+                return m.key
+        break
+    return configured
+
+
+def _ensure_active(session: Session) -> EmbeddingGeneration:
+    gen = session.exec(
+        select(EmbeddingGeneration)
+        .where(EmbeddingGeneration.status == "active")
+        .order_by(EmbeddingGeneration.id)
+    ).first()
+    if gen is not None:
+        return gen
+    key = _initial_model(session)
+    gen = EmbeddingGeneration(model=key, dim=get_model(key).dim, status="active",
+                              activated_at=datetime.utcnow())
+    session.add(gen)
+    session.commit()
+    logger.info(f"[embedding] generation #{gen.id} active: {key} (dim={gen.dim})")
+    return gen
+
+
+def active_generation(refresh: bool = False) -> EmbeddingGeneration:
+    """Active generation, re-read from the database at most every ``_ACTIVE_TTL_S``."""
+    global _active, _checked_at
+    now = time.monotonic()
+    gen = _active
+    if gen is not None and not refresh and now - _checked_at < _ACTIVE_TTL_S:
+        return gen
+    with _lock:
+        with Session(engine, expire_on_commit=False) as session:
+            gen = _ensure_active(session)
+            session.expunge(gen)
+        previous, _active, _checked_at = _active, gen, now
+    if previous is not None and previous.id != gen.id:
+        logger.info(f"[embedding] switched generation #{previous.id} ({previous.model}) "
+                    f"-> #{gen.id} ({gen.model})")
+        for fn in list(_listeners):
+            try:
+                fn(previous, gen)
+            except Exception as e:
+                logger.warning(f"[embedding] generation switch hook failed: {e}")
+    return gen
+
+
+def building_generations(session: Session) -> List[EmbeddingGeneration]:
+    return list(session.exec(
+        select(EmbeddingGeneration)
+        .where(EmbeddingGeneration.status == "building")
+        .order_by(EmbeddingGeneration.id)
+    ))
+
+
+# ---------- lifecycle ----------
+def start_generation(model_key: str) -> EmbeddingGeneration:
+    """Open a building generation for ``model_key`` (or return the one already building)."""
+    spec = get_model(model_key)
+    with Session(engine, expire_on_commit=False) as session:
+        active = _ensure_active(session)
+        if active.model == spec.key:
+            raise ValueError(f"{spec.key} is already the active model (generation #{active.id})")
+        for gen in building_generations(session):
+            if gen.model == spec.key:
+                return gen
+        gen = EmbeddingGeneration(model=spec.key, dim=spec.dim, status="building")
+        session.add(gen)
+        session.commit()
+    logger.info(f"[embedding] generation #{gen.id} building: {spec.key} (dim={spec.dim})")
+    return gen
+
+
+def _uncovered(session: Session, gen_id: int) -> int:
+    """Papers that have a vector now but none in generation ``gen_id``."""
+    has_slot = select(PaperEmbedding.paper_id).where(
+        PaperEmbedding.generation_id == gen_id, ~missing_embedding(PaperEmbedding.embedding)
+    )
+    return session.exec(
+        select(func.count()).select_from(Paper)
+        .where(~missing_embedding(), Paper.id.not_in(has_slot))
+    ).one()
+
+
+def status() -> List[Dict[str, Any]]:
+    with Session(engine) as session:
+        active = _ensure_active(session)
+        counts = dict(session.exec(
+            select(PaperEmbedding.generation_id, func.count())
+            .group_by(PaperEmbedding.generation_id)
+        ).all())
+        papers = session.exec(
+            select(func.count()).select_from(Paper).where(~missing_embedding())).one()
+        out = []
+        for gen in session.exec(select(EmbeddingGeneration).order_by(EmbeddingGeneration.id)):
+            row = {"id": gen.id, "model": gen.model, "dim": gen.dim, "status": gen.status,
+                   "created_at": gen.created_at, "activated_at": gen.activated_at,
+                   "vectors": papers if gen.id == active.id else counts.get(gen.id, 0)}
+            if gen.status == "building":
+                row["missing"] = _uncovered(session, gen.id)
+            out.append(row)
+        return out
+
+
+def _pg_swap_column(conn: Any, dim: int) -> None:
+    # 维度变化：先拆 ANN 索引再改列类型；ALTER 持排他锁到提交为止，读写只会短暂排队
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_paper_embedding_hnsw")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_paper_embedding_ivfflat")
+    conn.exec_driver_sql(
+        f"ALTER TABLE paper ALTER COLUMN embedding TYPE vector({int(dim)}) USING NULL")
+
+
+def activate(gen_id: int, force: bool = False) -> EmbeddingGeneration:
+    """
+    Make generation ``gen_id`` (building, or retired for a rollback) the active
+    one in a single transaction.  Refuses while papers that have a vector today
+    would lose it, unless ``force``.
+    """
+    with Session(engine, expire_on_commit=False) as session:
+        new = session.get(EmbeddingGeneration, gen_id)
+        if new is None:
+            raise ValueError(f"no embedding generation #{gen_id}")
+        old = _ensure_active(session)
+        if new.id == old.id:
+            return new
+        missing = _uncovered(session, new.id)
+        if missing and not force:
+            raise ValueError(f"generation #{new.id} is missing {missing} papers; "
+                             f"fill it first (or force)")
+
+        conn = session.connection()
+        params = {"old": old.id, "new": new.id, "now": datetime.utcnow()}
+        # 1) 旧代向量停到自己的槽位，便于回滚
+        conn.execute(text("DELETE FROM paper_embedding WHERE generation_id = :old"), params)
+        conn.execute(insert(PaperEmbedding.__table__).from_select(
+            ["generation_id", "paper_id", "embedding", "updated_at"],
+            select(literal(old.id), Paper.id, Paper.embedding, literal(params["now"]))
+            .where(~missing_embedding()),
+        ))
+        # 2) 新代向量搬进 paper.embedding
+        if settings.is_postgres and new.dim != old.dim:
+            _pg_swap_column(conn, new.dim)
+        conn.execute(text(
+            "UPDATE paper SET embedding = (SELECT e.embedding FROM paper_embedding e "
+            "WHERE e.generation_id = :new AND e.paper_id = paper.id)"
+        ), params)
+        conn.execute(text("DELETE FROM paper_embedding WHERE generation_id = :new"), params)
+        # 3) 段落向量来自旧模型：清空，index_passages --force 重新编码
+        if new.model != old.model:
+            conn.execute(text("UPDATE passage SET embedding = NULL"))
+        old.status = "retired"
+        new.status = "active"
+        new.activated_at = datetime.utcnow()
+        session.add(old)
+        session.add(new)
+        session.commit()
+
+    if settings.is_postgres and new.dim != old.dim:
+        ensure_vector_index()
+    logger.info(f"[embedding] activated generation #{new.id} ({new.model}), "
+                f"retired #{old.id} ({old.model})")
+    active_generation(refresh=True)
+    return new
+
+
+def drop_generation(gen_id: int) -> int:
+    """Delete a non-active generation and its stored vectors; -> vectors removed."""
+    with Session(engine) as session:
+        gen = session.get(EmbeddingGeneration, gen_id)
+        if gen is None:
+            raise ValueError(f"no embedding generation #{gen_id}")
+        if gen.status == "active":
+            raise ValueError("cannot drop the active generation")
+        n = session.exec(
+            select(func.count()).select_from(PaperEmbedding)
+            .where(PaperEmbedding.generation_id == gen_id)
+        ).one()
+        session.exec(delete(PaperEmbedding).where(PaperEmbedding.generation_id == gen_id))
+        session.delete(gen)
+        session.commit()
+    return n
+
+
+def delete_slots(session: Session, paper_id: int) -> None:
+    """Drop a paper's vectors in non-active generations (inside ``session``)."""
+    session.exec(delete(PaperEmbedding).where(PaperEmbedding.paper_id == paper_id))
@@ -0,0 +1,53 @@
+# backend/app/services/embedding_models.py
+"""
+Known embedding models.  Each entry fixes what a stored vector means: the
+model that produced it, its dimension, whether it is L2-normalised before it
+is stored, and the instruction prefixes some models expect on queries /
+documents.  Embedding generations (services/embedding_generations.py) refer
+to models by ``key``.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, List
+
+
+@dataclass(frozen=True)
+class EmbeddingModel:
+    key: str
+    hf_name: str             # sentence-transformers / Hugging Face id
+    dim: int
+    normalize: bool = True   # store unit vectors (cosine == dot)
+    query_prefix: str = ""
+    doc_prefix: str = ""
+
+
+_REGISTRY: Dict[str, EmbeddingModel] = {}
+
+
+def register_model(model: EmbeddingModel) -> EmbeddingModel:
+    _REGISTRY[model.key] = model
+    return model
+
+
+def get_model(key: str) -> EmbeddingModel:
+    try:
+        return _REGISTRY[key]
+    except KeyError:
+        known = ", ".join(sorted(_REGISTRY))
+        raise ValueError(f"unknown embedding model {key!r} (known: {known})") from None
+
+
+def list_models() -> List[EmbeddingModel]:
+    return sorted(_REGISTRY.values(), key=lambda m: m.key)
+
+
+register_model(EmbeddingModel("all-MiniLM-L6-v2", "sentence-transformers/all-MiniLM-L6-v2", 384))
+register_model(EmbeddingModel("specter2", "allenai/specter2_base", 768))
+register_model(EmbeddingModel(
+    "bge-small-en-v1.5", "BAAI/bge-small-en-v1.5", 384,
+    query_prefix="Represent this sentence for searching relevant passages: ",
+))
+register_model(EmbeddingModel(
+    "bge-base-en-v1.5", "BAAI/bge-base-en-v1.5", 768,
+    query_prefix="Represent this sentence for searching relevant passages: ",
+))
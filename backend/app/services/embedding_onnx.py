@@ -0,0 +1,201 @@
+# backend/app/services/embedding_onnx.py
+"""
+ONNX Runtime encoder (``EMBEDDING_BACKEND=onnx``) for CPU-only servers.
+
+``export_model`` is a one-off step that still needs torch +
+sentence-transformers: it exports the model's transformer to
+``<STORAGE_DIR>/models/onnx/<key>/model.onnx``, saves the fast tokenizer and
+the sentence-transformers pooling settings next to it, writes a dynamic int8
+copy (``model.int8.onnx``) and checks it against the PyTorch vectors on a few
+probe sentences.  If the int8 model drifts below ``EMBEDDING_ONNX_MIN_COSINE``
+the fp32 ONNX file is used instead.  At runtime ``OnnxEncoder`` only needs
+onnxruntime, tokenizers and numpy, so the API and worker processes never
+import torch.
+
+``OnnxEncoder.encode`` takes the same arguments as
+``SentenceTransformer.encode``, so callers don't care which backend they got.
+"""
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from ..core.config import settings
+from .embedding_models import EmbeddingModel
+
+_META = "meta.json"
+_PROBES = [
+    "Attention is all you need.",
+    "A survey of graph neural networks for molecular property prediction.",
+    "We propose a cache-oblivious algorithm for sparse matrix multiplication on GPUs.",
+    "Efficient retrieval of scientific papers with dense embeddings.",
+    "短文本",
+]
+
+
+def model_dir(spec: EmbeddingModel) -> Path:
+    return Path(settings.STORAGE_DIR) / "models" / "onnx" / spec.key
+
+
+def _pool(hidden: np.ndarray, mask: np.ndarray, mode: str) -> np.ndarray:
+    if mode == "cls":
+        return hidden[:, 0]
+    m = mask[..., None].astype(np.float32)
+    if mode == "max":
+        return np.where(m > 0, hidden, -1e9).max(axis=1)
+    # mean（sentence-transformers 默认）
+    return (hidden * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+
+
+class OnnxEncoder:
+    def __init__(self, path: Path, threads: int = 0) -> None:
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        meta = json.loads((path / _META).read_text())
+        self.pooling: str = meta["pooling"]
+        self.dim: int = meta["dim"]
+        self.model_file: str = meta["use"]
+        self.tokenizer = Tokenizer.from_file(str(path / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=int(meta["max_seq_length"]))
+        self.tokenizer.enable_padding(pad_id=int(meta["pad_id"]), pad_token=meta["pad_token"])
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path / self.model_file), opts,
+                                            providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, normalize_embeddings: bool = False,
+               show_progress_bar: bool = False, convert_to_numpy: bool = True) -> np.ndarray:
+        texts = list(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        # 按长度排序再切批：同批 padding 最少（sentence-transformers 也这么做）
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for s in range(0, len(texts), max(1, batch_size)):
+            idx = order[s:s + batch_size]
+            enc = self.tokenizer.encode_batch([texts[i] for i in idx])
+            ids = np.asarray([e.ids for e in enc], dtype=np.int64)
+            mask = np.asarray([e.attention_mask for e in enc], dtype=np.int64)
+            feed = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self._inputs:
+                feed["token_type_ids"] = np.asarray([e.type_ids for e in enc], dtype=np.int64)
+            hidden = self.session.run(None, feed)[0]
+            out[idx] = _pool(hidden, mask, self.pooling)
+        if normalize_embeddings:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
+
+
+def load_onnx(spec: EmbeddingModel, threads: int = 0) -> Optional[OnnxEncoder]:
+    """Encoder for ``spec``, exporting it first if needed; None when that is not possible."""
+    path = model_dir(spec)
+    try:
+        if not (path / _META).exists():
+            export_model(spec)
+        enc = OnnxEncoder(path, threads)
+        logger.info(f"Loaded ONNX model {spec.key} ({enc.model_file}, dim={enc.dim})")
+        return enc
+    except Exception as e:
+        logger.warning(f"[embedding] ONNX backend unavailable for {spec.key}: {e}")
+        return None
+
+
+# ---------- export (needs torch + sentence-transformers, once per model) ----------
+def _pooling_mode(st: Any) -> str:
+    for module in st:
+        if hasattr(module, "get_pooling_mode_str"):
+            mode = module.get_pooling_mode_str()
+            if mode in ("cls", "mean", "max"):
+                return mode
+            logger.warning(f"[embedding] pooling {mode!r} not supported by the ONNX encoder; "
+                           f"using mean")
+    return "mean"
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return (a * b).sum(axis=1)
+
+
+def export_model(spec: EmbeddingModel, quantize: Optional[bool] = None,
+                 force: bool = False) -> Dict[str, Any]:
+    """
+    Export ``spec`` to ONNX (+ dynamic int8) under ``model_dir(spec)``; -> meta.
+    ``quantize`` defaults to ``EMBEDDING_ONNX_QUANTIZE``.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    quantize = settings.EMBEDDING_ONNX_QUANTIZE if quantize is None else quantize
+    path = model_dir(spec)
+    if (path / _META).exists() and not force:
+        return json.loads((path / _META).read_text())
+    path.mkdir(parents=True, exist_ok=True)
+
+    st = SentenceTransformer(spec.hf_name, device="cpu")
+    st.eval()
+    transformer = st[0].auto_model
+    tokenizer = st.tokenizer
+    if not getattr(tokenizer, "is_fast", False):
+        raise ValueError(f"{spec.hf_name} has no fast tokenizer; "
+                         f"the ONNX backend needs tokenizer.json")
+    tokenizer.save_pretrained(str(path))
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    axes = {n: {0: "batch", 1: "seq"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+    class _Wrapper(torch.nn.Module):
+        def __init__(self, model: Any) -> None:
+            super().__init__()
+            self.model = model
+
+        def forward(self, *args: Any) -> Any:
+            return self.model(**dict(zip(names, args))).last_hidden_state
+
+    with torch.no_grad():
+        torch.onnx.export(_Wrapper(transformer), tuple(sample[n] for n in names),
+                          str(path / "model.onnx"),
+                          input_names=names, output_names=["last_hidden_state"], dynamic_axes=axes,
+                          opset_version=17, do_constant_folding=True)
+
+    meta: Dict[str, Any] = {
+        "model": spec.key,
+        "hf_name": spec.hf_name,
+        "dim": spec.dim,
+        "pooling": _pooling_mode(st),
+        "max_seq_length": int(st.max_seq_length or 512),
+        "pad_id": int(tokenizer.pad_token_id or 0),
+        "pad_token": tokenizer.pad_token or "[PAD]",
+        "use": "model.onnx",
+    }
+    (path / _META).write_text(json.dumps(meta, indent=2))
+
+    reference = st.encode(_PROBES, normalize_embeddings=True, convert_to_numpy=True)
+    meta["fp32_min_cosine"] = float(_cosine(OnnxEncoder(path).encode(_PROBES), reference).min())
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(path / "model.onnx"), str(path / "model.int8.onnx"),
+                         weight_type=QuantType.QInt8)
+        meta["use"] = "model.int8.onnx"
+        (path / _META).write_text(json.dumps(meta, indent=2))
+        worst = float(_cosine(OnnxEncoder(path).encode(_PROBES), reference).min())
+        meta["int8_min_cosine"] = worst
+        if worst < settings.EMBEDDING_ONNX_MIN_COSINE:
+            # 量化误差太大（少数模型对 int8 敏感）：退回 fp32 ONNX
+            logger.warning(f"[embedding] int8 {spec.key} min cosine {worst:.4f} < "
+                           f"{settings.EMBEDDING_ONNX_MIN_COSINE}; using fp32 ONNX")
+            meta["use"] = "model.onnx"
+    (path / _META).write_text(json.dumps(meta, indent=2))
+    logger.info(f"[embedding] exported {spec.key} to {path} "
+                f"({meta['use']}, pooling={meta['pooling']})")
+    return meta
+
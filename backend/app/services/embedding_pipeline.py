@@ -0,0 +1,297 @@
+# backend/app/services/embedding_pipeline.py
+"""
+Batched, off-request-path embedding of papers (title + abstract).
+
+Papers inserted, or whose title / abstract changed, are collected by
+SQLAlchemy session events and handed to ``embedding_pipeline`` once the
+transaction commits, so every write path (uploads, ``/papers/create``,
+OpenAlex / DOI imports, edits) is covered without per-endpoint calls.  A
+daemon thread drains the queue in batches: one ``SELECT`` for the texts, one
+``embed_texts`` call per ``EMBEDDING_BATCH_SIZE`` texts, one executemany
+``UPDATE`` for the vectors, then one ``vector_index.apply``.
+
+``backfill`` runs the same batches over every paper still missing an
+embedding (``python -m app.cli.embed_papers``); ``fill_generation`` does the
+same for a generation being built (``python -m app.cli.embedding_generations``).
+"""
+from __future__ import annotations
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import bindparam, delete, event, func, insert, inspect as sa_inspect, update
+from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, select
+
+from ..core.config import settings
+from ..db.database import engine
+from ..models import EmbeddingGeneration, Paper, PaperEmbedding
+from .embedding import embed_batched
+from .embedding_generations import active_generation, building_generations, missing_embedding
+from .knn_graph import knn_graph
+from .vector_index import vector_index
+
+_PENDING_KEY = "_embedding_pipeline_pending"
+_DEBOUNCE_S = 0.5
+_TEXT_FIELDS = ("title", "abstract")
+
+_paper = Paper.__table__
+_slot = PaperEmbedding.__table__
+# Core executemany：不经过 ORM 事件，也不推进 library_generation（向量不影响列表 / 分面缓存）；
+# updated_at 要一起改：向量索引快照的水位线靠 max(updated_at) 发现重新编码过的行
+_UPDATE = (
+    update(_paper)
+    .where(_paper.c.id == bindparam("pid"))
+    .values(embedding=bindparam("vec", type_=_paper.c.embedding.type), updated_at=bindparam("now"))
+)
+
+
+def paper_text(title: Optional[str], abstract: Optional[str]) -> str:
+    title = " ".join((title or "").split())
+    abstract = " ".join((abstract or "").split())
+    return f"{title}. {abstract}" if abstract else title
+
+
+def _paper_texts(session: Session, paper_ids: Sequence[int]) -> List[Tuple[int, str]]:
+    rows = session.exec(
+        select(Paper.id, Paper.title, Paper.abstract).where(Paper.id.in_(list(paper_ids)))
+    ).all()
+    rows = [(pid, paper_text(t, a)) for pid, t, a in rows]
+    return [(pid, text) for pid, text in rows if text]
+
+
+def _write_slots(session: Session, gen: EmbeddingGeneration, rows: List[Tuple[int, str]]) -> int:
+    """Embed ``rows`` with ``gen``'s model into its ``paper_embedding`` slot."""
+    vecs = embed_batched([text for _, text in rows], model=gen.model)
+    now = datetime.utcnow()
+    params = [{"generation_id": gen.id, "paper_id": pid, "embedding": vec, "updated_at": now}
+              for (pid, _), vec in zip(rows, vecs) if vec is not None]
+    conn = session.connection()
+    conn.execute(delete(_slot).where(_slot.c.generation_id == gen.id,
+                                     _slot.c.paper_id.in_([pid for pid, _ in rows])))
+    if params:
+        conn.execute(insert(_slot), params)
+    return len(params)
+
+
+def embed_papers(session: Session, paper_ids: Sequence[int]) -> Dict[int, Any]:
+    """
+    Embed and store ``paper_ids`` inside ``session`` (caller commits) with the
+    active model, plus any generation being built; -> {id: active vector}.
+    """
+    if not paper_ids:
+        return {}
+    rows = _paper_texts(session, paper_ids)
+    if not rows:
+        return {}
+    # 每批重新读当前代：切换之后不会再用旧模型写 paper.embedding
+    active = active_generation(refresh=True)
+    vecs = embed_batched([text for _, text in rows], model=active.model)
+    written = {pid: vec for (pid, _), vec in zip(rows, vecs) if vec is not None}
+    if written:
+        now = datetime.utcnow()
+        params = [{"pid": pid, "vec": vec, "now": now} for pid, vec in written.items()]
+        session.connection().execute(_UPDATE, params)
+    for gen in building_generations(session):
+        _write_slots(session, gen, rows)
+    return written
+
+
+class EmbeddingPipeline:
+    """Background queue of paper ids waiting for (re-)embedding."""
+
+    def __init__(self, batch_size: int) -> None:
+        self.batch_size = max(1, batch_size)
+        self._cond = threading.Condition()
+        self._queue: Set[int] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.embedded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.batches = 0
+        self.busy_s = 0.0
+
+    # ---------- queue ----------
+    def enqueue(self, paper_ids: Iterable[int]) -> None:
+        ids = {int(i) for i in paper_ids if i is not None}
+        if not ids or not settings.EMBEDDING_AUTO:
+            return
+        with self._cond:
+            self._queue |= ids
+            self._ensure_thread()
+            self._cond.notify()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="embedding-pipeline",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _take(self) -> List[int]:
+        with self._cond:
+            while not self._queue and not self._stopping:
+                self._cond.wait()
+            if self._stopping:
+                return []
+        # 短暂等待，让一次导入的多次提交攒成一批
+        time.sleep(_DEBOUNCE_S)
+        with self._cond:
+            batch = sorted(self._queue)[: self.batch_size]
+            self._queue.difference_update(batch)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take()
+            if not batch:
+                return
+            try:
+                self.process(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"[embedding] batch of {len(batch)} papers failed: {e}")
+
+    # ---------- work ----------
+    def process(self, paper_ids: Sequence[int]) -> int:
+        t0 = time.perf_counter()
+        with Session(engine) as session:
+            written = embed_papers(session, paper_ids)
+            session.commit()
+        if written:
+            vector_index.apply(written)
+            knn_graph.enqueue(written)
+        self.batches += 1
+        self.embedded += len(written)
+        self.skipped += len(paper_ids) - len(written)
+        self.busy_s += time.perf_counter() - t0
+        return len(written)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "queued": queued,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "embedded": self.embedded,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "papers_per_s": round(self.embedded / self.busy_s, 1) if self.busy_s else None,
+        }
+
+
+embedding_pipeline = EmbeddingPipeline(settings.EMBEDDING_WRITE_BATCH)
+
+
+def missing_count(session: Session, everything: bool = False) -> int:
+    stmt = select(func.count()).select_from(Paper)
+    if not everything:
+        stmt = stmt.where(missing_embedding())
+    return session.exec(stmt).one()
+
+
+def _run_batches(where: List[Any], total: int, work: Callable[[Session, List[int]], int],
+                 batch_size: Optional[int], limit: Optional[int],
+                 progress: Optional[Callable[[int, int, float], None]]) -> int:
+    """Walk paper ids matching ``where`` in id order, one transaction per batch."""
+    batch_size = max(1, batch_size or settings.EMBEDDING_WRITE_BATCH)
+    if limit is not None:
+        total = min(total, limit)
+    done = embedded = 0
+    last_id = 0
+    t0 = time.perf_counter()
+    while done < total:
+        with Session(engine) as session:
+            stmt = select(Paper.id).where(Paper.id > last_id, *where)
+            ids = list(session.exec(stmt.order_by(Paper.id).limit(min(batch_size, total - done))))
+            if not ids:
+                break
+            embedded += work(session, ids)
+        last_id = ids[-1]
+        done += len(ids)
+        if progress is not None:
+            progress(done, total, time.perf_counter() - t0)
+    return embedded
+
+
+def backfill(everything: bool = False, batch_size: Optional[int] = None,
+             limit: Optional[int] = None,
+             progress: Optional[Callable[[int, int, float], None]] = None) -> int:
+    """
+    Embed every paper without a vector (all papers with ``everything``), in id
+    order, one transaction per batch so an interrupted run resumes where it
+    stopped.  ``progress(done, total, elapsed_s)`` is called after each batch.
+    Returns the number of papers that got a vector.
+    """
+    def work(session: Session, ids: List[int]) -> int:
+        written = embed_papers(session, ids)
+        session.commit()
+        if written:
+            vector_index.apply(written)
+        return len(written)
+
+    with Session(engine) as session:
+        total = missing_count(session, everything)
+    where = [] if everything else [missing_embedding()]
+    return _run_batches(where, total, work, batch_size, limit, progress)
+
+
+def fill_generation(gen_id: int, batch_size: Optional[int] = None, limit: Optional[int] = None,
+                    progress: Optional[Callable[[int, int, float], None]] = None) -> int:
+    """Embed every paper that has no vector yet in building generation ``gen_id``; resumable."""
+    with Session(engine, expire_on_commit=False) as session:
+        gen = session.get(EmbeddingGeneration, gen_id)
+        if gen is None or gen.status != "building":
+            raise ValueError(f"generation #{gen_id} is not building")
+        has_slot = select(PaperEmbedding.paper_id).where(PaperEmbedding.generation_id == gen_id)
+        where = [Paper.id.not_in(has_slot)]
+        total = session.exec(select(func.count()).select_from(Paper).where(*where)).one()
+
+    def work(session: Session, ids: List[int]) -> int:
+        rows = _paper_texts(session, ids)
+        n = _write_slots(session, gen, rows) if rows else 0
+        session.commit()
+        return n
+
+    return _run_batches(where, total, work, batch_size, limit, progress)
+
+
+# ---------- collect new / edited papers from committed sessions ----------
+@event.listens_for(SASession, "after_flush")
+def _collect_stale_papers(session: SASession, flush_context) -> None:
+    pending: Optional[Set[int]] = None
+    for obj in session.new:
+        if isinstance(obj, Paper) and obj.id is not None and obj.embedding is None:
+            pending = session.info.setdefault(_PENDING_KEY, set())
+            pending.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Paper) and obj.id is not None:
+            attrs = sa_inspect(obj).attrs
+            if attrs.embedding.history.has_changes():
+                continue  # 调用方自己写了向量
+            if any(getattr(attrs, f).history.has_changes() for f in _TEXT_FIELDS):
+                pending = session.info.setdefault(_PENDING_KEY, set())
+                pending.add(obj.id)
+
+
+@event.listens_for(SASession, "after_commit")
+def _enqueue_stale_papers(session: SASession) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        embedding_pipeline.enqueue(pending)
+
+
+@event.listens_for(SASession, "after_soft_rollback")
+def _drop_stale_papers(session: SASession, previous_transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,289 @@
+# backend/app/services/embedding_worker.py
+"""
+Embedding executor: the models live in worker processes, requests are
+micro-batched.
+
+``get_executor().encode(spec, texts)`` queues the texts and blocks on a
+future.  A dispatcher thread waits at most ``EMBEDDING_MAX_WAIT_MS`` after
+the first queued request for others to join, groups everything queued for
+the same model, cuts it into ``EMBEDDING_BATCH_SIZE`` chunks and hands the
+chunks to a pool of ``EMBEDDING_WORKERS`` spawned processes; each chunk's
+rows are routed back to the requests they came from.  Concurrent searches
+thus share one forward pass, a bulk ingest keeps every worker busy, and a
+slow encode never occupies the API's threadpool with model work.
+
+The pool is opt-in (``EMBEDDING_WORKERS`` defaults to 0 = encode inline).
+Workers load a model on first use (``load_encoder``: sentence-transformers
+or the ONNX backend, per ``EMBEDDING_BACKEND``) and keep it; if no model can
+be loaded they answer ``None`` for that chunk, the caller falls back to the
+stub, and the next chunk tries loading again (like the inline path).
+"""
+from __future__ import annotations
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from ..core.config import settings
+from .embedding_models import get_model
+
+
+# ---------- model loading (inline path and worker processes) ----------
+def load_encoder(spec: Any, threads: int = 0) -> Optional[Any]:
+    """
+    Encoder for ``spec`` from the configured ``EMBEDDING_BACKEND`` (anything
+    with ``SentenceTransformer.encode``'s signature), or None = use the stub.
+    """
+    if settings.EMBEDDING_BACKEND == "onnx":
+        from .embedding_onnx import load_onnx
+        m = load_onnx(spec, threads)
+        if m is not None:
+            return m
+        logger.warning(f"[embedding] falling back to sentence-transformers for {spec.key}")
+    try:
+        from sentence_transformers import SentenceTransformer
+        # downloads on first run
+        m = SentenceTransformer(spec.hf_name)
+        logger.info(f"Loaded sentence-transformers model {spec.hf_name} (dim={spec.dim})")
+        return m
+    except Exception as e:
+        logger.warning(f"Falling back to stub embeddings: {e}")
+        return None
+
+
+# ---------- worker process side ----------
+_worker_models: Dict[str, Any] = {}
+_worker_threads = 0
+
+
+def _init_worker(threads: int) -> None:
+    global _worker_threads
+    _worker_threads = threads
+    if settings.EMBEDDING_BACKEND == "onnx":
+        return      # 不为 onnx 后端导入 torch
+    try:
+        import torch
+        torch.set_num_threads(max(1, threads))
+    except Exception:
+        pass
+
+
+def _encode_in_worker(key: str, texts: List[str], batch_size: int) -> Optional[np.ndarray]:
+    m = _worker_models.get(key)
+    if m is None:
+        # 只缓存加载成功的模型：下载 / 依赖稍后就绪时下一批重试
+        m = load_encoder(get_model(key), _worker_threads)
+        if m is None:
+            return None
+        _worker_models[key] = m
+    spec = get_model(key)
+    return m.encode(texts, batch_size=batch_size, normalize_embeddings=spec.normalize,
+                    show_progress_bar=False, convert_to_numpy=True).astype(np.float32)
+
+
+# ---------- API process side ----------
+class _Job:
+    """One ``encode`` call; filled chunk by chunk."""
+
+    def __init__(self, spec: Any, texts: Sequence[str]) -> None:
+        self.spec = spec
+        self.texts = list(texts)
+        self.future: Future = Future()
+        self.out: Optional[np.ndarray] = None
+        self.remaining = len(self.texts)
+        self.lock = threading.Lock()
+
+    def fill(self, start: int, rows: Optional[np.ndarray]) -> None:
+        with self.lock:
+            if self.future.done():
+                return
+            if rows is None:       # worker 没有模型：整批退回 stub
+                self.future.set_result(None)
+                return
+            if self.out is None:
+                self.out = np.zeros((len(self.texts), rows.shape[1]), dtype=np.float32)
+            self.out[start:start + len(rows)] = rows
+            self.remaining -= len(rows)
+            if self.remaining <= 0:
+                self.future.set_result(self.out)
+
+    def fail(self, e: BaseException) -> None:
+        with self.lock:
+            if not self.future.done():
+                self.future.set_exception(e)
+
+
+class EmbeddingExecutor:
+    def __init__(self, workers: int, batch_size: int, max_wait_ms: float) -> None:
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self.busy_s = 0.0
+
+    # ---------- public ----------
+    def encode(self, spec: Any, texts: Sequence[str]) -> Optional[np.ndarray]:
+        """Block until ``texts`` are encoded with ``spec``; None = no model available."""
+        if not texts:
+            return np.zeros((0, spec.dim), dtype=np.float32)
+        self._ensure_started()
+        job = _Job(spec, texts)
+        self.requests += 1
+        self._queue.put(job)
+        return job.future.result()
+
+    def shutdown(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join(5)
+                self._thread = None
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self._pool is not None,
+            "queued": self._queue.qsize(),
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": round(self.texts / self.batches, 1) if self.batches else None,
+            "avg_batch_ms": round(self.busy_s / self.batches * 1000, 1) if self.batches else None,
+        }
+
+    # ---------- dispatcher ----------
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._pool = self._new_pool()
+            self._thread = threading.Thread(target=self._run, name="embedding-dispatch",
+                                            daemon=True)
+            self._thread.start()
+            logger.info(f"[embedding_worker] started {self.workers} worker process(es)")
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn：不继承 API 进程的线程 / 连接；torch 线程数按 worker 平分 CPU
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(threads,))
+
+    def _collect(self, first: _Job) -> List[_Job]:
+        jobs = [first]
+        size = len(first.texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.batch_size * self.workers:
+            left = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=left) if left > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self._queue.put(None)
+                break
+            jobs.append(job)
+            size += len(job.texts)
+        return jobs
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            jobs = self._collect(first)
+            groups: Dict[Tuple[str, bool], List[_Job]] = {}
+            for job in jobs:
+                groups.setdefault((job.spec.key, job.spec.normalize), []).append(job)
+            for group in groups.values():
+                try:
+                    self._dispatch(group)
+                except Exception as e:
+                    # 派发失败不能让线程退出：调用方还在等 future
+                    logger.warning(f"[embedding_worker] dispatch failed: {e}")
+                    for job in group:
+                        job.fail(e)
+
+    def _dispatch(self, jobs: List[_Job]) -> None:
+        """Cut the group's texts into chunks; each chunk remembers which job rows it carries."""
+        spec = jobs[0].spec
+        parts: List[Tuple[_Job, int, int]] = []    # (job, job 内起点, 长度)
+        texts: List[str] = []
+
+        def flush() -> None:
+            if texts:
+                self._submit(spec, list(texts), list(parts))
+                texts.clear()
+                parts.clear()
+
+        for job in jobs:
+            pos = 0
+            while pos < len(job.texts):
+                take = min(self.batch_size - len(texts), len(job.texts) - pos)
+                parts.append((job, pos, take))
+                texts.extend(job.texts[pos:pos + take])
+                pos += take
+                if len(texts) >= self.batch_size:
+                    flush()
+        flush()
+
+    def _submit(self, spec: Any, texts: List[str], parts: List[Tuple[_Job, int, int]]) -> None:
+        t0 = time.perf_counter()
+        try:
+            fut = self._pool.submit(_encode_in_worker, spec.key, texts, self.batch_size)
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.warning(f"[embedding_worker] pool unavailable, restarting: {e}")
+            self._pool = self._new_pool()
+            fut = self._pool.submit(_encode_in_worker, spec.key, texts, self.batch_size)
+
+        def done(f: Future) -> None:
+            self.batches += 1
+            self.texts += len(texts)
+            self.busy_s += time.perf_counter() - t0
+            try:
+                rows = f.result()
+            except BaseException as e:
+                for job, _, _ in parts:
+                    job.fail(e)
+                if isinstance(e, BrokenProcessPool):
+                    self._pool = self._new_pool()
+                return
+            offset = 0
+            for job, start, n in parts:
+                job.fill(start, None if rows is None else rows[offset:offset + n])
+                offset += n
+
+        fut.add_done_callback(done)
+
+
+_executor: Optional[EmbeddingExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> Optional[EmbeddingExecutor]:
+    """The process-wide executor, or None when ``EMBEDDING_WORKERS`` is 0 (encode inline)."""
+    global _executor
+    if settings.EMBEDDING_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = EmbeddingExecutor(settings.EMBEDDING_WORKERS, settings.EMBEDDING_BATCH_SIZE,
+                                          settings.EMBEDDING_MAX_WAIT_MS)
+        return _executor
@@ -0,0 +1,116 @@
+# backend/app/services/fulltext.py
+"""
+Keyword search on top of the full-text index created by ``init_db``.
+
+SQLite uses the FTS5 table ``paper_fts`` (BM25 + ``snippet()``); Postgres uses
+the generated ``paper.search_tsv`` column (``ts_rank_cd`` + ``ts_headline``).
+When neither is available everything degrades to the old ``ilike`` scan.
+
+Both indexes match whole tokens by prefix, and a run of CJK characters is a
+single token to them, so a Chinese substring would not match mid-sentence.
+Queries with non-ASCII characters therefore keep the ``ilike`` substring
+scan; ASCII queries match word prefixes (``trans`` finds "transformer", but
+``former`` no longer does).
+"""
+from __future__ import annotations
+import re
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, column, func, literal_column, or_, table, text
+from sqlmodel import select
+
+from ..core.config import settings
+from ..db import database
+from ..models import Paper
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# bm25 列权重：title, abstract, venue, doi
+_BM25 = "bm25(paper_fts, 10.0, 3.0, 2.0, 1.0)"
+_SNIPPET = "snippet(paper_fts, -1, '<mark>', '</mark>', '…', 16)"
+_PG_HEADLINE_OPTS = "StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=12"
+_PG_TSV = literal_column("paper.search_tsv")
+_FTS = table("paper_fts", column("rowid"))
+
+
+def _tokens(q: str) -> List[str]:
+    return _TOKEN_RE.findall(q or "")
+
+
+def _match_expr(q: str) -> Optional[str]:
+    """用户输入 -> 安全的 FTS 查询串（词与词 AND，均按前缀匹配，便于边输边搜）"""
+    toks = _tokens(q)
+    if not toks:
+        return None
+    if settings.is_postgres:
+        return " & ".join(f"{t.lower()}:*" for t in toks)
+    return " ".join('"%s"*' % t for t in toks)
+
+
+def enabled() -> bool:
+    return database.fulltext_enabled
+
+
+def _index_expr(q: str) -> Optional[str]:
+    """走全文索引时的查询串；None = 用 ilike 子串匹配（索引不可用 / 无词 / 含非 ASCII 字符）"""
+    if not enabled() or not (q or "").isascii():
+        return None
+    return _match_expr(q)
+
+
+def _ilike(q: str, *cols) -> Any:
+    like = f"%{q}%"
+    return or_(*[c.ilike(like) for c in cols])
+
+
+def keyword_condition(q: str) -> Any:
+    """WHERE 条件：paper 命中关键词（不排序，供列表过滤用）"""
+    expr = _index_expr(q)
+    if expr is None:
+        return _ilike(q, Paper.title, Paper.abstract, Paper.venue, Paper.doi)
+    if settings.is_postgres:
+        return _PG_TSV.op("@@")(func.to_tsquery("simple", expr))
+    return Paper.id.in_(
+        select(_FTS.c.rowid).where(_sqlite_match(expr))
+    )
+
+
+def _sqlite_match(expr: str) -> Any:
+    return text("paper_fts MATCH :fts_q").bindparams(fts_q=expr)
+
+
+def _seek(stmt, score, after: Optional[Tuple[float, int]]):
+    # keyset: ORDER BY score DESC, id ASC 之后的行
+    if after is None:
+        return stmt
+    s, pid = after
+    return stmt.where(or_(score < s, and_(score == s, Paper.id > pid)))
+
+
+def ranked_select(q: str, after: Optional[Tuple[float, int]] = None):
+    """
+    ``select(Paper, score, snippet)`` ordered by ``score DESC, id ASC``; callers add
+    their own filters / limit.  ``score`` is "higher is better" on every backend,
+    and ``after=(score, id)`` seeks past the last row of the previous page.
+    """
+    expr = _index_expr(q)
+    if expr is None:
+        score = literal_column("0.0")
+        stmt = select(Paper, score.label("score"), literal_column("NULL").label("snippet")).where(
+            _ilike(q, Paper.title, Paper.abstract)
+        )
+    elif settings.is_postgres:
+        tsq = func.to_tsquery("simple", expr)
+        score = func.ts_rank_cd(_PG_TSV, tsq)
+        snippet = func.ts_headline("simple", func.coalesce(Paper.abstract, Paper.title), tsq,
+                                   _PG_HEADLINE_OPTS)
+        stmt = (select(Paper, score.label("score"), snippet.label("snippet"))
+                .where(_PG_TSV.op("@@")(tsq)))
+    else:
+        score = literal_column("-" + _BM25)
+        stmt = (
+            select(Paper, score.label("score"), literal_column(_SNIPPET).label("snippet"))
+            .join(_FTS, _FTS.c.rowid == Paper.id)
+            .where(_sqlite_match(expr))
+        )
+    return _seek(stmt, score, after).order_by(score.desc(), Paper.id.asc())
@@ -0,0 +1,211 @@
+# backend/app/services/generation.py
+"""
+Library generation counter.
+
+Any committed transaction that writes a library table (papers, tags, folders,
+authors and their link tables) bumps ``library_generation``.  Read-side caches
+(``GenerationCache``) remember the generation an entry was computed at, so a
+write invalidates them without having to know which entries it affected.
+
+The counter lives in a 16-byte memory-mapped stamp file,
+``<STORAGE_DIR>/library.generation`` (random epoch + count), shared by every
+worker process on the host: a read is a load from the mapped page, a bump an
+increment under ``flock``.  A commit on one worker therefore invalidates the
+caches of all of them, and the value survives restarts (the epoch tells a
+recreated file apart, for ETags).  Without a usable file (read-only storage)
+it degrades to a per-process counter.
+
+ORM unit-of-work changes are seen in ``after_flush``; bulk ``update()`` /
+``delete()`` statements run through ``Session.exec`` are seen in
+``do_orm_execute``.  Raw SQL through ``engine.begin()`` is not tracked — call
+``library_generation.bump()`` after such writes.
+
+``on_bump`` hooks run after this process's commit bumped the counter, with
+the new value: an in-process index that applies the commit's own changes can
+move to that generation if it was current at the one before, and rebuild
+only for writes made elsewhere.
+"""
+from __future__ import annotations
+import mmap
+import os
+import secrets
+import struct
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.orm import Session as SASession
+
+from ..core.config import settings
+
+from ..models import (
+    Author, Folder, Paper, PaperAuthorLink, PaperFolderLink, PaperTagLink, Tag,
+)
+
+_DIRTY_KEY = "_library_dirty"
+_LIBRARY_MODELS = (Paper, Tag, PaperTagLink, Folder, PaperFolderLink, Author, PaperAuthorLink)
+_LIBRARY_TABLES = {m.__table__.name for m in _LIBRARY_MODELS}
+
+
+_STAMP_SIZE = 16    # <q epoch><q generation>
+_bump_hooks: List[Callable[[SASession, int], None]] = []
+
+try:
+    import fcntl
+except ImportError:  # Windows：无 flock，只靠进程内的锁
+    fcntl = None
+
+
+class LibraryGeneration:
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._mm: Optional[mmap.mmap] = None
+        self._fd: Optional[int] = None
+        self._opened = False
+        self._local = 0     # 没有 stamp 文件时的退路
+
+    def _open(self) -> Optional[mmap.mmap]:
+        if self._opened:
+            return self._mm
+        with self._lock:
+            if self._opened:
+                return self._mm
+            path = self._path or Path(settings.STORAGE_DIR) / "library.generation"
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+                with self._flock(fd):
+                    if os.fstat(fd).st_size < _STAMP_SIZE:
+                        os.ftruncate(fd, _STAMP_SIZE)
+                    mm = mmap.mmap(fd, _STAMP_SIZE)
+                    if struct.unpack_from("<q", mm, 0)[0] == 0:
+                        struct.pack_into("<qq", mm, 0, secrets.randbits(62) + 1, 0)
+                self._fd, self._mm = fd, mm
+            except OSError as e:
+                logger.warning(f"[generation] stamp file unavailable, "
+                               f"generation is per-process: {e}")
+            self._opened = True
+        return self._mm
+
+    @contextmanager
+    def _flock(self, fd: int) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    @property
+    def value(self) -> int:
+        mm = self._open()
+        return struct.unpack_from("<q", mm, 8)[0] if mm is not None else self._local
+
+    @property
+    def epoch(self) -> str:
+        mm = self._open()
+        if mm is None:
+            return f"p{os.getpid()}"
+        return format(struct.unpack_from("<q", mm, 0)[0], "x")
+
+    def bump(self) -> int:
+        mm = self._open()
+        with self._lock:
+            if mm is None:
+                self._local += 1
+                return self._local
+            with self._flock(self._fd):
+                value = struct.unpack_from("<q", mm, 8)[0] + 1
+                struct.pack_into("<q", mm, 8, value)
+                return value
+
+
+library_generation = LibraryGeneration()
+
+
+def on_bump(fn: Callable[[SASession, int], None]) -> Callable[[SASession, int], None]:
+    """Register ``fn(session, value)``: run after a commit in this process bumped the generation."""
+    _bump_hooks.append(fn)
+    return fn
+
+
+class GenerationCache:
+    """
+    Small LRU whose entries are only valid for the generation they were
+    computed at; a lookup at a newer generation is a miss.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, Tuple[int, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        gen = library_generation.value
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None and hit[0] == gen:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._data[key] = (gen, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "generation": library_generation.value}
+
+
+@event.listens_for(SASession, "after_flush")
+def _mark_flush(session: SASession, flush_context) -> None:
+    if session.info.get(_DIRTY_KEY):
+        return
+    for objs in (session.new, session.dirty, session.deleted):
+        if any(isinstance(o, _LIBRARY_MODELS) for o in objs):
+            session.info[_DIRTY_KEY] = True
+            return
+
+
+@event.listens_for(SASession, "do_orm_execute")
+def _mark_bulk(state) -> None:
+    if not (state.is_update or state.is_delete or state.is_insert):
+        return
+    table = getattr(state.statement, "table", None)
+    if table is not None and getattr(table, "name", None) in _LIBRARY_TABLES:
+        state.session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(SASession, "after_commit")
+def _bump_on_commit(session: SASession) -> None:
+    if session.info.pop(_DIRTY_KEY, False):
+        value = library_generation.bump()
+        for fn in list(_bump_hooks):
+            try:
+                fn(session, value)
+            except Exception as e:
+                logger.warning(f"[generation] bump hook failed: {e}")
+
+
+@event.listens_for(SASession, "after_soft_rollback")
+def _clear_on_rollback(session: SASession, previous_transaction) -> None:
+    session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,146 @@
+# backend/app/services/ivf_index.py
+"""
+IVF-flat approximate nearest-neighbour index (pure NumPy).
+
+Rows are partitioned by spherical k-means into ``nlist`` clusters; a query is
+scored against the centroids first and only rows in the ``nprobe`` closest
+clusters are scanned.  ``nprobe`` trades recall for latency: ``nprobe=nlist``
+is an exact scan.  Until the library reaches ``min_train`` rows the index
+behaves like the flat one.
+"""
+from __future__ import annotations
+import math
+from typing import Any, Dict, Optional
+
+import numpy as np
+from loguru import logger
+
+from .vector_index import VectorIndex
+
+_ASSIGN_CHUNK = 8192
+
+
+class IVFFlatIndex(VectorIndex):
+    kind = "ivf"
+
+    def __init__(self, path=None, source=None, nlist: int = 0, nprobe: int = 8,
+                 min_train: int = 2048, kmeans_iters: int = 12, seed: int = 0) -> None:
+        super().__init__(path, source)
+        self.nlist_setting = nlist        # 0 = auto (~4*sqrt(n))
+        self.nprobe = max(1, nprobe)
+        self.min_train = min_train
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self._centroids: Optional[np.ndarray] = None   # nlist x dim
+        self._assign = np.zeros(0, dtype=np.int32)      # row -> list id
+        self._trained_size = 0
+
+    # ---------- training ----------
+    def _auto_nlist(self, n: int) -> int:
+        if self.nlist_setting > 0:
+            return self.nlist_setting
+        return int(min(4096, max(16, 4 * math.sqrt(n))))
+
+    def _assign_rows(self, mat: np.ndarray) -> np.ndarray:
+        out = np.empty(mat.shape[0], dtype=np.int32)
+        for s in range(0, mat.shape[0], _ASSIGN_CHUNK):
+            block = mat[s:s + _ASSIGN_CHUNK]
+            out[s:s + _ASSIGN_CHUNK] = np.argmax(block @ self._centroids.T, axis=1)
+        return out
+
+    def train(self) -> None:
+        """Spherical k-means on (a sample of) the current rows, then reassign every row."""
+        with self._lock:
+            n = self._n
+            nlist = min(self._auto_nlist(n), n)
+            if nlist < 2:
+                return
+            rng = np.random.default_rng(self.seed)
+            data = self._mat[:n]
+            sample = data[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+            cent = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+            for _ in range(self.kmeans_iters):
+                lab = np.argmax(sample @ cent.T, axis=1)
+                sums = np.zeros_like(cent)
+                np.add.at(sums, lab, sample)
+                counts = np.bincount(lab, minlength=nlist)
+                empty = counts == 0
+                if empty.any():
+                    # 空簇重新随机播种
+                    sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()))]
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                cent = sums / np.maximum(norms, 1e-12)
+            self._centroids = cent.astype(np.float32)
+            assign = np.zeros(self._mat.shape[0], dtype=np.int32)
+            assign[:n] = self._assign_rows(data)
+            self._assign = assign
+            self._trained_size = n
+        logger.info(f"[ivf_index] trained nlist={nlist} on n={n}")
+
+    def _maybe_train(self) -> None:
+        # 未训练且够大，或规模较上次训练翻了 4 倍，重新聚类
+        if self._n < self.min_train:
+            return
+        if self._centroids is None or self._n >= 4 * max(self._trained_size, 1):
+            self.train()
+
+    # ---------- hooks ----------
+    def build(self, session) -> None:
+        super().build(session)
+        with self._lock:
+            self._maybe_train()
+
+    def _on_reset(self) -> None:
+        self._centroids = None
+        self._assign = np.zeros(self._mat.shape[0], dtype=np.int32)
+        self._trained_size = 0
+
+    def _on_capacity(self, cap: int) -> None:
+        assign = np.zeros(cap, dtype=np.int32)
+        assign[: self._n] = self._assign[: self._n]
+        self._assign = assign
+
+    def _on_row_set(self, row: int, vec: np.ndarray) -> None:
+        if self._centroids is not None:
+            self._assign[row] = int(np.argmax(self._centroids @ vec))
+        self._maybe_train()
+
+    def _on_row_moved(self, src: int, dst: int) -> None:
+        self._assign[dst] = self._assign[src]
+
+    def _candidate_rows(self, q: np.ndarray, nprobe: Optional[int] = None,
+                        **params: Any) -> Optional[np.ndarray]:
+        if self._centroids is None:
+            return None
+        nlist = self._centroids.shape[0]
+        probe_n = min(max(1, nprobe or self.nprobe), nlist)
+        if probe_n >= nlist:
+            return None
+        cs = self._centroids @ q
+        probe = np.argpartition(-cs, probe_n - 1)[:probe_n]
+        wanted = np.zeros(nlist, dtype=bool)
+        wanted[probe] = True
+        return np.flatnonzero(wanted[self._assign[: self._n]])
+
+    # ---------- persistence ----------
+    def _extra_state(self) -> Dict[str, np.ndarray]:
+        if self._centroids is None:
+            return {}
+        return {"centroids": self._centroids, "assign": self._assign[: self._n]}
+
+    def _restore_extra(self, data: Any, meta: Dict[str, Any]) -> None:
+        if "centroids" not in data.files:
+            self._maybe_train()
+            return
+        self._centroids = np.asarray(data["centroids"], dtype=np.float32)
+        self._assign = np.asarray(data["assign"], dtype=np.int32)
+        self._trained_size = self._n
+
+    def stats(self) -> Dict[str, Any]:
+        out = super().stats()
+        out.update({
+            "nlist": 0 if self._centroids is None else int(self._centroids.shape[0]),
+            "nprobe": self.nprobe,
+            "trained_size": self._trained_size,
+        })
+        return out
@@ -0,0 +1,335 @@
+# backend/app/services/knn_graph.py
+"""
+Precomputed k-nearest-neighbour graph over paper embeddings.
+
+``paper_neighbor`` stores each paper's ``KNN_GRAPH_K`` most similar papers
+(cosine over the active embedding generation), ranked, so "similar papers"
+is a primary-key range read of k rows instead of a scan of every vector.
+
+``rebuild`` recomputes every list with blocked exact matrix products
+(``python -m app.cli.knn_graph``).  Between rebuilds ``knn_graph`` keeps the
+graph current in the background:
+
+* a paper whose vector changed gets a fresh list, and is offered to the
+  lists of its ``_OFFER_FANOUT * K`` nearest papers (it replaces their
+  weakest entry when it scores higher);
+* a list that pointed at a changed paper gets the new score patched in when
+  it still beats the list's old weakest score (nothing outside the list can
+  rank higher); only lists the paper fell out of, or whose entry was
+  deleted, are searched again;
+* a list written under another embedding generation counts as missing: it
+  is computed on demand and queued for storage.
+
+``similar`` serves at most K neighbours from the graph; a larger k is
+answered with a live search.
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import delete, event, func, insert, inspect as sa_inspect, or_
+from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, select
+
+from ..core.config import settings
+from ..db.database import engine
+from ..models import Paper, PaperNeighbor
+from . import pgvector_search
+from .embedding_generations import active_generation, missing_embedding
+from .vector_index import _as_unit_row, vector_index
+
+_PENDING_KEY = "_knn_graph_pending"
+_DEBOUNCE_S = 1.0
+_REFRESH_BATCH = 256
+_OFFER_FANOUT = 4        # 变更论文作为候选邻居提供给它最近的 4K 篇
+
+_edge = PaperNeighbor.__table__
+
+Neighbors = List[Tuple[int, float]]
+
+
+def _nearest(session: Session, paper_id: int, emb: Any, k: int) -> Neighbors:
+    """Top-k of one paper through the search index (pgvector or in-process)."""
+    if emb is None or len(emb) == 0:
+        return []
+    if pgvector_search.enabled():
+        hits = pgvector_search.search(session, emb, k=k + 1)
+    else:
+        hits = vector_index.search(emb, k=k + 1)
+    return [(pid, score) for pid, score in hits if pid != paper_id][:k]
+
+
+def _write_lists(session: Session, lists: Dict[int, Neighbors], gen_id: int) -> None:
+    # Core 语句：邻居表不属于 library 表，不推进 library_generation
+    if not lists:
+        return
+    conn = session.connection()
+    ids = list(lists)
+    for s in range(0, len(ids), 500):
+        conn.execute(delete(_edge).where(_edge.c.paper_id.in_(ids[s:s + 500])))
+    rows = [{"paper_id": pid, "rank": rank, "neighbor_id": nid, "score": score,
+             "generation_id": gen_id}
+            for pid, neighbors in lists.items() for rank, (nid, score) in enumerate(neighbors)]
+    if rows:
+        conn.execute(insert(_edge), rows)
+
+
+def _read_lists(session: Session, paper_ids: Iterable[int], gen_id: int) -> Dict[int, Neighbors]:
+    ids = list(paper_ids)
+    out: Dict[int, Neighbors] = {}
+    for s in range(0, len(ids), 500):
+        rows = session.exec(
+            select(PaperNeighbor.paper_id, PaperNeighbor.neighbor_id, PaperNeighbor.score)
+            .where(PaperNeighbor.paper_id.in_(ids[s:s + 500]),
+                   PaperNeighbor.generation_id == gen_id)
+            .order_by(PaperNeighbor.paper_id, PaperNeighbor.rank)
+        )
+        for pid, nid, score in rows:
+            out.setdefault(pid, []).append((nid, score))
+    return out
+
+
+class KnnGraph:
+    def __init__(self, k: int) -> None:
+        self.k = max(1, k)
+        self._cond = threading.Condition()
+        self._queue: Set[int] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.refreshed = 0
+        self.offered = 0
+        self.patched = 0
+        self.rescanned = 0
+        self.on_demand = 0
+        self.failed = 0
+
+    # ---------- reads ----------
+    def similar(self, session: Session, paper_id: int, k: Optional[int] = None) -> Neighbors:
+        """Top-k ``(paper_id, cosine)`` for one paper; O(k) when its list is current and k <= K."""
+        k = k or self.k
+        if k > self.k:
+            # 图里每篇只存 K 个邻居：要得更多就现算
+            emb = session.exec(select(Paper.embedding).where(Paper.id == paper_id)).first()
+            return _nearest(session, paper_id, emb, k)
+        gen = active_generation().id
+        rows = session.exec(
+            select(PaperNeighbor.neighbor_id, PaperNeighbor.score, PaperNeighbor.generation_id)
+            .where(PaperNeighbor.paper_id == paper_id)
+            .order_by(PaperNeighbor.rank)
+            .limit(k)
+        ).all()
+        if rows and rows[0][2] == gen:
+            return [(nid, score) for nid, score, _ in rows]
+        # 没有列表 / 旧代列表：这次现算，并排队落库
+        emb = session.exec(select(Paper.embedding).where(Paper.id == paper_id)).first()
+        self.on_demand += 1
+        self.enqueue([paper_id])
+        return _nearest(session, paper_id, emb, k)
+
+    def related(self, session: Session, seeds: Any, k: int,
+                exclude_seeds: bool = True) -> Neighbors:
+        """
+        Papers most related to a set of seed papers (``seeds``: id list or a
+        ``select`` of ids, e.g. a folder's papers): neighbour scores summed over
+        the seeds' lists, so a paper close to many seeds ranks first.
+        """
+        gen = active_generation().id
+        score = func.sum(PaperNeighbor.score).label("score")
+        stmt = (
+            select(PaperNeighbor.neighbor_id, score)
+            .where(PaperNeighbor.paper_id.in_(seeds), PaperNeighbor.generation_id == gen)
+            .group_by(PaperNeighbor.neighbor_id)
+        )
+        if exclude_seeds:
+            stmt = stmt.where(PaperNeighbor.neighbor_id.not_in(seeds))
+        rows = session.exec(stmt.order_by(score.desc(), PaperNeighbor.neighbor_id).limit(k)).all()
+        return [(int(nid), float(s)) for nid, s in rows]
+
+    # ---------- incremental refresh ----------
+    def enqueue(self, paper_ids: Iterable[int]) -> None:
+        ids = {int(i) for i in paper_ids if i is not None}
+        if not ids or not settings.KNN_GRAPH_AUTO:
+            return
+        with self._cond:
+            self._queue |= ids
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="knn-graph", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _take(self) -> List[int]:
+        with self._cond:
+            while not self._queue and not self._stopping:
+                self._cond.wait()
+            if self._stopping:
+                return []
+        time.sleep(_DEBOUNCE_S)
+        with self._cond:
+            batch = sorted(self._queue)[:_REFRESH_BATCH]
+            self._queue.difference_update(batch)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take()
+            if not batch:
+                return
+            try:
+                self.refresh(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"[knn_graph] refresh of {len(batch)} papers failed: {e}")
+
+    def refresh(self, paper_ids: Sequence[int]) -> int:
+        """Recompute the lists of changed / new / deleted ``paper_ids``; patch those around them."""
+        changed = set(paper_ids)
+        gen = active_generation().id
+        with Session(engine) as session:
+            referrers = set(session.exec(
+                select(PaperNeighbor.paper_id).where(PaperNeighbor.neighbor_id.in_(list(changed)))
+            ).all()) - changed
+            embs = dict(session.exec(
+                select(Paper.id, Paper.embedding).where(Paper.id.in_(sorted(changed | referrers)))
+            ).all())
+            lists: Dict[int, Neighbors] = {}
+            offers: Dict[int, Neighbors] = {}
+            for pid in changed:
+                # 一次检索：前 K 个是新列表，其余是可能要收下它的近邻
+                hits = _nearest(session, pid, embs.get(pid), self.k * _OFFER_FANOUT)
+                lists[pid] = hits[: self.k]
+                for nid, score in hits:
+                    if nid not in changed and nid not in referrers:
+                        offers.setdefault(nid, []).append((pid, score))
+
+            # 指向变更论文的列表：新分数不低于原列表最弱一条就原地改分，否则整条重搜
+            unit = {pid: _as_unit_row(emb) for pid, emb in embs.items()}
+            for rid, current in _read_lists(session, referrers, gen).items():
+                patched = self._patch(unit.get(rid), current, changed, unit)
+                if patched is not None:
+                    lists[rid] = patched
+                    self.patched += 1
+            for rid in referrers - lists.keys():
+                lists[rid] = _nearest(session, rid, embs.get(rid), self.k)
+                self.rescanned += 1
+
+            # 新向量比近邻列表里最弱的一条强：替换进去
+            for nid, current in _read_lists(session, offers, gen).items():
+                merged = sorted(current + offers[nid], key=lambda e: (-e[1], e[0]))[: self.k]
+                if merged != current:
+                    lists[nid] = merged
+                    self.offered += 1
+            _write_lists(session, lists, gen)
+            session.commit()
+        self.refreshed += len(changed)
+        return len(lists)
+
+    def _patch(self, own: Optional[Any], current: Neighbors, changed: Set[int],
+               unit: Dict[int, Any]) -> Optional[Neighbors]:
+        """``current`` with its changed entries rescored; None when it must be searched again."""
+        if own is None:
+            return None
+        floor = min(score for _, score in current) if len(current) >= self.k else -np.inf
+        out: Neighbors = []
+        for nid, score in current:
+            if nid in changed:
+                vec = unit.get(nid)
+                if vec is None or vec.shape != own.shape:
+                    return None         # 邻居已删 / 没有向量：需要补位
+                score = float(own @ vec)
+                if score < floor:
+                    return None         # 掉出前 K：列表外的论文可能更近
+            out.append((nid, score))
+        return sorted(out, key=lambda e: (-e[1], e[0]))
+
+    # ---------- full rebuild ----------
+    def rebuild(self, batch_size: int = 2048,
+                progress: Optional[Callable[[int, int, float], None]] = None) -> int:
+        """Recompute every list from the in-process index (exact), one transaction per batch."""
+        gen = active_generation(refresh=True).id
+        vector_index.ensure_built()
+        ids = sorted(int(i) for i in vector_index.indexed_ids())
+        t0 = time.perf_counter()
+        for s in range(0, len(ids), batch_size):
+            lists = vector_index.neighbors(ids[s:s + batch_size], self.k)
+            with Session(engine) as session:
+                _write_lists(session, lists, gen)
+                session.commit()
+            if progress is not None:
+                progress(min(s + batch_size, len(ids)), len(ids), time.perf_counter() - t0)
+        with Session(engine) as session:
+            # 旧代列表、以及已经没有向量的论文的列表
+            no_vector = select(Paper.id).where(missing_embedding())
+            session.connection().execute(
+                delete(_edge).where(or_(_edge.c.generation_id != gen,
+                                        _edge.c.paper_id.in_(no_vector)))
+            )
+            session.commit()
+        return len(ids)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "k": self.k,
+            "queued": queued,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "refreshed": self.refreshed,
+            "offered": self.offered,
+            "patched": self.patched,
+            "rescanned": self.rescanned,
+            "on_demand": self.on_demand,
+            "failed": self.failed,
+        }
+
+
+knn_graph = KnnGraph(settings.KNN_GRAPH_K)
+
+
+def delete_edges(session: Session, paper_id: int) -> None:
+    """
+    Drop a paper's edges (both directions) inside ``session``; lists that
+    pointed at it are refreshed after commit.
+    """
+    referrers = set(session.exec(
+        select(PaperNeighbor.paper_id).where(PaperNeighbor.neighbor_id == paper_id)
+    ).all()) - {paper_id}
+    session.connection().execute(
+        delete(_edge).where(or_(_edge.c.paper_id == paper_id, _edge.c.neighbor_id == paper_id))
+    )
+    if referrers:
+        session.info.setdefault(_PENDING_KEY, set()).update(referrers)
+
+
+# ---------- papers whose vector changed through the ORM ----------
+@event.listens_for(SASession, "after_flush")
+def _collect_changed_vectors(session: SASession, flush_context) -> None:
+    changed = [obj.id for obj in session.new
+               if isinstance(obj, Paper) and obj.id is not None and obj.embedding is not None]
+    changed += [obj.id for obj in session.dirty
+                if isinstance(obj, Paper) and obj.id is not None
+                and sa_inspect(obj).attrs.embedding.history.has_changes()]
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+@event.listens_for(SASession, "after_commit")
+def _enqueue_changed_vectors(session: SASession) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        knn_graph.enqueue(pending)
+
+
+@event.listens_for(SASession, "after_soft_rollback")
+def _drop_changed_vectors(session: SASession, previous_transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,117 @@
+# backend/app/services/paper_keys.py
+"""
+Derived, indexed columns on ``paper``: ``venue_abbr`` (venue abbreviation,
+the same table as the frontend) and ``title_norm`` (lower-cased title with
+everything but [a-z0-9] removed; ``COALESCE(doi, title_norm)`` is the dedup
+key).  Both are computed when a Paper is inserted or its title / venue
+change, so list filters and dedup run in SQL.
+
+``backfill`` fills rows written before the columns existed (``init_db``
+runs it for rows still NULL; ``python -m app.cli.paper_keys --all``
+recomputes every row after the abbreviation table changes).
+"""
+from __future__ import annotations
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import bindparam, event, func, update
+from sqlmodel import Session, select
+
+from ..models import Paper
+
+# venue 缩写映射（与前端一致）；先列出的优先
+VENUE_ABBR_PATTERNS: List[tuple[str, str]] = [
+    (r"international symposium on microarchitecture|(^|\W)micro(\W|$)", "MICRO"),
+    (r"programming language design and implementation|(^|\W)pldi(\W|$)", "PLDI"),
+    (r"international symposium on computer architecture|(^|\W)isca(\W|$)", "ISCA"),
+    (r"architectural support for programming languages|(^|\W)asplos?(\W|$)", "ASPLOS"),
+    (r"transactions on architecture and code optimization|(^|\W)taco(\W|$)", "TACO"),
+    (r"transactions on design automation of electronic systems|(^|\W)todaes(\W|$)", "TODAES"),
+    (r"design automation conference|(^|\W)dac(\W|$)", "DAC"),
+    (r"neurips|nips", "NeurIPS"),
+    (r"international conference on machine learning|(^|\W)icml(\W|$)", "ICML"),
+    (r"computer vision and pattern recognition|(^|\W)cvpr(\W|$)", "CVPR"),
+    (r"international conference on computer vision|(^|\W)iccv(\W|$)", "ICCV"),
+    (r"european conference on computer vision|(^|\W)eccv(\W|$)", "ECCV"),
+    (r"very large data bases|(^|\W)vldb(\W|$)", "VLDB"),
+    (r"sigmod", "SIGMOD"),
+    (r"the web conference|(^|\W)www(\W|$)", "WWW"),
+    (r"supercomputing|(^|\W)sc(\W|$)", "SC"),
+    (r"siggraph", "SIGGRAPH"),
+]
+
+# 一条正则：每个模式是锚在开头的一个前瞻分支，按顺序尝试，第一个命中的分支即结果
+# （与逐条 search 同口径：看列表顺序，不看在字符串里的位置）
+_VENUE_MATCHER = re.compile(
+    "^(?:"
+    + "|".join(f"(?=[\\s\\S]*?(?P<v{i}>{pat}))" for i, (pat, _) in enumerate(VENUE_ABBR_PATTERNS))
+    + ")",
+    re.I,
+)
+_ABBR_BY_GROUP = {f"v{i}": abbr for i, (_, abbr) in enumerate(VENUE_ABBR_PATTERNS)}
+# 查询参数大小写不敏感：大写 -> 库里存的写法
+ABBR_BY_UPPER: Dict[str, str] = {abbr.upper(): abbr for _, abbr in VENUE_ABBR_PATTERNS}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def venue_abbr(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    m = _VENUE_MATCHER.match(name)
+    return _ABBR_BY_GROUP[m.lastgroup] if m else None
+
+
+def norm_title(s: Optional[str]) -> str:
+    if not s:
+        return ""
+    return _NON_ALNUM.sub("", s.lower())
+
+
+def dedup_key():
+    """SQL expression of the dedup key (DOI, else normalised title)."""
+    return func.coalesce(func.nullif(Paper.doi, ""), Paper.title_norm)
+
+
+# ---------- write time ----------
+@event.listens_for(Paper, "before_insert")
+@event.listens_for(Paper, "before_update")
+def _fill_keys(mapper, connection, target: Paper) -> None:
+    target.venue_abbr = venue_abbr(target.venue)
+    target.title_norm = norm_title(target.title)
+
+
+# ---------- backfill ----------
+def backfill(session: Session, everything: bool = False, batch_size: int = 2000,
+             progress: Optional[Callable[[int, int, float], None]] = None) -> int:
+    """Compute the columns for rows lacking them (``everything``: all rows), a commit per batch."""
+    stmt = select(Paper.id, Paper.venue, Paper.title).order_by(Paper.id)
+    if not everything:
+        stmt = stmt.where(Paper.title_norm.is_(None))
+    total = session.exec(select(func.count()).select_from(stmt.subquery())).one()
+    # Core UPDATE：派生列不算内容修改，不推进 library_generation / updated_at
+    upd = (
+        update(Paper.__table__)
+        .where(Paper.__table__.c.id == bindparam("pid"))
+        .values(venue_abbr=bindparam("abbr"), title_norm=bindparam("tnorm"))
+    )
+    done, last_id = 0, 0
+    t0 = time.perf_counter()
+    while True:
+        rows = session.exec(stmt.where(Paper.id > last_id).limit(batch_size)).all()
+        if not rows:
+            break
+        session.connection().execute(
+            upd, [{"pid": pid, "abbr": venue_abbr(venue), "tnorm": norm_title(title)}
+                  for pid, venue, title in rows]
+        )
+        session.commit()
+        done += len(rows)
+        last_id = rows[-1][0]
+        if progress is not None:
+            progress(done, total, time.perf_counter() - t0)
+    if done:
+        logger.info(f"[paper_keys] backfilled venue_abbr / title_norm for {done} papers")
+    return done
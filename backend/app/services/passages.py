@@ -0,0 +1,279 @@
+# backend/app/services/passages.py
+"""
+Passage-level semantic search over MinerU-parsed full text.
+
+Pipeline: MinerU Markdown (``storage/mineru/cache/<pdf sha1>/…/*.md``) ->
+section-aware passages (``split_markdown``) -> batched embeddings -> ``passage``
+rows -> ``passage_index``, a second vector index (IVF by default) keyed by
+passage id.  ``index_paper`` is idempotent per MinerU cache key, so re-running
+it for an unchanged PDF is a no-op.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
+
+from loguru import logger
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from ..core.config import settings
+from ..db.database import engine
+from ..models import Paper, Passage
+from .embedding import embed_batched
+from .embedding_generations import on_switch
+from .vector_index import create_index
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_SENTENCE_RE = re.compile(r"(?<=[.!?。！？；;])\s+")
+# 参考文献 / 致谢之后的内容对检索只有噪声
+_SKIP_SECTION_RE = re.compile(
+    r"^\W*(\d+(\.\d+)*\.?\s*)?(references|bibliography|acknowledg(e)?ments?|参考文献|致谢)\b", re.I)
+_MIN_PASSAGE_CHARS = 40
+_DB_BATCH = 512
+
+passage_index = create_index("passages", backend=settings.PASSAGE_INDEX_BACKEND, source=Passage)
+
+
+@on_switch
+def _rebuild_on_switch(old, new) -> None:
+    # activate() 已清空旧模型的段落向量；再跑一次 index_passages 即按新模型重新编码
+    passage_index.invalidate()
+
+
+# ---------- chunking ----------
+def _clean(text: str) -> str:
+    text = _IMAGE_RE.sub(" ", text)
+    text = _HTML_TAG_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+def _split_long(par: str, max_chars: int) -> List[str]:
+    """超长段落：先按句切，单句仍超长则硬切"""
+    if len(par) <= max_chars:
+        return [par]
+    out: List[str] = []
+    cur = ""
+    for sent in _SENTENCE_RE.split(par):
+        while len(sent) > max_chars:
+            if cur:
+                out.append(cur)
+                cur = ""
+            out.append(sent[:max_chars])
+            sent = sent[max_chars:]
+        if cur and len(cur) + 1 + len(sent) > max_chars:
+            out.append(cur)
+            cur = sent
+        else:
+            cur = f"{cur} {sent}" if cur else sent
+    if cur:
+        out.append(cur)
+    return out
+
+
+def _tail(text: str, n: int) -> str:
+    if n <= 0 or len(text) <= n:
+        return text if n > 0 else ""
+    cut = text[-n:]
+    sp = cut.find(" ")
+    return cut[sp + 1:] if 0 <= sp < len(cut) - 1 else cut
+
+
+def split_markdown(md: str, max_chars: Optional[int] = None,
+                   overlap: Optional[int] = None) -> List[Tuple[Optional[str], str]]:
+    """
+    Markdown -> ``[(section path, passage text)]``.
+
+    Paragraphs are packed into passages of at most ``max_chars`` without
+    crossing a heading; consecutive passages in one section share an
+    ``overlap``-character tail.  References / acknowledgements are dropped.
+    """
+    max_chars = max_chars or settings.PASSAGE_MAX_CHARS
+    overlap = settings.PASSAGE_OVERLAP_CHARS if overlap is None else overlap
+
+    # 1) 段落 + 所属章节
+    sections: List[Tuple[Optional[str], List[str]]] = []
+    stack: List[Tuple[int, str]] = []     # (heading level, title)
+    skipping = False
+    buf: List[str] = []
+
+    def flush_par() -> None:
+        if buf and not skipping:
+            par = _clean(" ".join(buf))
+            if par:
+                sec = " > ".join(t for _, t in stack) or None
+                if not sections or sections[-1][0] != sec:
+                    sections.append((sec, []))
+                sections[-1][1].append(par)
+        buf.clear()
+
+    for line in (md or "").splitlines():
+        m = _HEADING_RE.match(line.strip())
+        if m:
+            flush_par()
+            level, title = len(m.group(1)), _clean(m.group(2))
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, title))
+            skipping = bool(_SKIP_SECTION_RE.match(title))
+        elif line.strip():
+            buf.append(line.strip())
+        else:
+            flush_par()
+    flush_par()
+
+    # 2) 章节内打包
+    out: List[Tuple[Optional[str], str]] = []
+    for sec, pars in sections:
+        cur = ""
+        prev = ""
+        for par in pars:
+            for piece in _split_long(par, max(max_chars - overlap, max_chars // 2)):
+                if cur and len(cur) + 1 + len(piece) > max_chars:
+                    out.append((sec, cur))
+                    prev = cur
+                    cur = ""
+                if not cur and prev:
+                    tail = _tail(prev, overlap)
+                    cur = tail if len(tail) + 1 + len(piece) <= max_chars else ""
+                cur = f"{cur} {piece}" if cur else piece
+        if cur and len(cur) >= _MIN_PASSAGE_CHARS:
+            out.append((sec, cur))
+    return out
+
+
+# ---------- locating MinerU output ----------
+def _mineru_cache_root() -> Path:
+    return Path(os.environ.get("MINERU_TMP_DIR", "storage/mineru")).resolve() / "cache"
+
+
+def _local_pdf(pdf_url: Optional[str]) -> Optional[Path]:
+    """/files/... -> STORAGE_DIR 下的本地文件（远程 PDF 由 /mineru/parse 带 paper_id 时直接入库）"""
+    if not pdf_url:
+        return None
+    path = unquote(urlparse(pdf_url).path)
+    if not path.startswith("/files/"):
+        return None
+    p = Path(settings.STORAGE_DIR) / path[len("/files/"):]
+    return p if p.is_file() else None
+
+
+def _sha1_file(path: Path, chunk: int = 1024 * 1024) -> str:
+    h = hashlib.sha1()
+    with path.open("rb") as f:
+        for b in iter(lambda: f.read(chunk), b""):
+            h.update(b)
+    return h.hexdigest()
+
+
+def locate_markdown(pdf_url: Optional[str]) -> Optional[Tuple[str, Path]]:
+    """(cache_key, newest .md) for a paper's PDF if MinerU has parsed it."""
+    pdf = _local_pdf(pdf_url)
+    if pdf is None:
+        return None
+    key = _sha1_file(pdf)
+    out_dir = _mineru_cache_root() / key
+    if not out_dir.is_dir():
+        return None
+    mds = list(out_dir.rglob("*.md"))
+    if not mds:
+        return None
+    return key, max(mds, key=lambda p: p.stat().st_mtime)
+
+
+# ---------- indexing ----------
+def index_paper(paper_id: int, markdown: Optional[str] = None, source_key: Optional[str] = None,
+                force: bool = False) -> int:
+    """
+    (Re)build the passages of one paper.  Without ``markdown`` the MinerU cache
+    is looked up from the paper's PDF.  Returns the number of passages written
+    (0 when nothing changed or no Markdown is available).
+    """
+    with Session(engine) as session:
+        paper = session.get(Paper, paper_id)
+        if paper is None:
+            return 0
+        if markdown is None:
+            found = locate_markdown(paper.pdf_url)
+            if found is None:
+                return 0
+            source_key, md_path = found
+            markdown = md_path.read_text("utf-8", errors="ignore")
+        if not force and source_key:
+            existing = session.exec(
+                select(Passage.id).where(Passage.paper_id == paper_id,
+                                         Passage.source_key == source_key,
+                                         Passage.embedding.is_not(None)).limit(1)
+            ).first()
+            if existing is not None:
+                return 0
+
+        chunks = split_markdown(markdown)
+        vecs = embed_batched([f"{sec}: {txt}" if sec else txt for sec, txt in chunks])
+
+        old_ids = delete_for_paper(session, paper_id)
+        rows = [
+            Passage(paper_id=paper_id, ordinal=i, section=sec, text=txt, source_key=source_key,
+                    embedding=vec)
+            for i, ((sec, txt), vec) in enumerate(zip(chunks, vecs))
+        ]
+        for s in range(0, len(rows), _DB_BATCH):
+            session.add_all(rows[s:s + _DB_BATCH])
+            session.flush()
+        session.commit()
+        changes: Dict[int, Optional[List[float]]] = {pid: None for pid in old_ids}
+        changes.update({r.id: r.embedding for r in rows})
+
+    passage_index.apply(changes)
+    logger.info(f"[passages] paper#{paper_id}: {len(rows)} passages (replaced {len(old_ids)})")
+    return len(rows)
+
+
+def delete_for_paper(session: Session, paper_id: int) -> List[int]:
+    """Delete a paper's passages inside ``session``; hand the ids to ``forget`` after commit."""
+    ids = list(session.exec(select(Passage.id).where(Passage.paper_id == paper_id)))
+    if ids:
+        session.exec(delete(Passage).where(Passage.paper_id == paper_id))
+    return ids
+
+
+def forget(passage_ids: Sequence[int]) -> None:
+    if passage_ids:
+        passage_index.apply({pid: None for pid in passage_ids})
+
+
+# ---------- search ----------
+def search(query_vec: Sequence[float], k: int, paper_id: Optional[int] = None, per_paper: int = 3,
+           nprobe: Optional[int] = None) -> List[Tuple[Passage, float]]:
+    """Top-k passages, at most ``per_paper`` from any one paper."""
+    passage_index.ensure_built()
+    allowed = None
+    with Session(engine) as session:
+        if paper_id is not None:
+            allowed = set(session.exec(select(Passage.id).where(Passage.paper_id == paper_id)))
+        # 过采样，给“每篇最多 per_paper 段”的截断留余量
+        depth = k if per_paper <= 0 else k * 4
+        hits = passage_index.search(query_vec, k=depth, allowed=allowed, nprobe=nprobe)
+        if not hits:
+            return []
+        rows = session.exec(select(Passage).where(Passage.id.in_([pid for pid, _ in hits]))).all()
+        by_id = {r.id: r for r in rows}
+        out: List[Tuple[Passage, float]] = []
+        taken: Dict[int, int] = {}
+        for pid, score in hits:
+            row = by_id.get(pid)
+            if row is None:
+                continue
+            if per_paper > 0 and taken.get(row.paper_id, 0) >= per_paper:
+                continue
+            taken[row.paper_id] = taken.get(row.paper_id, 0) + 1
+            session.expunge(row)
+            out.append((row, score))
+            if len(out) >= k:
+                break
+        return out
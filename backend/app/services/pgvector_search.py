@@ -0,0 +1,136 @@
+# backend/app/services/pgvector_search.py
+"""
+Semantic top-k inside Postgres.
+
+``init_db`` creates an HNSW (or IVFFlat) index on ``paper.embedding``; queries
+here order by ``embedding <=> :q`` so the planner can walk that index, and any
+filters the caller adds land in the same statement instead of being applied to
+a Python-side candidate list.  SQLite deployments keep using
+``services/vector_index.py``.
+"""
+from __future__ import annotations
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_, text
+from sqlmodel import Session, select
+
+from ..core.config import settings
+from ..db import database
+from ..models import Paper
+
+_MAX_EF_SEARCH = 1000
+_OVERFETCH = 10          # pgvector < 0.8 的过滤查询：先取 want * _OVERFETCH 个近邻再过滤
+
+
+def enabled() -> bool:
+    return database.pgvector_enabled
+
+
+def _iterative_mode() -> Optional[str]:
+    """iterative_scan mode for filtered queries, or None when off / unsupported (pgvector < 0.8)."""
+    mode = (settings.PGVECTOR_ITERATIVE_SCAN or "").strip().lower()
+    if mode not in ("relaxed_order", "strict_order") or database.pgvector_version < (0, 8):
+        return None
+    return mode
+
+
+def _set_search_knobs(session: Session, want: int, nprobe: Optional[int],
+                      iterative: Optional[str] = None) -> None:
+    # SET LOCAL 只作用于当前事务；SET 不接受绑定参数，值均为整数/白名单字符串
+    kind = settings.PGVECTOR_INDEX.strip().lower()
+    if kind == "hnsw":
+        ef = min(max(settings.PGVECTOR_EF_SEARCH, want), _MAX_EF_SEARCH)
+        session.exec(text(f"SET LOCAL hnsw.ef_search = {int(ef)}"))
+    elif kind == "ivfflat":
+        probes = max(1, nprobe or settings.VECTOR_INDEX_NPROBE)
+        session.exec(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+    if iterative and kind in ("hnsw", "ivfflat"):
+        # 过滤 / 游标把索引扫描出的 ef_search 个候选筛掉后，继续往下扫，直到凑够 LIMIT
+        session.exec(text(f"SET LOCAL {kind}.iterative_scan = {iterative}"))
+
+
+def _ordered(rows) -> List[Tuple[int, float]]:
+    hits = [(int(pid), float(sc)) for pid, sc in rows]
+    hits.sort(key=lambda h: (-h[1], h[0]))
+    return hits
+
+
+def search(
+    session: Session,
+    query: Sequence[float],
+    k: int,
+    offset: int = 0,
+    after: Optional[Tuple[float, int]] = None,
+    where: Optional[Callable] = None,
+    nprobe: Optional[int] = None,
+) -> List[Tuple[int, float]]:
+    """
+    Top-k ``(paper_id, cosine_similarity)`` ordered by score desc, id asc.
+    ``where`` receives the select and returns it with the caller's filters
+    applied; ``after=(score, id)`` is the keyset cursor of the previous page.
+
+    An HNSW scan only yields about ``ef_search`` candidates, so filters and
+    the cursor would leave a page short.  Such queries run with
+    ``iterative_scan`` on pgvector >= 0.8; older versions over-fetch
+    unfiltered neighbours and filter those instead (see ``_search_overfetch``).
+    """
+    if k <= 0:
+        return []
+    want = k + (0 if after is not None else offset)
+    filtered = where is not None or after is not None
+    iterative = _iterative_mode() if filtered else None
+    if filtered and iterative is None:
+        return _search_overfetch(session, query, k, offset, after, where, nprobe)
+
+    distance = Paper.embedding.cosine_distance(list(query))
+    score = (1 - distance).label("score")
+    stmt = select(Paper.id, score).where(Paper.embedding.is_not(None))
+    if where is not None:
+        stmt = where(stmt)
+    if after is not None:
+        s, pid = after
+        stmt = stmt.where(or_(1 - distance < s, and_(1 - distance == s, Paper.id > pid)))
+    elif offset:
+        stmt = stmt.offset(offset)
+    stmt = stmt.order_by(distance, Paper.id).limit(k)
+
+    _set_search_knobs(session, want, nprobe, iterative)
+    # relaxed_order 返回的行可能略微乱序：按 (score desc, id) 重排，游标才接得上
+    return _ordered(session.exec(stmt))
+
+
+def _search_overfetch(
+    session: Session,
+    query: Sequence[float],
+    k: int,
+    offset: int,
+    after: Optional[Tuple[float, int]],
+    where: Optional[Callable],
+    nprobe: Optional[int],
+) -> List[Tuple[int, float]]:
+    """
+    Filtered search without iterative_scan: take the ``(k + offset) *
+    _OVERFETCH`` nearest papers from the index (``_MAX_EF_SEARCH`` for a
+    cursor page; ef_search raised to match), then apply the filters and the cursor to
+    those ids only and rank them here.  Matches beyond that candidate set are
+    not found.
+    """
+    distance = Paper.embedding.cosine_distance(list(query))
+    # 游标页的位置未知：直接取上限个候选
+    n = _MAX_EF_SEARCH if after is not None else min((k + offset) * _OVERFETCH, _MAX_EF_SEARCH)
+    _set_search_knobs(session, n, nprobe)
+    ids = session.exec(
+        select(Paper.id).where(Paper.embedding.is_not(None)).order_by(distance).limit(n)
+    ).all()
+    if not ids:
+        return []
+    # 第二步按主键取候选，不带 ORDER BY distance：规划器不会再走 ANN 索引
+    stmt = select(Paper.id, (1 - distance).label("score")).where(Paper.id.in_(ids))
+    if where is not None:
+        stmt = where(stmt)
+    if after is not None:
+        s, pid = after
+        stmt = stmt.where(or_(1 - distance < s, and_(1 - distance == s, Paper.id > pid)))
+    hits = _ordered(session.exec(stmt))
+    start = 0 if after is not None else offset
+    return hits[start:start + k]
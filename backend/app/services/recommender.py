@@ -1,6 +1,234 @@
-from typing import List
+# backend/app/services/recommender.py
+"""
+Paper recommendations.
+
+``recommend_similar`` reads one paper's precomputed neighbour list
+(services/knn_graph.py); ``recommend_related`` merges the lists of a set of
+seed papers (a folder, a tag, a hand-picked selection).
+
+``recommend_blended`` adds the bipartite graphs in ``PaperAuthorLink`` and
+``PaperTagLink``: both are held as sparse paper x author / paper x tag
+incidence matrices X in CSR form (plus the transposed CSR for the postings),
+and one paper's overlap scores are its row of ``X W Xᵀ`` with
+``W = diag(idf²)``, normalised like a cosine, so sharing a rare tag or a
+small group's author counts more than sharing "to-read".  That row is a
+sparse vector-matrix product over the paper's few postings, not a pass over
+the library.  The matrices are rebuilt in the background once a write moves
+``library_generation``; queries meanwhile use the previous build.
+"""
+from __future__ import annotations
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
 from loguru import logger
+from sqlmodel import Session, select
+
+from ..core.config import settings
+from ..db.database import engine
+from ..models import PaperAuthorLink, PaperTagLink
+from .generation import library_generation
+from .knn_graph import knn_graph
+
+_CANDIDATES = 50          # 每路信号取前 N 个候选
+_RESULT_CACHE_SIZE = 2048
+_RESULT_TTL_S = 60.0      # 向量邻居在后台更新，不推进 library_generation
+
+
+def recommend_similar(session: Session, paper_id: int,
+                      k: Optional[int] = None) -> List[Tuple[int, float]]:
+    """-> [(paper_id, cosine)] most similar first."""
+    return knn_graph.similar(session, paper_id, k)
+
+
+def recommend_related(session: Session, seeds: Any, k: int = 20) -> List[Tuple[int, float]]:
+    """-> [(paper_id, summed cosine)] near the ``seeds`` (ids or a select), seeds excluded."""
+    return knn_graph.related(session, seeds, k)
+
+
+# ---------- co-author / co-tag overlap ----------
+class Incidence:
+    """0/1 paper x feature matrix in CSR, both directions, with idf weights."""
+
+    def __init__(self, pairs: np.ndarray) -> None:
+        pairs = np.unique(pairs.reshape(-1, 2).astype(np.int64), axis=0)
+        papers, feats = pairs[:, 0], pairs[:, 1]
+        n_rows = int(papers.max()) + 1 if papers.size else 0
+        # 特征 id 压成 0..F-1
+        self.features, f = np.unique(feats, return_inverse=True)
+        n_feat = len(self.features)
+        # paper -> features（pairs 已按 paper 排好序）
+        self.row_ptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(papers, minlength=n_rows), out=self.row_ptr[1:])
+        self.row_feat = f
+        # feature -> papers
+        order = np.argsort(f, kind="stable")
+        self.col_ptr = np.zeros(n_feat + 1, dtype=np.int64)
+        np.cumsum(np.bincount(f, minlength=n_feat), out=self.col_ptr[1:])
+        self.col_paper = papers[order]
+        df = np.diff(self.col_ptr)
+        n_papers = max(1, len(np.unique(papers)))
+        self.weight = np.log1p(n_papers / np.maximum(df, 1)) ** 2        # W = idf²
+        row_w = np.zeros(n_rows, dtype=np.float64)
+        np.add.at(row_w, papers, self.weight[f])
+        self.row_norm = np.sqrt(row_w)
+        self.nnz = len(pairs)
+
+    def scores(self, paper_id: int, k: int) -> List[Tuple[int, float]]:
+        """Top-k ``(paper_id, normalised overlap)`` for one paper, itself excluded."""
+        if paper_id >= len(self.row_ptr) - 1:
+            return []
+        feats = self.row_feat[self.row_ptr[paper_id]:self.row_ptr[paper_id + 1]]
+        if feats.size == 0:
+            return []
+        starts, ends = self.col_ptr[feats], self.col_ptr[feats + 1]
+        postings = np.concatenate([self.col_paper[s:e] for s, e in zip(starts, ends)])
+        weights = np.repeat(self.weight[feats], ends - starts)
+        cand, inv = np.unique(postings, return_inverse=True)
+        acc = np.bincount(inv, weights=weights)
+        acc /= self.row_norm[paper_id] * self.row_norm[cand]
+        keep = cand != paper_id
+        cand, acc = cand[keep], acc[keep]
+        if cand.size > k:
+            top = np.argpartition(-acc, k - 1)[:k]
+            cand, acc = cand[top], acc[top]
+        order = np.lexsort((cand, -acc))
+        return [(int(cand[i]), float(acc[i])) for i in order]
+
+
+def _pairs(session: Session, left: Any, right: Any) -> np.ndarray:
+    # np.asarray(Row 列表) 每行都走慢路径；展平成一条整数流快一个数量级
+    rows = session.connection().execute(select(left, right)).all()
+    flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows))
+    return flat.reshape(-1, 2)
+
+
+class CoOccurrenceIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.authors: Optional[Incidence] = None
+        self.tags: Optional[Incidence] = None
+        self.generation = -1
+        self._building = False
+        self._results: "OrderedDict[Tuple[int, int], Tuple[float, int, Any]]" = OrderedDict()
+        self.builds = 0
+        self.build_ms = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def build(self) -> None:
+        gen = library_generation.value
+        t0 = time.perf_counter()
+        with Session(engine) as session:
+            authors = _pairs(session, PaperAuthorLink.paper_id, PaperAuthorLink.author_id)
+            tags = _pairs(session, PaperTagLink.paper_id, PaperTagLink.tag_id)
+        a, t = Incidence(authors), Incidence(tags)
+        with self._lock:
+            self.authors, self.tags, self.generation = a, t, gen
+            self._results.clear()
+            self.builds += 1
+            self.build_ms = (time.perf_counter() - t0) * 1000
+        logger.info(f"[recommender] co-occurrence built: {a.nnz} author links, {t.nnz} tag links "
+                    f"in {self.build_ms:.0f} ms")
+
+    def _build_in_background(self) -> None:
+        try:
+            self.build()
+        except Exception as e:
+            logger.warning(f"[recommender] co-occurrence rebuild failed: {e}")
+        finally:
+            self._building = False
+
+    def ensure_current(self) -> None:
+        if self.authors is None:
+            with self._lock:
+                first = self.authors is None and not self._building
+                if first:
+                    self._building = True
+            if first:
+                try:
+                    self.build()
+                finally:
+                    self._building = False
+            return
+        if self.generation != library_generation.value and not self._building:
+            # 写库之后：后台重建，这期间继续用上一版矩阵
+            with self._lock:
+                if self._building:
+                    return
+                self._building = True
+            threading.Thread(target=self._build_in_background, name="cooccurrence-build",
+                             daemon=True).start()
+
+    def signals(self, paper_id: int,
+                k: int) -> Tuple[List[Tuple[int, float]], List[Tuple[int, float]]]:
+        """-> (co-author, co-tag) top-k overlaps."""
+        self.ensure_current()
+        authors, tags = self.authors, self.tags
+        if authors is None or tags is None:
+            return [], []
+        return authors.scores(paper_id, k), tags.scores(paper_id, k)
+
+    def cached(self, key: Tuple[int, int], compute) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            hit = self._results.get(key)
+            if hit is not None and hit[1] == self.generation and now - hit[0] < _RESULT_TTL_S:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return hit[2]
+            self.misses += 1
+            gen = self.generation
+        value = compute()
+        with self._lock:
+            self._results[key] = (now, gen, value)
+            self._results.move_to_end(key)
+            while len(self._results) > _RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "generation": self.generation,
+                "current": self.generation == library_generation.value,
+                "author_links": self.authors.nnz if self.authors else 0,
+                "tag_links": self.tags.nnz if self.tags else 0,
+                "builds": self.builds,
+                "build_ms": round(self.build_ms, 1),
+                "cached": len(self._results),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+cooccurrence = CoOccurrenceIndex()
+
+
+def recommend_blended(session: Session, paper_id: int, k: int = 10) -> List[Dict[str, Any]]:
+    """
+    Blend embedding similarity with co-author and co-tag overlap:
+    ``score = w_e·cosine + w_a·authors + w_t·tags`` (``RECOMMEND_WEIGHT_*``);
+    a candidate outside one signal's top list contributes 0 for it.
+    -> [{"id", "score", "signals": {...}}] best first.
+    """
+    def compute() -> List[Dict[str, Any]]:
+        # 向量一路只取图里存的 K 个：k > K 时 similar 会退回全量扫描
+        emb = dict(knn_graph.similar(session, paper_id, min(_CANDIDATES, knn_graph.k)))
+        authors, tags = cooccurrence.signals(paper_id, _CANDIDATES)
+        authors, tags = dict(authors), dict(tags)
+        w_e, w_a, w_t = (settings.RECOMMEND_WEIGHT_EMBEDDING, settings.RECOMMEND_WEIGHT_AUTHORS,
+                         settings.RECOMMEND_WEIGHT_TAGS)
+        out = []
+        for pid in set(emb) | set(authors) | set(tags):
+            sig = {"embedding": emb.get(pid, 0.0), "authors": authors.get(pid, 0.0),
+                   "tags": tags.get(pid, 0.0)}
+            score = w_e * sig["embedding"] + w_a * sig["authors"] + w_t * sig["tags"]
+            out.append({"id": pid, "score": score, "signals": sig})
+        out.sort(key=lambda r: (-r["score"], r["id"]))
+        return out
 
-def recommend_similar(paper_id: int) -> List[int]:
-    logger.info(f"Recommender stub invoked for paper_id={paper_id}")
-    return []
\ No newline at end of file
+    return cooccurrence.cached((paper_id, _CANDIDATES), compute)[:k]
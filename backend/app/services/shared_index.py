@@ -0,0 +1,380 @@
+# backend/app/services/shared_index.py
+"""
+Vector index shared by several worker processes through memory-mapped files.
+
+Layout under ``<STORAGE_DIR>/index/<name>-<kind>/``::
+
+    CURRENT.json          {"generation": 9, "dir": "g00000007",
+                           "deltas": ["d00000008", "d00000009"],
+                           "delta_rows": 12, "meta": {...}}
+    g00000007/mat.npy     float32 rows (n x dim)            -- base generation
+    g00000007/ids.npy     int64 row ids
+    g00000007/*.npy       backend extras (IVF centroids / assignments)
+    d00000008/ids.npy     upserted ids + their unit rows (mat.npy) and removed ids (dropped.npy)
+    .lock                 flock serialising publishers
+
+Every worker maps the base generation read-only (``np.load(mmap_mode="r")``),
+so the page cache holds one copy whatever the worker count and loading copies
+nothing.  A worker that commits embedding changes queues them; a publish
+(debounced, or forced by the next search in that worker) takes the lock and
+writes only the queued rows as a delta segment, then swaps ``CURRENT.json``
+with ``os.replace``.  Readers keep the deltas as a small in-memory overlay:
+base rows they replace or remove are masked, their rows are scored next to
+the base.  Once the deltas exceed ``VECTOR_INDEX_COMPACT_RATIO`` of the base
+(at least ``_COMPACT_MIN_ROWS`` rows) or ``_MAX_DELTAS`` segments, the publish
+compacts instead: it loads the newest base privately, folds in the deltas and
+the queue, and writes base ``g+1``.  Other workers notice the new
+``CURRENT.json`` on their next search (one ``stat``) and remap — only the
+deltas when the base is unchanged.  Publishing always starts from the newest
+``CURRENT.json``, so writes from different workers are never lost.
+"""
+from __future__ import annotations
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
+from sqlmodel import Session
+
+from ..core.config import settings
+from ..db.database import engine
+from .vector_index import _as_unit_row
+
+try:
+    import fcntl
+except ImportError:  # Windows：无 flock，退回进程内索引
+    fcntl = None
+
+_CURRENT = "CURRENT.json"
+_PUBLISH_DELAY_S = 1.0
+_COMPACT_MIN_ROWS = 1024
+_MAX_DELTAS = 64
+
+Delta = Tuple[np.ndarray, np.ndarray, np.ndarray]   # (ids, unit rows, dropped ids)
+
+
+def shared_supported() -> bool:
+    return fcntl is not None
+
+
+class _Arrays:
+    """np.load 结果的统一视图（_install / _restore_extra 需要 .files 与 [name]）"""
+
+    def __init__(self, root: Path, mmap: bool) -> None:
+        self._root = root
+        self._mode = "r" if mmap else None
+        self.files = [p.stem for p in root.glob("*.npy")]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return np.load(self._root / f"{name}.npy", mmap_mode=self._mode, allow_pickle=False)
+
+
+def _read_delta(root: Path) -> Delta:
+    return tuple(np.load(root / f"{name}.npy", allow_pickle=False)
+                 for name in ("ids", "mat", "dropped"))
+
+
+class _Overlay:
+    """Deltas on top of a mapped base: the newest row per id, and which base rows are still live."""
+
+    def __init__(self, base_ids: np.ndarray, deltas: List[Delta], dim: int) -> None:
+        latest: Dict[int, Optional[np.ndarray]] = {}
+        for ids, mat, dropped in deltas:         # 按发布顺序：后面的段覆盖前面的
+            for pid in dropped.tolist():
+                latest[pid] = None
+            for pid, row in zip(ids.tolist(), mat):
+                latest[pid] = row
+        live = [(pid, row) for pid, row in latest.items() if row is not None]
+        self.ids = np.asarray([pid for pid, _ in live], dtype=np.int64)
+        self.mat = np.vstack([row for _, row in live]).astype(np.float32) if live \
+            else np.zeros((0, dim), dtype=np.float32)
+        self.live = ~np.isin(base_ids, np.fromiter(latest, dtype=np.int64, count=len(latest)))
+        self.rows = len(latest)
+
+
+class SharedIndexMixin:
+    """Mixed in front of ``VectorIndex`` / ``IVFFlatIndex`` by ``create_index(shared=True)``."""
+
+    shared = True
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.root = self.path.with_suffix("") if self.path is not None else None
+        self.generation = 0
+        self._stamp: Optional[int] = None
+        self._pending: Dict[int, Any] = {}
+        self._publish_timer: Optional[threading.Timer] = None
+        self._base_dir: Optional[str] = None     # 当前只读映射的基础代目录
+        self._overlay: Optional[_Overlay] = None
+
+    # ---------- files ----------
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a+") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _read_current(self) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads((self.root / _CURRENT).read_text("utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _current_stamp(self) -> Optional[int]:
+        try:
+            return (self.root / _CURRENT).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _map(self, current: Dict[str, Any], private: bool = False) -> None:
+        """
+        Install a published generation: read-only mmap of the base plus the
+        deltas as an overlay, or a writable private copy with the deltas folded in.
+        """
+        deltas = [_read_delta(self.root / d) for d in current.get("deltas", ())]
+        with self._lock:
+            if private or self._base_dir != current["dir"] or not self.ready:
+                data = _Arrays(self.root / current["dir"], mmap=not private)
+                self._install(data, current["meta"], with_pos=private)
+                self._base_dir = None if private else current["dir"]
+            self._overlay = None
+            if private:
+                for ids, mat, dropped in deltas:
+                    self._apply_locked({**dict.fromkeys(dropped.tolist()),
+                                        **dict(zip(ids.tolist(), mat))})
+            elif deltas:
+                self._overlay = _Overlay(self._ids[:self._n], deltas, self.dim or 0)
+            self.generation = int(current["generation"])
+
+    def _publish(self, current: Dict[str, Any]) -> None:
+        tmp = self.root / f"{_CURRENT}.tmp"
+        tmp.write_text(json.dumps(current), "utf-8")
+        os.replace(tmp, self.root / _CURRENT)
+        # 不再引用的代 / 段直接删：已映射的进程仍持有 inode，换代后自然释放
+        keep = {current["dir"], *current.get("deltas", ())}
+        for old in self.root.iterdir():
+            if old.is_dir() and not old.name.startswith(".") and old.name not in keep:
+                shutil.rmtree(old, ignore_errors=True)
+
+    def _write_dir(self, name: str, arrays: Dict[str, np.ndarray]) -> None:
+        tmp_dir = self.root / f".{name}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        for key, arr in arrays.items():
+            np.save(tmp_dir / f"{key}.npy", np.ascontiguousarray(arr))
+        os.replace(tmp_dir, self.root / name)
+
+    def _write_generation(self) -> Dict[str, Any]:
+        """Write the in-memory (private) state as a new base generation without deltas."""
+        gen = self.generation + 1
+        name = f"g{gen:08d}"
+        self._write_dir(name, self._snapshot_arrays())
+        current = {"generation": gen, "dir": name, "meta": self._snapshot_meta()}
+        self._publish(current)
+        return current
+
+    def _write_delta(self, current: Dict[str, Any], changes: Dict[int, Any]) -> Dict[str, Any]:
+        """Write ``changes`` as one delta segment on top of ``current``."""
+        dim = current["meta"].get("dim")
+        ids: List[int] = []
+        rows: List[np.ndarray] = []
+        dropped: List[int] = []
+        for pid, emb in changes.items():
+            v = _as_unit_row(emb)
+            if v is not None and v.shape[0] != dim:
+                logger.warning(f"[vector_index] row#{pid} dim={v.shape[0]} != index dim={dim}, "
+                               f"skipped")
+                v = None
+            if v is None:
+                dropped.append(int(pid))
+            else:
+                ids.append(int(pid))
+                rows.append(v)
+        gen = int(current["generation"]) + 1
+        name = f"d{gen:08d}"
+        self._write_dir(name, {
+            "ids": np.asarray(ids, dtype=np.int64),
+            "mat": np.vstack(rows) if rows else np.zeros((0, dim), dtype=np.float32),
+            "dropped": np.asarray(dropped, dtype=np.int64),
+        })
+        current = {**current, "generation": gen, "deltas": [*current.get("deltas", ()), name],
+                   "delta_rows": int(current.get("delta_rows", 0)) + len(changes)}
+        self._publish(current)
+        return current
+
+    def _should_compact(self, current: Dict[str, Any], extra: int) -> bool:
+        meta = current["meta"]
+        base = int(meta.get("size") or 0)
+        if not meta.get("dim") or base == 0:
+            return True     # 空的基础代：没有维度可对齐，直接写全量
+        rows = int(current.get("delta_rows", 0)) + extra
+        return (len(current.get("deltas", ())) >= _MAX_DELTAS
+                or rows > max(_COMPACT_MIN_ROWS, settings.VECTOR_INDEX_COMPACT_RATIO * base))
+
+    def _delta_ids(self, current: Dict[str, Any]) -> Set[int]:
+        out: Set[int] = set()
+        for d in current.get("deltas", ()):
+            ids, _, dropped = _read_delta(self.root / d)
+            out.update(ids.tolist())
+            out.update(dropped.tolist())
+        return out
+
+    # ---------- lifecycle ----------
+    def ensure_built(self) -> None:
+        if self.ready:
+            return
+        with self._lock:
+            if self.ready:
+                return
+            with self._file_lock():
+                current = self._read_current()
+                with Session(engine) as session:
+                    if current is not None and current["meta"].get("kind") == self.kind \
+                            and self._snapshot_is_current(session, current["meta"]):
+                        saved_max = int(current["meta"].get("max_id") or 0)
+                        fresh = self._catch_up_rows(session, saved_max)
+                        # 基础代之后的新行多半已在增量段里
+                        covered = self._delta_ids(current) if fresh else set()
+                        fresh = {pid: emb for pid, emb in fresh.items() if pid not in covered}
+                        if not fresh:
+                            self._map(current)
+                            self._stamp = self._current_stamp()
+                            logger.info(f"[vector_index] mapped shared {self.kind} "
+                                        f"g{self.generation} n={self._n}")
+                            return
+                        self._map(current, private=True)
+                        self._apply_locked(fresh)
+                    else:
+                        if current is not None:
+                            self.generation = int(current["generation"])
+                        self.build(session)
+                current = self._write_generation()
+                self._map(current)
+                self._stamp = self._current_stamp()
+        logger.info(f"[vector_index] published shared {self.kind} g{self.generation} n={self._n}")
+
+    def apply(self, changes: Dict[int, Any]) -> None:
+        if not changes:
+            return
+        with self._lock:
+            if not self.ready:
+                return
+            self._pending.update(changes)
+        self._schedule_save()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._pending.clear()   # 旧模型的向量，不再发布
+            self.ready = False
+
+    def _schedule_save(self) -> None:
+        if self._publish_timer is not None:
+            self._publish_timer.cancel()
+        t = threading.Timer(_PUBLISH_DELAY_S, self._save_quietly)
+        t.daemon = True
+        self._publish_timer = t
+        t.start()
+
+    def save(self, compact: bool = False) -> None:
+        """
+        Publish queued changes as a delta segment, or as a new compacted base
+        generation once the deltas grow too large (``compact``: always).
+        No-op when there is nothing to publish.
+        """
+        with self._lock:
+            if self._publish_timer is not None:
+                self._publish_timer.cancel()
+                self._publish_timer = None
+            pending, self._pending = self._pending, {}
+            try:
+                with self._file_lock():
+                    current = self._read_current()
+                    has_deltas = current is not None and bool(current.get("deltas"))
+                    if not pending and not (compact and has_deltas):
+                        return
+                    full = compact or current is None or self._should_compact(current, len(pending))
+                    if not full:
+                        current = self._write_delta(current, pending)
+                    else:
+                        if current is not None:
+                            self._map(current, private=True)
+                        self._apply_locked(pending)
+                        current = self._write_generation()
+                    self._map(current)
+                    self._stamp = self._current_stamp()
+            except Exception:
+                pending.update(self._pending)
+                self._pending = pending
+                raise
+        logger.info(f"[vector_index] published {self.kind} g{self.generation} "
+                    f"({'compacted' if full else 'delta'}, +{len(pending)} changes)")
+
+    def compact(self) -> None:
+        """Fold the delta segments (and queued changes) into a new base generation."""
+        self.save(compact=True)
+
+    def _refresh(self) -> None:
+        """Publish own queued changes, then remap if another worker published."""
+        if self._pending:
+            self.save()
+        stamp = self._current_stamp()
+        if stamp is None or stamp == self._stamp:
+            return
+        with self._lock:
+            current = self._read_current()
+            if current is not None and int(current["generation"]) != self.generation:
+                self._map(current)
+            self._stamp = stamp
+
+    # ---------- overlay ----------
+    def _merge_extra(self, q: np.ndarray, rows: Optional[np.ndarray], ids: np.ndarray,
+                     scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        ov = self._overlay
+        if ov is None:
+            return ids, scores
+        live = ov.live if rows is None else ov.live[rows]
+        scores = np.where(live, scores, -np.inf)     # 被增量段替换 / 删除的基础行
+        return np.concatenate([ids, ov.ids]), np.concatenate([scores, ov.mat @ q])
+
+    # ---------- query ----------
+    def search(self, *args: Any, **kwargs: Any):
+        self.ensure_built()
+        self._refresh()
+        return super().search(*args, **kwargs)
+
+    def indexed_ids(self) -> np.ndarray:
+        self.ensure_built()
+        self._refresh()
+        with self._lock:
+            ids = self._ids[: self._n]
+            ov = self._overlay
+            return ids.copy() if ov is None else np.concatenate([ids[ov.live], ov.ids])
+
+    def neighbors(self, *args: Any, **kwargs: Any):
+        self.ensure_built()
+        self._refresh()
+        if self._overlay is not None:
+            self.compact()      # 全量近邻本来就要扫所有行：先把增量段并进矩阵
+        return super().neighbors(*args, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        out = super().stats()
+        ov = self._overlay
+        out.update({
+            "shared": True,
+            "generation": self.generation,
+            "pending": len(self._pending),
+            "delta_rows": ov.rows if ov is not None else 0,
+            "mapped": not self._mat.flags.writeable,   # 只读 = 直接映射的文件页
+            "path": str(self.root) if self.root else None,
+        })
+        return out
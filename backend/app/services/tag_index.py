@@ -0,0 +1,408 @@
+# backend/app/services/tag_index.py
+"""
+In-process inverted index: tag -> bitmap of paper ids.
+
+Bitmaps are Python ints (bit ``i`` set <=> paper ``i`` carries the tag), so
+AND / OR / NOT over any number of tags are single big-int operations and a
+per-tag count is ``int.bit_count()``.  The index is built lazily from
+``PaperTagLink`` and remembers the shared ``library_generation`` it is
+current at.  Commits in this process are applied as per-paper deltas (links
+added / removed, papers and tags created / deleted, ``delete(PaperTagLink)
+.where(<paper_id | tag_id> == x)``) and move it to the generation the commit
+bumped to; a generation it did not see coming — a write in another worker,
+raw SQL, an untracked bulk statement — makes the next query rebuild it, so
+every worker filters on current tag sets.
+
+Tag expressions: ``a AND (b OR NOT "register allocation")``; ``&`` ``|`` ``!``
+work as operators too, adjacent terms are AND-ed, and names containing
+spaces or parentheses must be double-quoted.
+"""
+from __future__ import annotations
+import itertools
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import and_, event, false, inspect as sa_inspect, literal_column, true
+from sqlalchemy.orm import Session as SASession
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+from sqlmodel import Session, select
+
+from ..db.database import engine
+from ..models import Paper, PaperTagLink, Tag
+from .generation import library_generation, on_bump
+
+_INLINE_IN_MAX = 500
+_DELTA_KEY = "_tag_index_delta"
+_STALE_KEY = "_tag_index_stale"
+_LINK_TABLE = PaperTagLink.__table__.name
+
+
+def bitmap_from_ids(ids: Iterable[int]) -> int:
+    arr = ids if isinstance(ids, np.ndarray) else np.fromiter((int(i) for i in ids), dtype=np.int64)
+    if arr.size == 0:
+        return 0
+    # 逐个 |= 会反复拷贝大整数；先在 numpy 里置位再一次性转成 int
+    bits = np.zeros(int(arr.max()) + 1, dtype=bool)
+    bits[arr] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def ids_from_bitmap(bm: int) -> List[int]:
+    if bm <= 0:
+        return []
+    raw = np.frombuffer(bm.to_bytes((bm.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little")).tolist()
+
+
+def ids_condition(ids: List[int], negate: bool = False):
+    """Paper.id [NOT] IN (...)：大集合直接内联整数，避免超出 SQLite 绑定参数上限"""
+    if not ids:
+        return true() if negate else false()
+    if len(ids) <= _INLINE_IN_MAX:
+        return Paper.id.not_in(ids) if negate else Paper.id.in_(ids)
+    inline = literal_column("(" + ",".join(str(int(i)) for i in ids) + ")")
+    return Paper.id.op("NOT IN" if negate else "IN")(inline)
+
+
+def bitmap_condition(bm: int):
+    """
+    WHERE Paper.id is in ``bm``.  A bitmap covering most of the library (NOT
+    queries) is written as ``id <= max(bm) AND id NOT IN (complement)``, so
+    the inlined list is the smaller side.
+    """
+    if bm <= 0:
+        return false()
+    universe = tag_index.universe
+    if 2 * bm.bit_count() <= universe.bit_count():
+        return ids_condition(ids_from_bitmap(bm))
+    hi = bm.bit_length() - 1
+    rest = universe & ~bm & ((1 << (hi + 1)) - 1)
+    return and_(Paper.id <= hi, ids_condition(ids_from_bitmap(rest), negate=True))
+
+
+class TagExprError(ValueError):
+    pass
+
+
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+
+
+def _tokenize(expr: str) -> List[tuple]:
+    out, pos = [], 0
+    expr = expr.strip()
+    while pos < len(expr):
+        m = _TOKEN_RE.match(expr, pos)
+        if not m or m.end() == pos:
+            raise TagExprError(f"unexpected input at {pos}: {expr[pos:pos + 10]!r}")
+        pos = m.end()
+        lp, rp, quoted, word = m.groups()
+        if lp:
+            out.append(("(", None))
+        elif rp:
+            out.append((")", None))
+        elif quoted is not None:
+            out.append(("name", quoted.replace('\\"', '"')))
+        else:
+            op = word.upper()
+            if op in ("AND", "&", "&&"):
+                out.append(("and", None))
+            elif op in ("OR", "|", "||"):
+                out.append(("or", None))
+            elif op in ("NOT", "!", "-"):
+                out.append(("not", None))
+            elif word.startswith(("!", "-")) and len(word) > 1:
+                out += [("not", None), ("name", word[1:])]
+            else:
+                out.append(("name", word))
+    return out
+
+
+class TagIndex:
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._bits: Dict[int, int] = {}        # tag_id -> bitmap
+        self._names: Dict[str, int] = {}       # name -> tag_id
+        self._universe = 0                     # 所有 paper id（NOT 的全集）
+        self.ready = False
+        self.generation = -1
+
+    # ---------- build ----------
+    def build(self, session: Session) -> None:
+        gen = library_generation.value     # 先取代数：构建期间的写入会让下次查询再重建
+        link = select(PaperTagLink.tag_id, PaperTagLink.paper_id)
+        rows = session.connection().execute(link).all()
+        flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows))
+        links = flat.reshape(-1, 2)
+        # 按 tag 分组，每组一次性置位（逐条 |= 1 << pid 会反复拷贝大整数）
+        links = links[np.argsort(links[:, 0], kind="stable")]
+        tids, starts = np.unique(links[:, 0], return_index=True)
+        bits: Dict[int, int] = {
+            int(tid): bitmap_from_ids(group)
+            for tid, group in zip(tids, np.split(links[:, 1], starts[1:]))
+        }
+        names = {name: tid for tid, name in session.exec(select(Tag.id, Tag.name))}
+        for tid in names.values():
+            bits.setdefault(tid, 0)
+        universe = bitmap_from_ids(session.exec(select(Paper.id)))
+        with self._lock:
+            self._bits, self._names, self._universe = bits, names, universe
+            self.generation = gen
+            self.ready = True
+        logger.debug(f"[tag_index] built at generation {gen}: tags={len(bits)} "
+                     f"papers={universe.bit_count()}")
+
+    def ensure_built(self) -> None:
+        if self.ready and self.generation == library_generation.value:
+            return
+        with self._lock:
+            if self.ready and self.generation == library_generation.value:
+                return
+            with Session(engine) as session:
+                self.build(session)
+
+    def invalidate(self) -> None:
+        self.ready = False
+
+    # ---------- deltas ----------
+    def apply(self, ops: List[tuple], value: int) -> None:
+        """
+        Apply one local commit's changes; the index moves to generation
+        ``value`` only when it was current just before that commit's bump.
+        """
+        with self._lock:
+            if not self.ready:
+                return
+            bits, names = self._bits, self._names
+            for op in ops:
+                kind = op[0]
+                if kind == "link":
+                    _, tid, pid, present = op
+                    if present:
+                        bits[tid] = bits.get(tid, 0) | (1 << pid)
+                    elif bits.get(tid, 0) >> pid & 1:
+                        bits[tid] &= ~(1 << pid)
+                elif kind == "paper":
+                    _, pid, present = op
+                    if present:
+                        self._universe |= 1 << pid
+                    else:
+                        self._universe &= ~(1 << pid)
+                        self._clear_paper(pid)
+                elif kind == "clear_paper":
+                    self._clear_paper(op[1])
+                elif kind == "clear_tag":
+                    if op[1] in bits:
+                        bits[op[1]] = 0
+                elif kind == "tag":
+                    _, tid, name = op
+                    for n in [n for n, t in names.items() if t == tid]:
+                        del names[n]
+                    if name is None:
+                        bits.pop(tid, None)
+                    else:
+                        names[name] = tid
+                        bits.setdefault(tid, 0)
+            # 中间夹着别处的写入（代数跳了不止一格）时不前移：下次查询重建
+            if self.generation == value - 1:
+                self.generation = value
+
+    def _clear_paper(self, pid: int) -> None:
+        mask = ~(1 << pid)
+        for tid, bm in self._bits.items():
+            if bm >> pid & 1:
+                self._bits[tid] = bm & mask
+
+    @property
+    def universe(self) -> int:
+        self.ensure_built()
+        with self._lock:
+            return self._universe
+
+    # ---------- queries ----------
+    def bitmap_for_name(self, name: str) -> int:
+        tid = self._names.get(name)
+        return self._bits.get(tid, 0) if tid is not None else 0
+
+    def resolve(self, expr: str) -> int:
+        """Evaluate a tag expression to a paper-id bitmap."""
+        self.ensure_built()
+        tokens = _tokenize(expr)
+        if not tokens:
+            raise TagExprError("empty tag expression")
+        pos = 0
+
+        def peek():
+            return tokens[pos][0] if pos < len(tokens) else None
+
+        def parse_or() -> int:
+            nonlocal pos
+            v = parse_and()
+            while peek() == "or":
+                pos += 1
+                v |= parse_and()
+            return v
+
+        def parse_and() -> int:
+            nonlocal pos
+            v = parse_not()
+            while peek() in ("and", "not", "name", "("):
+                if peek() == "and":
+                    pos += 1
+                v &= parse_not()
+            return v
+
+        def parse_not() -> int:
+            nonlocal pos
+            kind = peek()
+            if kind == "not":
+                pos += 1
+                return self._universe & ~parse_not()
+            if kind == "(":
+                pos += 1
+                v = parse_or()
+                if peek() != ")":
+                    raise TagExprError("missing ')'")
+                pos += 1
+                return v
+            if kind == "name":
+                name = tokens[pos][1]
+                pos += 1
+                return self.bitmap_for_name(name)
+            raise TagExprError(f"unexpected token {kind!r}")
+
+        with self._lock:
+            result = parse_or()
+            if pos != len(tokens):
+                raise TagExprError(f"unexpected token {tokens[pos][0]!r}")
+            return result
+
+    def all_of(self, names: Iterable[str]) -> int:
+        """逗号分隔的旧参数：全部命中（AND）"""
+        self.ensure_built()
+        with self._lock:
+            bm = self._universe
+            for n in names:
+                bm &= self.bitmap_for_name(n)
+            return bm
+
+    def for_tag_id(self, tag_id: int) -> int:
+        self.ensure_built()
+        with self._lock:
+            return self._bits.get(tag_id, 0)
+
+    def counts(self) -> Dict[int, int]:
+        self.ensure_built()
+        with self._lock:
+            return {tid: bm.bit_count() for tid, bm in self._bits.items()}
+
+    def names_by_id(self) -> Dict[int, str]:
+        self.ensure_built()
+        with self._lock:
+            return {tid: name for name, tid in self._names.items()}
+
+
+tag_index = TagIndex()
+
+
+def filter_bitmap(tags: Optional[str] = None, tag_expr: Optional[str] = None,
+                  tag_id: Optional[int] = None) -> Optional[int]:
+    """Combine the tag filters an endpoint accepts; None means "no tag filter"."""
+    bm: Optional[int] = None
+    if tags:
+        names = [t.strip() for t in tags.split(",") if t.strip()]
+        if names:
+            bm = tag_index.all_of(names)
+    if tag_expr and tag_expr.strip():
+        e = tag_index.resolve(tag_expr)
+        bm = e if bm is None else bm & e
+    if tag_id is not None:
+        t = tag_index.for_tag_id(tag_id)
+        bm = t if bm is None else bm & t
+    return bm
+
+
+# ---------- keep the index in sync with this process's commits ----------
+def _flush_ops(session: SASession) -> List[tuple]:
+    ops: List[tuple] = []
+    # 先删后增：同一次 flush 里删掉的 id 可能被新行复用
+    for obj in session.deleted:
+        if isinstance(obj, PaperTagLink):
+            ops.append(("link", obj.tag_id, obj.paper_id, False))
+        elif isinstance(obj, Paper):
+            ops.append(("paper", obj.id, False))
+        elif isinstance(obj, Tag):
+            ops.append(("tag", obj.id, None))
+    for obj in session.dirty:
+        if isinstance(obj, Tag) and sa_inspect(obj).attrs.name.history.has_changes():
+            ops.append(("tag", obj.id, obj.name))
+        elif isinstance(obj, PaperTagLink):
+            state = sa_inspect(obj).attrs
+            if state.tag_id.history.has_changes() or state.paper_id.history.has_changes():
+                session.info[_STALE_KEY] = True
+    for obj in session.new:
+        if isinstance(obj, PaperTagLink):
+            ops.append(("link", obj.tag_id, obj.paper_id, True))
+        elif isinstance(obj, Paper):
+            ops.append(("paper", obj.id, True))
+        elif isinstance(obj, Tag):
+            ops.append(("tag", obj.id, obj.name))
+    return ops
+
+
+@event.listens_for(SASession, "after_flush")
+def _collect_tag_changes(session: SASession, flush_context) -> None:
+    ops = _flush_ops(session)
+    if ops:
+        session.info.setdefault(_DELTA_KEY, []).extend(ops)
+
+
+def _bulk_link_delete(stmt) -> Optional[tuple]:
+    """delete(PaperTagLink).where(<paper_id | tag_id> == x) -> 对应的清除操作；其它形状返回 None"""
+    wc = stmt.whereclause
+    if not (isinstance(wc, BinaryExpression) and wc.operator is operators.eq
+            and isinstance(wc.right, BindParameter)):
+        return None
+    key = getattr(wc.left, "key", None)
+    value = wc.right.effective_value
+    if getattr(getattr(wc.left, "table", None), "name", None) != _LINK_TABLE or value is None:
+        return None
+    if key == "paper_id":
+        return ("clear_paper", int(value))
+    if key == "tag_id":
+        return ("clear_tag", int(value))
+    return None
+
+
+@event.listens_for(SASession, "do_orm_execute")
+def _collect_bulk_tag_changes(state) -> None:
+    if not (state.is_update or state.is_delete or state.is_insert):
+        return
+    name = getattr(getattr(state.statement, "table", None), "name", None)
+    if name == _LINK_TABLE:
+        op = _bulk_link_delete(state.statement) if state.is_delete else None
+    elif name == Tag.__table__.name or (name == Paper.__table__.name and not state.is_update):
+        op = None
+    else:
+        return      # 其它表、或只改 paper 的列：与标签位图无关
+    if op is None:
+        state.session.info[_STALE_KEY] = True
+    else:
+        state.session.info.setdefault(_DELTA_KEY, []).append(op)
+
+
+@on_bump
+def _apply_tag_changes(session: SASession, value: int) -> None:
+    ops = session.info.pop(_DELTA_KEY, None) or []
+    if session.info.pop(_STALE_KEY, False):
+        return      # 有无法增量的批量语句：代数落后，下次查询重建
+    tag_index.apply(ops, value)
+
+
+@event.listens_for(SASession, "after_soft_rollback")
+def _drop_tag_changes(session: SASession, previous_transaction) -> None:
+    session.info.pop(_DELTA_KEY, None)
+    session.info.pop(_STALE_KEY, None)
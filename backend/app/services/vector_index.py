@@ -0,0 +1,546 @@
+# backend/app/services/vector_index.py
+"""
+Process-wide vector index for semantic search.
+
+Embeddings are kept as one contiguous float32 matrix of L2-normalised rows plus
+a parallel int64 id array, so a query is a matrix-vector product followed by a
+partial sort.  ``VectorIndex`` scans every row; ``IVFFlatIndex``
+(services/ivf_index.py) narrows the scan to the ``nprobe`` closest clusters.
+The backend is picked by ``settings.VECTOR_INDEX_BACKEND``.
+
+The index is snapshotted to ``<STORAGE_DIR>/index/`` so startup loads the file
+(and only catches up rows added since) instead of re-scanning ``paper``, and it
+is kept current through SQLAlchemy session events: Paper rows inserted /
+updated / deleted in a flush are applied once the transaction commits.
+Changes committed while the index is being built or loaded are queued and
+replayed on top of it, and a snapshot records the library watermark taken
+before its rows were read, so a restart never trusts rows it does not hold.
+``create_index`` builds further indexes over other tables with an
+``embedding`` column (e.g. full-text passages, services/passages.py).
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import event, func, inspect as sa_inspect
+from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, select
+
+from ..core.config import settings
+from ..db.database import engine
+from ..models import Paper
+from .embedding_generations import active_generation, on_switch
+
+_PENDING_KEY = "_vector_index_pending"
+_SAVE_DELAY_S = 5.0
+
+
+def _as_unit_row(vec: Any) -> Optional[np.ndarray]:
+    """list/ndarray -> 归一化后的 float32 向量；空向量或零向量返回 None"""
+    if vec is None:
+        return None
+    arr = np.asarray(vec, dtype=np.float32).reshape(-1)
+    if arr.size == 0:
+        return None
+    norm = float(np.linalg.norm(arr))
+    if not np.isfinite(norm) or norm < 1e-12:
+        return None
+    return arr / norm
+
+
+def _top_order(ids: np.ndarray, scores: np.ndarray, want: int) -> np.ndarray:
+    """
+    Positions of the ``want`` best rows ordered by (score desc, id asc).
+    Every row tied with the ``want``-th score is ranked before the cut, so
+    the id tie-break (and the ``(score, id)`` cursor) sees all of them.
+    """
+    m = scores.shape[0]
+    if want < m:
+        kth = np.partition(-scores, want - 1)[want - 1]
+        top = np.flatnonzero(-scores <= kth)
+    else:
+        top = np.arange(m)
+    return top[np.lexsort((ids[top], -scores[top]))][:want]
+
+
+def _library_watermark(session: Session, max_id: Optional[int] = None,
+                       source: Any = Paper) -> Dict[str, Any]:
+    """(count, max id, max updated_at) of embedded rows, optionally limited to id <= max_id."""
+    stmt = select(func.count(source.id), func.max(source.id), func.max(source.updated_at)).where(
+        source.embedding.is_not(None)
+    )
+    if max_id is not None:
+        stmt = stmt.where(source.id <= max_id)
+    count, mx, upd = session.exec(stmt).one()
+    return {"count": int(count or 0), "max_id": int(mx or 0),
+            "max_updated": upd.isoformat() if upd else None}
+
+
+class VectorIndex:
+    """Exact (brute-force) cosine index over normalised float32 rows."""
+
+    kind = "flat"
+
+    def __init__(self, path: Optional[Path] = None, source: Any = None) -> None:
+        self.path = path
+        self.source = source or Paper      # 行来源：带 id / embedding / updated_at 的表
+        self._lock = threading.RLock()
+        self._mat = np.zeros((0, 0), dtype=np.float32)   # capacity x dim
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._pos: Dict[int, int] = {}                  # paper_id -> row
+        self._n = 0
+        self._save_timer: Optional[threading.Timer] = None
+        self.dim: Optional[int] = None
+        self.embedding_generation: Optional[int] = None   # 构建时的 embedding 代
+        self.ready = False
+        self._build_lock = threading.Lock()
+        self._build_queue: Optional[Dict[int, Any]] = None   # 构建 / 加载期间到达的改动，装好后重放
+        self._watermark: Dict[str, Any] = {"count": 0, "max_id": 0, "max_updated": None}
+
+    # ---------- subclass hooks ----------
+    def _on_reset(self) -> None:
+        """矩阵被整体替换（build / load）之后调用"""
+
+    def _on_capacity(self, cap: int) -> None:
+        """行容量扩张到 cap 时调用"""
+
+    def _on_row_set(self, row: int, vec: np.ndarray) -> None:
+        """第 row 行写入了新向量"""
+
+    def _on_row_moved(self, src: int, dst: int) -> None:
+        """删除时最后一行 src 被搬到 dst"""
+
+    def _candidate_rows(self, q: np.ndarray, **params: Any) -> Optional[np.ndarray]:
+        """需要打分的行号；None 表示全部"""
+        return None
+
+    def _merge_extra(self, q: np.ndarray, rows: Optional[np.ndarray], ids: np.ndarray,
+                     scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """打分结果再并入矩阵之外的行（共享索引的增量段）；rows 同 _candidate_rows"""
+        return ids, scores
+
+    def _extra_state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def _restore_extra(self, data: Any, meta: Dict[str, Any]) -> None:
+        pass
+
+    # ---------- build ----------
+    def _load_rows(
+        self, rows: Iterable[Tuple[int, Any]]
+    ) -> Tuple[List[int], List[np.ndarray], Optional[int]]:
+        ids: List[int] = []
+        vecs: List[np.ndarray] = []
+        dim: Optional[int] = None
+        skipped = 0
+        for pid, emb in rows:
+            v = _as_unit_row(emb)
+            if v is None:
+                continue
+            if dim is None:
+                dim = v.shape[0]
+            if v.shape[0] != dim:
+                skipped += 1
+                continue
+            ids.append(int(pid))
+            vecs.append(v)
+        if skipped:
+            logger.warning(f"[vector_index] skipped {skipped} embeddings with dim != {dim}")
+        return ids, vecs, dim
+
+    def build(self, session: Session) -> None:
+        src = self.source
+        gen = active_generation().id
+        # 水位线在扫描之前取：之后的提交不一定在矩阵里，快照不能声称包含它们
+        watermark = _library_watermark(session, source=src)
+        rows = session.exec(select(src.id, src.embedding).where(src.embedding.is_not(None)))
+        ids, vecs, dim = self._load_rows(rows)
+        mat = np.ascontiguousarray(np.vstack(vecs), dtype=np.float32) if vecs \
+            else np.zeros((0, dim or 0), dtype=np.float32)
+        with self._lock:
+            self.dim = dim
+            self._mat = mat
+            self._ids = np.asarray(ids, dtype=np.int64)
+            self._pos = {pid: i for i, pid in enumerate(ids)}
+            self._n = len(ids)
+            self.embedding_generation = gen
+            self._watermark = watermark
+            self._on_reset()
+            self.ready = True
+        logger.info(f"[vector_index] built {self.kind}: n={self._n} dim={self.dim}")
+
+    def ensure_built(self) -> None:
+        if self.ready:
+            return
+        with self._build_lock:
+            if self.ready:
+                return
+            # 扫描 / 加载不持 self._lock：期间提交的改动由 apply 记进队列，装好后按序重放
+            with self._lock:
+                self._build_queue = {}
+            try:
+                with Session(engine) as session:
+                    loaded = self.load(session)
+                    if not loaded:
+                        self.build(session)
+            finally:
+                with self._lock:
+                    queued, self._build_queue = self._build_queue, None
+                    if self.ready and queued:
+                        self._apply_locked(queued)
+            if queued:
+                logger.debug(f"[vector_index] replayed {len(queued)} changes queued "
+                             f"during the build / load")
+            if not loaded:
+                self.save()
+
+    # ---------- persistence ----------
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self.ready:
+                return
+            n = self._n
+            meta = self._snapshot_meta()
+            arrays = {**self._snapshot_arrays(), "meta": np.array(json.dumps(meta))}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self.path)
+        logger.info(f"[vector_index] saved {self.kind} snapshot n={n} -> {self.path}")
+
+    def _snapshot_meta(self) -> Dict[str, Any]:
+        # 水位线是构建（或所加载快照）开始时的：保存时再查会把已提交、尚未 apply 的行算进去
+        return {"kind": self.kind, "dim": self.dim, "size": self._n,
+                "embedding_generation": self.embedding_generation, **self._watermark}
+
+    def _snapshot_arrays(self) -> Dict[str, np.ndarray]:
+        n = self._n
+        return {"mat": self._mat[:n], "ids": self._ids[:n], **self._extra_state()}
+
+    def _snapshot_is_current(self, session: Session, meta: Dict[str, Any]) -> bool:
+        # 快照之后只允许“新增”，否则（删改 / 换了 embedding 代）整体重建
+        if meta.get("embedding_generation") != active_generation().id:
+            return False
+        old = _library_watermark(session, max_id=int(meta.get("max_id") or 0), source=self.source)
+        return old["count"] == meta.get("count") and old["max_updated"] == meta.get("max_updated")
+
+    def _install(self, data: Any, meta: Dict[str, Any], with_pos: bool = True) -> None:
+        """Adopt snapshot arrays (``data[name]``) as the live state; caller holds the lock."""
+        mat = np.asarray(data["mat"], dtype=np.float32)
+        ids = np.asarray(data["ids"], dtype=np.int64)
+        self.dim = meta.get("dim")
+        self.embedding_generation = meta.get("embedding_generation")
+        self._watermark = {k: meta.get(k) for k in ("count", "max_id", "max_updated")}
+        self._mat = mat if mat.size else np.zeros((0, self.dim or 0), dtype=np.float32)
+        self._ids = ids
+        # 只读映射的副本不做增量维护，省掉 id -> row 字典
+        self._pos = {int(pid): i for i, pid in enumerate(ids)} if with_pos else {}
+        self._n = len(ids)
+        self._on_reset()
+        self._restore_extra(data, meta)
+        self.ready = True
+
+    def _catch_up_rows(self, session: Session, saved_max: int) -> Dict[int, Any]:
+        src = self.source
+        fresh = session.exec(
+            select(src.id, src.embedding).where(src.id > saved_max, src.embedding.is_not(None))
+        ).all()
+        return {int(pid): emb for pid, emb in fresh}
+
+    def _schedule_save(self) -> None:
+        if self.path is None:
+            return
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+        t = threading.Timer(_SAVE_DELAY_S, self._save_quietly)
+        t.daemon = True
+        self._save_timer = t
+        t.start()
+
+    def _save_quietly(self) -> None:
+        try:
+            self.save()
+        except Exception as e:
+            logger.warning(f"[vector_index] snapshot save failed: {e}")
+
+    def load(self, session: Session) -> bool:
+        """Load the snapshot and catch up with papers added since. False -> caller rebuilds."""
+        if self.path is None or not self.path.exists():
+            return False
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("kind") != self.kind:
+                    logger.info(f"[vector_index] snapshot kind={meta.get('kind')} != {self.kind}, "
+                                f"rebuilding")
+                    return False
+                if not self._snapshot_is_current(session, meta):
+                    logger.info("[vector_index] snapshot is stale (rows changed), rebuilding")
+                    return False
+                with self._lock:
+                    self._install(data, meta)
+        except Exception as e:
+            logger.warning(f"[vector_index] failed to load snapshot {self.path}: {e}")
+            return False
+
+        fresh = self._catch_up_rows(session, int(meta.get("max_id") or 0))
+        if fresh:
+            self.apply(fresh)
+        logger.info(f"[vector_index] loaded {self.kind} snapshot n={self._n}, "
+                    f"caught up {len(fresh)} new rows")
+        return True
+
+    # ---------- incremental maintenance ----------
+    def _reserve(self, extra: int) -> None:
+        need = self._n + extra
+        cap = self._mat.shape[0]
+        if need <= cap:
+            return
+        new_cap = max(need, cap * 2, 64)
+        mat = np.zeros((new_cap, self.dim or 0), dtype=np.float32)
+        mat[: self._n] = self._mat[: self._n]
+        ids = np.zeros(new_cap, dtype=np.int64)
+        ids[: self._n] = self._ids[: self._n]
+        self._mat, self._ids = mat, ids
+        self._on_capacity(new_cap)
+
+    def _remove_locked(self, paper_id: int) -> None:
+        row = self._pos.pop(paper_id, None)
+        if row is None:
+            return
+        last = self._n - 1
+        if row != last:
+            # 用最后一行填洞，保持矩阵连续
+            self._mat[row] = self._mat[last]
+            moved = int(self._ids[last])
+            self._ids[row] = moved
+            self._pos[moved] = row
+            self._on_row_moved(last, row)
+        self._n = last
+
+    def apply(self, changes: Dict[int, Any]) -> None:
+        """Apply ``{paper_id: embedding | None}``; None (or a zero vector) removes the row."""
+        if not changes:
+            return
+        with self._lock:
+            if self._build_queue is not None:
+                self._build_queue.update(changes)   # 构建中：装好后重放
+                return
+            if not self.ready:
+                return  # 尚未构建：首次查询时会完整加载
+            self._apply_locked(changes)
+        self._schedule_save()
+
+    def _apply_locked(self, changes: Dict[int, Any]) -> None:
+        for pid, emb in changes.items():
+            v = _as_unit_row(emb)
+            if v is None:
+                self._remove_locked(pid)
+                continue
+            if self.dim is None or self._n == 0 and v.shape[0] != self.dim:
+                self.dim = v.shape[0]
+                self._mat = np.zeros((0, self.dim), dtype=np.float32)
+                self._on_reset()
+            if v.shape[0] != self.dim:
+                logger.warning(f"[vector_index] row#{pid} dim={v.shape[0]} "
+                               f"!= index dim={self.dim}, skipped")
+                self._remove_locked(pid)
+                continue
+            row = self._pos.get(pid)
+            if row is None:
+                self._reserve(1)
+                row = self._n
+                self._ids[row] = pid
+                self._pos[pid] = row
+                self._n += 1
+            self._mat[row] = v
+            self._on_row_set(row, v)
+
+    def invalidate(self) -> None:
+        """Drop the in-memory state; the next query rebuilds (e.g. after a model switch)."""
+        with self._lock:
+            self.ready = False
+
+    def upsert(self, paper_id: int, embedding: Any) -> None:
+        self.apply({paper_id: embedding})
+
+    def remove(self, paper_id: int) -> None:
+        self.apply({paper_id: None})
+
+    # ---------- query ----------
+    def search(
+        self,
+        query: Sequence[float],
+        k: int = 20,
+        offset: int = 0,
+        allowed: Optional[Iterable[int]] = None,
+        after: Optional[Tuple[float, int]] = None,
+        **params: Any,
+    ) -> List[Tuple[int, float]]:
+        """
+        Top-k ``(paper_id, cosine)`` pairs ordered by score desc, id asc.
+        ``after=(score, id)`` is a keyset cursor (rows up to and including it are
+        skipped); ``params`` are backend knobs (e.g. nprobe).
+        """
+        self.ensure_built()
+        q = _as_unit_row(query)
+        if q is None or k <= 0:
+            return []
+        with self._lock:
+            n = self._n
+            if n == 0:
+                return []
+            if q.shape[0] != self.dim:
+                logger.warning(f"[vector_index] query dim={q.shape[0]} != index dim={self.dim}")
+                return []
+            rows = self._candidate_rows(q, **params)
+            if rows is None:
+                ids = self._ids[:n].copy()
+                scores = self._mat[:n] @ q
+            else:
+                ids = self._ids[rows]
+                scores = self._mat[rows] @ q
+            ids, scores = self._merge_extra(q, rows, ids, scores)
+        if allowed is not None:
+            mask = np.isin(ids, np.fromiter(allowed, dtype=np.int64))
+            scores = np.where(mask, scores, -np.inf)
+        if after is not None:
+            a_score, a_id = after
+            seen = (scores > a_score) | ((scores == a_score) & (ids <= a_id))
+            scores = np.where(seen, -np.inf, scores)
+        m = ids.shape[0]
+        want = min(offset + k, m)
+        if want <= 0:
+            return []
+        top = _top_order(ids, scores, want)[offset:]
+        return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def indexed_ids(self) -> np.ndarray:
+        self.ensure_built()
+        with self._lock:
+            return self._ids[: self._n].copy()
+
+    def neighbors(self, paper_ids: Sequence[int], k: int) -> Dict[int, List[Tuple[int, float]]]:
+        """
+        Exact top-k ``(id, cosine)`` neighbours of indexed rows (self excluded),
+        one matrix product per block of rows; every backend scans all rows here.
+        """
+        self.ensure_built()
+        out: Dict[int, List[Tuple[int, float]]] = {}
+        wanted = np.asarray(list(paper_ids), dtype=np.int64)
+        if k <= 0 or wanted.size == 0:
+            return out
+        with self._lock:
+            n = self._n
+            ids = self._ids[:n].copy()
+        # 每块 scores 不超过 ~64M 个 float32
+        block = max(1, min(512, (1 << 26) // max(n, 1)))
+        rows_all = np.flatnonzero(np.isin(ids, wanted))
+        kk = min(k + 1, n)
+        for s in range(0, len(rows_all), block):
+            rows = rows_all[s:s + block]
+            with self._lock:
+                if self._n != n:
+                    # 期间有增删：按新状态重算剩余部分
+                    rest = ids[rows_all[s:]]
+                    out.update(self.neighbors(rest.tolist(), k))
+                    return out
+                scores = self._mat[rows] @ self._mat[:n].T
+            scores[np.arange(len(rows)), rows] = -np.inf
+            for r, row in enumerate(rows):
+                t = _top_order(ids, scores[r], kk)
+                out[int(ids[row])] = [(int(ids[i]), float(scores[r, i])) for i in t
+                                      if np.isfinite(scores[r, i])][:k]
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "ready": self.ready,
+                "size": self._n,
+                "dim": self.dim,
+                "capacity": int(self._mat.shape[0]),
+                "bytes": int(self._mat.nbytes),
+                "path": str(self.path) if self.path else None,
+            }
+
+
+def create_index(name: str = "papers", backend: Optional[str] = None, source: Any = None,
+                 shared: Optional[bool] = None) -> VectorIndex:
+    """
+    Index named ``name`` over ``source`` rows, snapshotted to
+    <STORAGE_DIR>/index/<name>-<backend>.npz, or, when ``shared`` (default
+    ``settings.VECTOR_INDEX_SHARED``), published as memory-mapped generations under
+    <STORAGE_DIR>/index/<name>-<backend>/ (services/shared_index.py).
+    """
+    backend = (backend or settings.VECTOR_INDEX_BACKEND or "flat").strip().lower()
+    if backend not in ("flat", "ivf"):
+        logger.warning(f"[vector_index] unknown backend {backend!r}, using flat")
+        backend = "flat"
+    path = Path(settings.STORAGE_DIR) / "index" / f"{name}-{backend}.npz"
+    cls: type = VectorIndex
+    kwargs: Dict[str, Any] = {}
+    if backend == "ivf":
+        from .ivf_index import IVFFlatIndex
+        cls = IVFFlatIndex
+        kwargs = {"nlist": settings.VECTOR_INDEX_NLIST, "nprobe": settings.VECTOR_INDEX_NPROBE}
+    if settings.VECTOR_INDEX_SHARED if shared is None else shared:
+        from .shared_index import SharedIndexMixin, shared_supported
+        if shared_supported():
+            cls = type(f"Shared{cls.__name__}", (SharedIndexMixin, cls), {})
+        else:
+            logger.warning("[vector_index] shared index needs fcntl.flock; "
+                           "using a per-process index")
+    return cls(path, source=source, **kwargs)
+
+
+vector_index = create_index()
+
+
+@on_switch
+def _rebuild_on_switch(old, new) -> None:
+    vector_index.invalidate()
+
+
+# ---------- keep the index in sync with committed Paper writes ----------
+@event.listens_for(SASession, "after_flush")
+def _collect_paper_changes(session: SASession, flush_context) -> None:
+    pending: Dict[int, Any] = session.info.setdefault(_PENDING_KEY, {})
+    for obj in session.new:
+        if isinstance(obj, Paper) and obj.id is not None:
+            pending[obj.id] = obj.embedding
+    for obj in session.dirty:
+        if isinstance(obj, Paper) and obj.id is not None:
+            if sa_inspect(obj).attrs.embedding.history.has_changes():
+                pending[obj.id] = obj.embedding
+    for obj in session.deleted:
+        if isinstance(obj, Paper) and obj.id is not None:
+            pending[obj.id] = None
+
+
+@event.listens_for(SASession, "after_commit")
+def _apply_paper_changes(session: SASession) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        try:
+            vector_index.apply(pending)
+        except Exception as e:
+            logger.warning(f"[vector_index] incremental refresh failed, will rebuild: {e}")
+            vector_index.ready = False
+
+
+@event.listens_for(SASession, "after_soft_rollback")
+def _drop_paper_changes(session: SASession, previous_transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
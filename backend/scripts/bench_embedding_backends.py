@@ -0,0 +1,131 @@
+# backend/scripts/bench_embedding_backends.py
+"""
+Compare the torch (sentence-transformers) and onnx (onnxruntime, int8)
+embedding backends on CPU.
+
+    python scripts/bench_embedding_backends.py --model all-MiniLM-L6-v2 --texts 2000
+
+Each backend runs in its own process so the numbers are not polluted by the
+other one: time to import + load the model, bulk throughput on paper-like
+texts, single-query latency, and peak RSS.  The onnx vectors are then
+compared with the torch ones (cosine; 1.0 = identical).  The ONNX files are
+exported first if needed (``python -m app.cli.export_onnx``).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+THIS = pathlib.Path(__file__).resolve()
+BACKEND_DIR = THIS.parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import numpy as np  # noqa: E402
+
+BACKENDS = ("torch", "onnx")
+_WORDS = ("graph neural network transformer attention retrieval sparse dense embedding "
+          "compiler cache scheduling memory GPU kernel latency throughput benchmark dataset "
+          "training inference protein molecule language model contrastive learning "
+          "quantization pruning distillation robustness federated privacy reinforcement "
+          "policy optimisation convex stochastic gradient").split()
+
+
+def _texts(n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(n):
+        title = " ".join(rng.choice(_WORDS, size=rng.integers(5, 14)))
+        abstract = " ".join(rng.choice(_WORDS, size=rng.integers(40, 220)))
+        out.append(f"{title}. {abstract}")
+    return out
+
+
+def child(backend: str, model: str, n: int, batch: int, out_path: str) -> None:
+    t0 = time.perf_counter()
+    from app.services.embedding_models import get_model
+    from app.services.embedding_worker import load_encoder
+
+    spec = get_model(model)
+    encoder = load_encoder(spec)
+    if encoder is None:
+        raise SystemExit(f"{backend}: no model could be loaded")
+    if backend == "onnx" and type(encoder).__name__ != "OnnxEncoder":
+        raise SystemExit("onnx: fell back to sentence-transformers (is onnxruntime installed?)")
+    load_s = time.perf_counter() - t0
+
+    texts = _texts(n)
+    encoder.encode(texts[:batch], batch_size=batch, normalize_embeddings=spec.normalize)   # warm-up
+    t0 = time.perf_counter()
+    vecs = encoder.encode(texts, batch_size=batch, normalize_embeddings=spec.normalize)
+    bulk_s = time.perf_counter() - t0
+    lat = []
+    for q in texts[:50]:
+        t0 = time.perf_counter()
+        encoder.encode([q[:80]], batch_size=1, normalize_embeddings=spec.normalize)
+        lat.append(time.perf_counter() - t0)
+    np.save(out_path, np.asarray(vecs, dtype=np.float32))
+    print(json.dumps({
+        "backend": backend,
+        "load_s": load_s,
+        "texts_per_s": n / bulk_s,
+        "query_ms_p50": float(np.median(lat) * 1000),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,   # Linux: KB
+    }))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    ap.add_argument("--model", default="all-MiniLM-L6-v2", help="embedding registry key")
+    ap.add_argument("--texts", type=int, default=2000)
+    ap.add_argument("--batch", type=int, default=64)
+    ap.add_argument("--child", choices=BACKENDS, help=argparse.SUPPRESS)
+    ap.add_argument("--out", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child(args.child, args.model, args.texts, args.batch, args.out)
+        return
+
+    from app.services.embedding_models import get_model
+    from app.services.embedding_onnx import export_model
+
+    export_model(get_model(args.model))
+    results, vecs = [], {}
+    with tempfile.TemporaryDirectory(prefix="bench_backend_") as workdir:
+        for backend in BACKENDS:
+            out = os.path.join(workdir, f"{backend}.npy")
+            env = dict(os.environ, IP_EMBEDDING_BACKEND=backend, IP_EMBEDDING_WORKERS="0")
+            proc = subprocess.run(
+                [sys.executable, str(THIS), "--child", backend, "--model", args.model,
+                 "--texts", str(args.texts), "--batch", str(args.batch), "--out", out],
+                env=env, capture_output=True, text=True, cwd=str(BACKEND_DIR),
+            )
+            if proc.returncode != 0:
+                sys.exit(f"{backend} failed:\n{proc.stderr[-2000:]}")
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            vecs[backend] = np.load(out)
+
+    a, b = vecs["torch"], vecs["onnx"]
+    cos = (a * b).sum(1) / np.maximum(np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1), 1e-12)
+    print(f"model={args.model} texts={args.texts} batch={args.batch}")
+    print(f"{'backend':<8} {'load s':>7} {'texts/s':>9} {'query ms':>9} {'peak RSS MB':>12}")
+    for r in results:
+        print(f"{r['backend']:<8} {r['load_s']:>7.1f} {r['texts_per_s']:>9.0f} "
+              f"{r['query_ms_p50']:>9.1f} {r['peak_rss_mb']:>12.0f}")
+    base, onnx = results
+    print(f"onnx: {onnx['texts_per_s'] / base['texts_per_s']:.1f}x texts/s, "
+          f"{base['peak_rss_mb'] / onnx['peak_rss_mb']:.1f}x less RSS, "
+          f"{base['load_s'] / max(onnx['load_s'], 1e-9):.1f}x faster load")
+    print(f"cosine vs torch: min {cos.min():.4f}  mean {cos.mean():.4f}")
+
+
+if __name__ == "__main__":
+    main()
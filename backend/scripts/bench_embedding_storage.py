@@ -0,0 +1,121 @@
+# backend/scripts/bench_embedding_storage.py
+"""
+Compare JSON vs packed float16 / int8 embedding columns on SQLite.
+
+    python scripts/bench_embedding_storage.py --rows 20000 --dim 384
+
+For each format it writes ``--rows`` random vectors to a scratch database and
+reports the file size, the time and Python heap to fetch every row (what
+``select(Paper)`` pays), the time to turn them into a float32 matrix, and how
+much quantisation changes cosine top-10 results.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+
+THIS = pathlib.Path(__file__).resolve()
+BACKEND_DIR = THIS.parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import numpy as np  # noqa: E402
+from sqlalchemy import (  # noqa: E402
+    JSON, Column, Integer, MetaData, Table, create_engine, insert, select,
+)
+
+from app.db.types import PackedVector  # noqa: E402
+
+FORMATS = ("json", "float16", "int8")
+
+
+def _table(fmt: str) -> Table:
+    col_type = JSON if fmt == "json" else PackedVector(fmt)
+    return Table("paper", MetaData(), Column("id", Integer, primary_key=True),
+                 Column("embedding", col_type))
+
+
+def _top10(mat: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    unit = mat / np.maximum(np.linalg.norm(mat, axis=1, keepdims=True), 1e-12)
+    return np.argsort(-(queries @ unit.T), axis=1)[:, :10]
+
+
+def bench(fmt: str, data: np.ndarray, queries: np.ndarray, truth: np.ndarray, workdir: str) -> dict:
+    path = os.path.join(workdir, f"{fmt}.db")
+    engine = create_engine(f"sqlite:///{path}")
+    table = _table(fmt)
+    table.metadata.create_all(engine)
+    payload = [{"id": i + 1, "embedding": (row.tolist() if fmt == "json" else row)}
+               for i, row in enumerate(data)]
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        for s in range(0, len(payload), 5000):
+            conn.execute(insert(table), payload[s:s + 5000])
+    write_s = time.perf_counter() - t0
+    engine.dispose()
+
+    engine = create_engine(f"sqlite:///{path}")
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        rows = conn.execute(select(table.c.id, table.c.embedding)).all()
+    fetch_s = time.perf_counter() - t0
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    mat = np.vstack([np.asarray(r[1], dtype=np.float32) for r in rows])
+    matrix_s = time.perf_counter() - t0
+    engine.dispose()
+
+    top = _top10(mat, queries)
+    overlap = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(top, truth)])
+    return {
+        "format": fmt,
+        "file_mb": os.path.getsize(path) / 2**20,
+        "write_s": write_s,
+        "fetch_s": fetch_s,
+        "heap_mb": heap / 2**20,
+        "matrix_s": matrix_s,
+        "rows_per_s": len(rows) / (fetch_s + matrix_s),
+        "top10_overlap": overlap,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=50)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(args.rows, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = _top10(data, queries)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_emb_") as workdir:
+        for fmt in FORMATS:
+            results.append(bench(fmt, data, queries, truth, workdir))
+
+    base = results[0]
+    print(f"rows={args.rows} dim={args.dim}")
+    print(f"{'format':<8} {'file MB':>9} {'fetch s':>8} {'heap MB':>9} {'matrix s':>9} "
+          f"{'rows/s':>10} {'top10':>6}")
+    for r in results:
+        print(f"{r['format']:<8} {r['file_mb']:>9.1f} {r['fetch_s']:>8.2f} {r['heap_mb']:>9.1f} "
+              f"{r['matrix_s']:>9.2f} {r['rows_per_s']:>10.0f} {r['top10_overlap']:>6.3f}")
+    for r in results[1:]:
+        print(f"{r['format']}: {base['file_mb'] / r['file_mb']:.1f}x smaller on disk, "
+              f"{base['heap_mb'] / max(r['heap_mb'], 1e-9):.1f}x less heap, "
+              f"{r['rows_per_s'] / base['rows_per_s']:.1f}x rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# backend/scripts/bench_list_responses.py
+"""
+Compare the default response path with the fast JSON path for /papers-sized lists.
+
+    python scripts/bench_list_responses.py --sizes 1000 10000 100000
+
+"default" is what FastAPI does for ``response_model=list[PaperRead]``
+(``serialize_response``: validate every row, dump, then ``JSONResponse``);
+"fast" is ``app.api.responses.fast_json``.  Each is timed alone and with gzip
+at ``IP_GZIP_LEVEL``; rows are synthetic but shaped like ``_paper_payloads``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import pathlib
+import sys
+import time
+from typing import List
+
+THIS = pathlib.Path(__file__).resolve()
+BACKEND_DIR = THIS.parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import numpy as np  # noqa: E402
+from fastapi import Response  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from app.api import responses  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.schemas import PaperRead  # noqa: E402
+
+
+def _rows(n: int, rng: np.random.Generator) -> List[dict]:
+    rows = []
+    for i in range(n):
+        authors = [{"id": int(a), "name": f"Author {a}", "orcid": None,
+                    "affiliation": "Some University"}
+                   for a in rng.integers(1, 50_000, rng.integers(1, 7))]
+        rows.append({
+            "id": i + 1,
+            "title": f"A study of things number {i} with a reasonably long title",
+            "abstract": "lorem ipsum " * int(rng.integers(20, 120)),
+            "year": int(rng.integers(1990, 2026)),
+            "doi": f"10.1145/{i}.{i * 7}" if i % 3 else None,
+            "venue": "International Symposium on Microarchitecture",
+            "pdf_url": f"/files/pdfs/{i}.pdf",
+            "tag_ids": [int(t) for t in rng.integers(1, 300, rng.integers(0, 5))],
+            "author_ids": [a["id"] for a in authors],
+            "authors": authors,
+            "folder_ids": [int(rng.integers(1, 40))] if i % 2 else [],
+        })
+    return rows
+
+
+_FIELD = create_model_field("response", List[PaperRead], mode="serialization")
+
+
+def _default(rows: List[dict]) -> bytes:
+    content = asyncio.run(serialize_response(field=_FIELD, response_content=rows))
+    return JSONResponse(content).body
+
+
+def _fast(rows: List[dict]) -> bytes:
+    return responses.fast_json(rows, PaperRead, Response()).body
+
+
+def _time(fn, rows: List[dict], reps: int, level: int) -> dict:
+    lat = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        body = fn(rows)
+        if level:
+            body = gzip.compress(body, compresslevel=level)
+        lat.append(time.perf_counter() - t0)
+    lat_ms = np.asarray(lat) * 1000
+    return {"p50": float(np.percentile(lat_ms, 50)), "p99": float(np.percentile(lat_ms, 99)),
+            "bytes": len(body)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--repeats", type=int, default=30,
+                    help="timed runs per case (a fifth of that above 10k rows)")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    encoder = "orjson" if responses.orjson is not None else "json (orjson not installed)"
+    print(f"encoder={encoder} gzip_level={settings.GZIP_LEVEL}")
+    print(f"{'rows':>7} {'path':<8} {'gzip':<5} {'p50 ms':>9} {'p99 ms':>9} {'MB':>8}")
+    for n in args.sizes:
+        rows = _rows(n, rng)
+        reps = args.repeats if n <= 10_000 else max(3, args.repeats // 5)
+        assert _default(rows[:50]) and _fast(rows[:50])   # 预热
+        base = None
+        for name, fn in (("default", _default), ("fast", _fast)):
+            for level in (0, settings.GZIP_LEVEL):
+                r = _time(fn, rows, reps, level)
+                if base is None:
+                    base = r
+                print(f"{n:>7} {name:<8} {'yes' if level else 'no':<5} {r['p50']:>9.1f} "
+                      f"{r['p99']:>9.1f} "
+                      f"{r['bytes'] / 2**20:>8.2f}")
+        fast = _time(_fast, rows, reps, 0)
+        print(f"{n:>7} fast path: {base['p50'] / fast['p50']:.1f}x faster at p50 (uncompressed)")
+
+
+if __name__ == "__main__":
+    main()
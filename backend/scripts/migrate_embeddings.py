@@ -0,0 +1,97 @@
+# backend/scripts/migrate_embeddings.py
+"""
+Convert stored embeddings between JSON and the packed BLOB formats (SQLite).
+
+    python scripts/migrate_embeddings.py --to float16      # or int8 / json
+    python scripts/migrate_embeddings.py --to int8 --tables paper
+
+Rows are rewritten in id order, in batches, one transaction per batch, so the
+script can be interrupted and re-run.  Readers decode both formats, but set
+IP_EMBEDDING_STORAGE to the same value afterwards so new writes match.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import sys
+import time
+
+# --- 让脚本可直接作为独立文件运行，自动补 PYTHONPATH ---
+THIS = pathlib.Path(__file__).resolve()
+BACKEND_DIR = THIS.parents[1]         # .../backend
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+import numpy as np  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from app.db.database import engine  # noqa: E402
+from app.db.types import pack_vector, unpack_vector  # noqa: E402
+
+
+def _encode(vec: np.ndarray, fmt: str):
+    if fmt == "json":
+        return json.dumps([float(x) for x in vec])
+    return pack_vector(vec, fmt)
+
+
+def migrate_table(table: str, fmt: str, batch: int) -> int:
+    done = 0
+    last = 0
+    t0 = time.perf_counter()
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(f"SELECT id, embedding FROM {table} "
+                     f"WHERE id > :last AND embedding IS NOT NULL "
+                     f"ORDER BY id LIMIT :n"),
+                {"last": last, "n": batch},
+            ).all()
+            if not rows:
+                break
+            params = []
+            for rid, raw in rows:
+                vec = unpack_vector(raw)
+                if vec is not None:
+                    params.append({"id": rid, "emb": _encode(vec, fmt)})
+            if params:
+                conn.execute(text(f"UPDATE {table} SET embedding = :emb WHERE id = :id"), params)
+            last = rows[-1][0]
+            done += len(params)
+        print(f"[migrate] {table}: {done} rows ({time.perf_counter() - t0:.1f}s)", end="\r")
+    print(f"[migrate] {table}: {done} rows -> {fmt} in {time.perf_counter() - t0:.1f}s")
+    return done
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Rewrite embeddings as json / float16 / int8")
+    ap.add_argument("--to", dest="fmt", choices=["float16", "int8", "json"], required=True)
+    ap.add_argument("--tables", nargs="+", default=["paper", "passage"])
+    ap.add_argument("--batch", type=int, default=2000)
+    ap.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return freed pages")
+    args = ap.parse_args()
+
+    if engine.dialect.name != "sqlite":
+        print("[migrate] only needed on SQLite (Postgres stores pgvector columns)")
+        return
+    with engine.connect() as conn:
+        tables = conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type='table'")
+        existing = {r[0] for r in tables}
+    for table in args.tables:
+        if table not in existing:
+            print(f"[migrate] skip {table}: table not found")
+            continue
+        migrate_table(table, args.fmt, args.batch)
+    if args.vacuum:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+    print("[migrate] done ✅  (set IP_EMBEDDING_STORAGE=%s)" % args.fmt)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print("[migrate] failed:", repr(e))
+        sys.exit(1)
@@ -0,0 +1,28 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 在导入 app 之前指向临时库 / 存储目录，关掉启动时的后台任务
+_tmp = Path(tempfile.mkdtemp(prefix="infinipaper-test-"))
+os.environ.setdefault("IP_DATABASE_URL", f"sqlite:///{_tmp / 'test.db'}")
+os.environ.setdefault("IP_STORAGE_DIR", str(_tmp / "storage"))
+os.environ.setdefault("IP_EMBEDDING_AUTO", "false")
+os.environ.setdefault("IP_KNN_GRAPH_AUTO", "false")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from app.db.database import engine, init_db
+    init_db()
+    return engine
+
+
+@pytest.fixture
+def session(engine):
+    from sqlmodel import Session
+    with Session(engine) as s:
+        yield s
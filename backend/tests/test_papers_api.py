@@ -0,0 +1,28 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.models import Paper
+
+
+def test_similar_limit_is_capped_at_graph_k(session):
+    paper = Paper(title="similar limit")
+    session.add(paper)
+    session.commit()
+    client = TestClient(app)
+    params = {"limit": settings.KNN_GRAPH_K + 1}
+    over = client.get(f"/api/v1/papers/{paper.id}/similar", params=params)
+    assert over.status_code == 422
+    assert client.get(f"/api/v1/papers/{paper.id}/similar", params={"limit": 0}).status_code == 422
+    assert client.get(f"/api/v1/papers/{paper.id}/similar").status_code == 200
+
+
+def test_list_q_matches_cjk_substring(session):
+    paper = Paper(title="基于深度学习的图像分割方法研究")
+    session.add(paper)
+    session.commit()
+    client = TestClient(app)
+    for q in ("图像分割", "分割方法", "深度学习的图像"):
+        r = client.get("/api/v1/papers/", params={"q": q, "fields": "id"})
+        assert r.status_code == 200
+        assert paper.id in [row["id"] for row in r.json()], q
@@ -0,0 +1,27 @@
+from sqlmodel import delete
+
+from app.models import Paper, PaperNeighbor
+from app.services import knn_graph as knn_graph_mod
+from app.services.embedding_generations import active_generation
+from app.services.recommender import cooccurrence, recommend_blended
+
+
+def test_blended_reads_the_precomputed_graph(session, monkeypatch):
+    session.exec(delete(PaperNeighbor))
+    papers = [Paper(title=f"paper {i}") for i in range(6)]
+    session.add_all(papers)
+    session.commit()
+    ids = [p.id for p in papers]
+    gen = active_generation().id
+    session.add_all(PaperNeighbor(paper_id=ids[0], rank=r, neighbor_id=nid, score=1.0 - 0.1 * r,
+                                  generation_id=gen)
+                    for r, nid in enumerate(ids[1:]))
+    session.commit()
+
+    def live_search(*args, **kwargs):
+        raise AssertionError("recommend_blended fell back to a live vector search")
+
+    monkeypatch.setattr(knn_graph_mod, "_nearest", live_search)
+    cooccurrence._results.clear()
+    out = recommend_blended(session, ids[0], k=3)
+    assert [r["id"] for r in out] == ids[1:4]
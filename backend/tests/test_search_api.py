@@ -0,0 +1,22 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import Paper
+
+
+def test_search_fields_rejects_relationship_fields(session):
+    session.add(Paper(title="sparse fieldset search"))
+    session.commit()
+    client = TestClient(app)
+    for name in ("tag_ids", "authors"):
+        r = client.get("/api/v1/search/", params={"fields": f"id,title,{name}"})
+        assert r.status_code == 422, name
+        assert name in r.json()["detail"]
+
+
+def test_search_fields_trims_columns(session):
+    session.add(Paper(title="sparse fieldset columns", abstract="long abstract"))
+    session.commit()
+    r = TestClient(app).get("/api/v1/search/", params={"fields": "title,score"})
+    assert r.status_code == 200
+    assert r.json() and all(set(row) == {"id", "title", "score"} for row in r.json())
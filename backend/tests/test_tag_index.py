@@ -0,0 +1,79 @@
+from fastapi.testclient import TestClient
+from sqlmodel import delete
+
+from app.main import app
+from app.models import Paper, PaperTagLink, Tag
+from app.services.generation import library_generation
+from app.services.tag_index import bitmap_condition, ids_from_bitmap, tag_index
+
+
+def _count_builds(monkeypatch):
+    calls = []
+    build = tag_index.build
+
+    def counting(session):
+        calls.append(1)
+        build(session)
+
+    monkeypatch.setattr(tag_index, "build", counting)
+    return calls
+
+
+def _tagged(session, name, n):
+    tag = Tag(name=name)
+    papers = [Paper(title=f"{name} {i}") for i in range(n)]
+    session.add(tag)
+    session.add_all(papers)
+    session.commit()
+    return tag, papers
+
+
+def test_local_commits_are_applied_without_rebuild(session, monkeypatch):
+    tag, papers = _tagged(session, "delta-a", 3)
+    tag_index.ensure_built()
+    builds = _count_builds(monkeypatch)
+
+    session.add_all(PaperTagLink(paper_id=p.id, tag_id=tag.id) for p in papers[:2])
+    session.commit()
+    assert ids_from_bitmap(tag_index.resolve("delta-a")) == [papers[0].id, papers[1].id]
+
+    # 更新标签的写法：按 paper_id 批量删 link 再重新加
+    session.exec(delete(PaperTagLink).where(PaperTagLink.paper_id == papers[0].id))
+    session.add(PaperTagLink(paper_id=papers[2].id, tag_id=tag.id))
+    session.commit()
+    assert ids_from_bitmap(tag_index.resolve("delta-a")) == [papers[1].id, papers[2].id]
+
+    tag.name = "delta-a2"
+    session.add(tag)
+    session.commit()
+    assert ids_from_bitmap(tag_index.resolve("delta-a2")) == [papers[1].id, papers[2].id]
+    assert tag_index.resolve("delta-a") == 0
+
+    session.delete(papers[1])
+    session.exec(delete(PaperTagLink).where(PaperTagLink.paper_id == papers[1].id))
+    session.commit()
+    assert ids_from_bitmap(tag_index.resolve("delta-a2")) == [papers[2].id]
+    assert not tag_index.universe >> papers[1].id & 1
+    assert builds == []
+
+
+def test_foreign_generation_bump_rebuilds(session, monkeypatch):
+    _tagged(session, "delta-b", 1)
+    tag_index.ensure_built()
+    builds = _count_builds(monkeypatch)
+    library_generation.bump()       # 别的 worker / 原始 SQL 的写入
+    tag_index.ensure_built()
+    assert builds == [1]
+
+
+def test_not_query_uses_the_complement(session):
+    tag, papers = _tagged(session, "delta-c", 2)
+    session.add(PaperTagLink(paper_id=papers[0].id, tag_id=tag.id))
+    session.commit()
+    cond = bitmap_condition(tag_index.resolve("NOT delta-c"))
+    sql = str(cond.compile(compile_kwargs={"literal_binds": True}))
+    assert "NOT IN" in sql
+    params = {"tag_expr": "NOT delta-c", "fields": "id", "limit": 1000}
+    r = TestClient(app).get("/api/v1/papers/", params=params)
+    ids = {row["id"] for row in r.json()}
+    assert papers[1].id in ids and papers[0].id not in ids
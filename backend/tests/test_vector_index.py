@@ -0,0 +1,44 @@
+import numpy as np
+
+from app.services.vector_index import VectorIndex
+
+
+def _index(vectors):
+    idx = VectorIndex()
+    idx.ready = True
+    idx.apply({pid: vec for pid, vec in vectors.items()})
+    return idx
+
+
+def _tied_index():
+    # 每 4 个 id 一组共享同一向量：每组内分数完全相同
+    rng = np.random.default_rng(0)
+    groups = rng.normal(size=(4, 8)).astype(np.float32)
+    return _index({pid: groups[pid % 4] for pid in range(1, 41)}), groups[1]
+
+
+def test_cursor_pages_cover_every_tied_row():
+    idx, q = _tied_index()
+    full = idx.search(q, k=40)
+    seen, after = [], None
+    while True:
+        page = idx.search(q, k=5, after=after)
+        if not page:
+            break
+        seen.extend(page)
+        after = page[-1][1], page[-1][0]
+    assert [pid for pid, _ in seen] == [pid for pid, _ in full]
+    assert sorted(pid for pid, _ in seen) == list(range(1, 41))
+
+
+def test_offset_pages_are_deterministic():
+    idx, q = _tied_index()
+    full = [pid for pid, _ in idx.search(q, k=40)]
+    for offset in range(0, 40, 5):
+        assert [pid for pid, _ in idx.search(q, k=5, offset=offset)] == full[offset:offset + 5]
+
+
+def test_neighbors_break_ties_by_id():
+    idx, _ = _tied_index()
+    nb = idx.neighbors([1], k=3)[1]
+    assert [pid for pid, _ in nb] == [5, 9, 13]
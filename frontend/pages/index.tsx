@@ -5,6 +5,7 @@ import DirectorySidebar from "@/components/DirectorySidebar";
 import RecentPapers from "@/components/RecentPapers";
 import PaperDetailDialog from "@/components/Library/PaperDetailDialog";
 import UploadDropzone from "@/components/UploadDropzone";
+import { fetchAllPages } from "@/utils/api";
 
 import DecorBG from "@/components/DecorBG";
 import Particles from "@/components/Particles";
@@ -115,8 +116,10 @@ export default function Home() {
       const url = new URL(`${apiBase}/api/v1/papers/`);
       url.searchParams.set("dedup", "true");
       if (currentFolder != null) url.searchParams.set("folder_id", String(currentFolder));
-      const r = await fetch(url.toString());
-      setPapers(r.ok ? await r.json() : []);
+      // 分页接口：第一页先显示，其余页沿 X-Next-Cursor 补齐
+      await fetchAllPages(url.toString(), list => { setPapers(list); setLoading(false); });
+    } catch {
+      setPapers([]);
     } finally {
       setLoading(false);
     }
@@ -20,6 +20,7 @@ import YearDualSlider from "@/components/Library/YearDualSlider";
 import { getTagPrio, getTagColor, isOpenSourceTag, QuickTagPanel } from "@/components/Library/QuickTagPanel";
 import TagFilterDropdown from "@/components/Library/TagFilterDropdown";
 import { abbrevVenue, venueTier } from "@/components/Library/CONST";
+import { fetchAllPages, fetchTotal } from "@/utils/api";
 
 const Swal = withReactContent(SwalCore);
 const apiBase = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
@@ -75,12 +76,17 @@ async function j<T = any>(url: string, init?: RequestInit) {
   }
   return r.json() as Promise<T>;
 }
+// 列表接口分页返回：整集合沿 X-Next-Cursor 取完（同 j 的 fetch 选项）
+const LIST_INIT: RequestInit = { credentials: "include", cache: "no-store" };
 const toast = (title: string) => Swal.fire({ toast: true, position: "top", showConfirmButton: false, timer: 1200, icon: "success", title });
 // 仅按文件夹取论文（忽略当前筛选）；尽量兼容后端多种路由
 async function loadFolderPapersAll(folderId: number, includeChildren = false): Promise<Paper[]> {
   const qs = includeChildren ? "?include_children=true" : "";
+  try {
+    return await fetchAllPages<Paper>(
+      `${apiBase}/api/v1/papers?folder_id=${folderId}${qs ? `&${qs.slice(1)}` : ""}`, undefined, LIST_INIT);
+  } catch { /* try next */ }
   const urls = [
-    `${apiBase}/api/v1/papers?folder_id=${folderId}${qs}`,
     `${apiBase}/api/v1/folders/${folderId}/papers${qs ? `?${qs.slice(1)}` : ""}`,
     `${apiBase}/api/v1/papers/by_folder/${folderId}${qs ? `?${qs.slice(1)}` : ""}`,
   ];
@@ -1056,10 +1062,11 @@ export default function Library() {
   // 拉取某目录（含子目录）下的论文集合
   const fetchPapersForFolders = React.useCallback(async (folderId: number | null): Promise<Paper[]> => {
     if (folderId == null) {
-      return await j<Paper[]>(`${apiBase}/api/v1/papers/?dedup=true`);
+      return await fetchAllPages<Paper>(`${apiBase}/api/v1/papers/?dedup=true`, undefined, LIST_INIT);
     }
     const ids = [folderId, ...getDescendantIds(folderId)];
-    const lists = await Promise.all(ids.map(id => j<Paper[]>(`${apiBase}/api/v1/papers/?dedup=true&folder_id=${id}`)));
+    const lists = await Promise.all(ids.map(id =>
+      fetchAllPages<Paper>(`${apiBase}/api/v1/papers/?dedup=true&folder_id=${id}`, undefined, LIST_INIT)));
     const map = new Map<number, Paper>();
     lists.flat().forEach(p => map.set(p.id, p));
     return Array.from(map.values());
@@ -1167,15 +1174,14 @@ export default function Library() {
 
   const loadFolderCounts = React.useCallback(async () => {
     try {
-      const all = await j<Paper[]>(`${apiBase}/api/v1/papers/?dedup=true`);
-      setAllCount(all.length);
+      setAllCount(await fetchTotal(`${apiBase}/api/v1/papers/?dedup=true`, LIST_INIT));
     } catch { setAllCount(0); }
 
     const pairs = await Promise.all(
       folders.map(async f => {
         try {
-          const arr = await j<Paper[]>(`${apiBase}/api/v1/papers/?dedup=true&folder_id=${f.id}`);
-          return [f.id, arr.length] as const;
+          const n = await fetchTotal(`${apiBase}/api/v1/papers/?dedup=true&folder_id=${f.id}`, LIST_INIT);
+          return [f.id, n] as const;
         } catch {
           return [f.id, 0] as const;
         }
@@ -1320,6 +1326,7 @@ export default function Library() {
   const loadTags = React.useCallback(async () => {
     try { setTags(await j<Tag[]>(`${apiBase}/api/v1/tags/`)); } catch { setTags([]); }
   }, []);
+  const loadToken = React.useRef(0);
   const loadPapers = React.useCallback(async () => {
     try {
       const url = new URL(`${apiBase}/api/v1/papers/`);
@@ -1329,13 +1336,16 @@ export default function Library() {
       if (yearMin != null) url.searchParams.set("year_min", String(yearMin));
       if (yearMax != null) url.searchParams.set("year_max", String(yearMax));
       if (filterVenueAbbrs.length) url.searchParams.set("venue_abbr", filterVenueAbbrs.join(","));
-      let list = await j<Paper[]>(url.toString());
-      if (sortAlphabetical) {
-        list = list.slice().sort((a, b) => (a.title || "").localeCompare(b.title || ""));
-      } else if (sortByAddedTime) {
-        list = list.slice().sort((a, b) => (b.id - a.id));
-      }
-      setPapers(list);
+      const sorted = (list: Paper[]) => {
+        if (sortAlphabetical) return list.slice().sort((a, b) => (a.title || "").localeCompare(b.title || ""));
+        if (sortByAddedTime) return list.slice().sort((a, b) => (b.id - a.id));
+        return list;
+      };
+      // 第一页到了就先渲染，其余页沿游标在后台补齐；条件变了（新的一次加载）就丢弃旧结果
+      const token = ++loadToken.current;
+      await fetchAllPages<Paper>(url.toString(), list => {
+        if (token === loadToken.current) setPapers(sorted(list));
+      }, LIST_INIT);
     } catch { setPapers([]); }
   }, [activeFolderId, search, filterVenueAbbrs, yearMin, yearMax, sortAlphabetical, sortByAddedTime]);
 
@@ -8,6 +8,7 @@ import DirectorySidebar from "@/components/DirectorySidebar";
 import RecentPapers from "@/components/RecentPapers";
 import PaperDetailDialog from "@/components/Library/PaperDetailDialog";
 import UploadDropzone from "@/components/UploadDropzone";
+import { fetchAllPages } from "@/utils/api";
 
 export default function Home() {
   const apiBase = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
@@ -31,8 +32,10 @@ export default function Home() {
       const url = new URL(`${apiBase}/api/v1/papers/`);
       url.searchParams.set("dedup", "true");
       if (currentFolder != null) url.searchParams.set("folder_id", String(currentFolder));
-      const r = await fetch(url.toString());
-      setPapers(r.ok ? await r.json() : []);
+      // 分页接口：第一页先显示，其余页沿 X-Next-Cursor 补齐
+      await fetchAllPages(url.toString(), list => { setPapers(list); setLoading(false); });
+    } catch {
+      setPapers([]);
     } finally {
       setLoading(false);
     }
@@ -40,7 +43,7 @@ export default function Home() {
 
   const loadStats = React.useCallback(async () => {
     try {
-      const all = await fetch(`${apiBase}/api/v1/papers/?dedup=true`).then(r => r.ok ? r.json() : []);
+      const all = await fetchAllPages(`${apiBase}/api/v1/papers/?dedup=true&fields=id,pdf_url,authors`);
       const authorSet = new Set<string | number>();
       let pdf = 0;
       for (const p of all) {
@@ -1,5 +1,5 @@
 import React, { useEffect, useMemo, useRef, useState } from "react";
-import { apiGet } from "@/utils/api";
+import { fetchAllPages } from "@/utils/api";
 
 // ------------------------- types (loose to fit different backends) -------------------------
 type KV = Record<string, any>;
@@ -214,9 +214,8 @@ export default function QualityPage() {
       setLoading(true); setErr(null);
       try {
         // 直接使用现有列表接口，忽略质量 summary 的后端依赖
-        const res = await apiGet("/api/v1/papers?dedup=true");
-        const arr = Array.isArray(res) ? res : (res?.items || res?.data || []);
-        if (mounted) setPapers(arr as Paper[]);
+        const arr = await fetchAllPages<Paper>("/api/v1/papers?dedup=true");
+        if (mounted) setPapers(arr);
       } catch (e: any) {
         setErr(String(e?.message || e));
       } finally { setLoading(false); }
@@ -1,11 +1,20 @@
 import { useState } from "react";
-import useSWR from "swr";
-import { apiGet } from "@/utils/api";
+import useSWRInfinite from "swr/infinite";
+import { fetchPage, Page } from "@/utils/api";
 import PaperCard from "@/components/PaperCard";
 
 export default function SearchPage() {
   const [q, setQ] = useState("");
-  const { data } = useSWR(q ? `/api/v1/search?q=${encodeURIComponent(q)}` : null, apiGet);
+  // 分页：每页的 X-Next-Cursor 就是下一页的 key；没有游标 = 到底了
+  const getKey = (_: number, prev: Page<any> | null) => {
+    if (!q || (prev && !prev.nextCursor)) return null;
+    return [`/api/v1/search?q=${encodeURIComponent(q)}`, prev?.nextCursor ?? null];
+  };
+  const { data, size, setSize, isValidating } = useSWRInfinite(
+    getKey, ([url, cursor]: [string, string | null]) => fetchPage(url, cursor),
+  );
+  const items = data?.flatMap((p) => p.items) ?? [];
+  const hasMore = !!data?.[data.length - 1]?.nextCursor;
   return (
     <div className="container py-8">
       <h1 className="text-2xl font-semibold mb-4">搜索论文</h1>
@@ -16,8 +25,17 @@ export default function SearchPage() {
         onChange={(e) => setQ(e.target.value)}
       />
       <div className="mt-6 grid gap-4">
-        {data?.map((p: any) => <PaperCard key={p.id} paper={p} />)}
+        {items.map((p: any) => <PaperCard key={p.id} paper={p} />)}
       </div>
+      {hasMore && (
+        <button
+          className="mt-6 px-4 py-2 rounded-md border bg-white hover:bg-gray-50"
+          disabled={isValidating}
+          onClick={() => setSize(size + 1)}
+        >
+          {isValidating ? "加载中..." : "加载更多"}
+        </button>
+      )}
     </div>
   );
-}
\ No newline at end of file
+}
@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import { apiGet } from "@/utils/api";
+import { fetchPage } from "@/utils/api";
 import PaperCard from "@/components/PaperCard";
 
 export default function SearchPage() {
@@ -7,12 +7,16 @@ export default function SearchPage() {
   const [mode, setMode] = useState<"kw"|"sem">("sem");
   const [items, setItems] = useState<any[]>([]);
   const [loading, setLoading] = useState(false);
-  async function run() {
+  // 下一页：上一页响应头 X-Next-Cursor，连同发出它的查询一起记下
+  const [next, setNext] = useState<{ path: string; cursor: string } | null>(null);
+  async function run(more = false) {
     setLoading(true);
     try {
-      const path = mode === "sem" ? `/api/v1/search/semantic?q=${encodeURIComponent(q)}` : `/api/v1/search?q=${encodeURIComponent(q)}`;
-      const data = await apiGet(path);
-      setItems(data);
+      const path = more && next ? next.path
+        : mode === "sem" ? `/api/v1/search/semantic?q=${encodeURIComponent(q)}` : `/api/v1/search?q=${encodeURIComponent(q)}`;
+      const page = await fetchPage(path, more ? next?.cursor : null);
+      setItems(prev => more ? prev.concat(page.items) : page.items);
+      setNext(page.nextCursor ? { path, cursor: page.nextCursor } : null);
     } finally {
       setLoading(false);
     }
@@ -26,11 +30,16 @@ export default function SearchPage() {
           <option value="sem">语义</option>
           <option value="kw">关键词</option>
         </select>
-        <button onClick={run} className="px-4 py-2 rounded-xl border bg-white hover:bg-gray-50">{loading? "搜索中..." : "搜索"}</button>
+        <button onClick={()=> run()} className="px-4 py-2 rounded-xl border bg-white hover:bg-gray-50">{loading? "搜索中..." : "搜索"}</button>
       </div>
       <div className="grid grid-cols-1 md:grid-cols-2 gap-4 mt-6">
         {items.map((p:any)=> <PaperCard key={p.id} paper={p} />)}
       </div>
+      {next && (
+        <div className="flex justify-center mt-6">
+          <button onClick={()=> run(true)} disabled={loading} className="px-4 py-2 rounded-xl border bg-white hover:bg-gray-50">{loading? "加载中..." : "加载更多"}</button>
+        </div>
+      )}
     </div>
   );
 }
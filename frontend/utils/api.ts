@@ -14,4 +14,49 @@ export async function apiPost(path: string, body: any) {
   });
   if (!res.ok) throw new Error(`POST ${path} failed`);
   return res.json();
-}
\ No newline at end of file
+}
+
+// ---------- 分页列表：数据是 JSON 数组，下一页游标 / 总数在响应头 X-Next-Cursor / X-Total-Count ----------
+export const PAGE_SIZE = 500;
+
+export type Page<T> = { items: T[]; nextCursor: string | null; total: number | null };
+
+export async function fetchPage<T = any>(url: string, cursor?: string | null, init?: RequestInit): Promise<Page<T>> {
+  const u = new URL(url, base);   // 完整 URL 或 /api/... 路径都行
+  if (cursor) u.searchParams.set("cursor", cursor);
+  const res = await fetch(u.toString(), init);
+  if (!res.ok) throw new Error(`GET ${u.pathname} failed`);
+  const total = res.headers.get("X-Total-Count");
+  return {
+    items: await res.json(),
+    nextCursor: res.headers.get("X-Next-Cursor"),
+    total: total == null ? null : Number(total),
+  };
+}
+
+// 需要整个结果集时：沿游标逐页取完；onPage 每到一页回调一次已取到的全部（边取边渲染）
+export async function fetchAllPages<T = any>(
+  url: string, onPage?: (soFar: T[]) => void, init?: RequestInit,
+): Promise<T[]> {
+  const u = new URL(url, base);
+  if (!u.searchParams.has("limit")) u.searchParams.set("limit", String(PAGE_SIZE));
+  let out: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const page: Page<T> = await fetchPage<T>(u.toString(), cursor, init);
+    out = out.concat(page.items);
+    onPage?.(out);
+    cursor = page.nextCursor;
+  } while (cursor);
+  return out;
+}
+
+// 只要条数：取一条 id + with_total，读 X-Total-Count
+export async function fetchTotal(url: string, init?: RequestInit): Promise<number> {
+  const u = new URL(url, base);
+  u.searchParams.set("limit", "1");
+  u.searchParams.set("fields", "id");
+  u.searchParams.set("with_total", "true");
+  const page = await fetchPage(u.toString(), null, init);
+  return page.total ?? page.items.length;
+}